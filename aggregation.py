@@ -0,0 +1,169 @@
+from typing import Any, Optional, Callable
+
+
+class Accumulator:
+    """
+    Running state of an aggregate function for one group. Partial states of the same group,
+    e.g. computed before and after the groups were spilled, are combined with merge.
+    """
+
+    def add(self, value: Any):
+        pass
+
+    def merge(self, other: 'Accumulator'):
+        pass
+
+    def result(self) -> Any:
+        return None
+
+
+class CountAccumulator(Accumulator):
+    """
+    Counts values which are not NULL. COUNT(*) passes a placeholder value for every record.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def add(self, value: Any):
+        if value is not None:
+            self.count += 1
+
+    def merge(self, other: 'CountAccumulator'):
+        self.count += other.count
+
+    def result(self) -> int:
+        return self.count
+
+
+class CountDistinctAccumulator(Accumulator):
+    def __init__(self):
+        self.values = set()
+
+    def add(self, value: Any):
+        if value is not None:
+            self.values.add(value)
+
+    def merge(self, other: 'CountDistinctAccumulator'):
+        self.values |= other.values
+
+    def result(self) -> int:
+        return len(self.values)
+
+
+class SumAccumulator(Accumulator):
+    def __init__(self):
+        self.sum = None
+
+    def add(self, value: Any):
+        if value is not None:
+            self.sum = value if self.sum is None else self.sum + value
+
+    def merge(self, other: 'SumAccumulator'):
+        self.add(other.sum)
+
+    def result(self) -> Any:
+        return self.sum
+
+
+class MinAccumulator(Accumulator):
+    def __init__(self):
+        self.value = None
+
+    def add(self, value: Any):
+        if value is not None and (self.value is None or value < self.value):
+            self.value = value
+
+    def merge(self, other: 'MinAccumulator'):
+        self.add(other.value)
+
+    def result(self) -> Any:
+        return self.value
+
+
+class MaxAccumulator(Accumulator):
+    def __init__(self):
+        self.value = None
+
+    def add(self, value: Any):
+        if value is not None and (self.value is None or value > self.value):
+            self.value = value
+
+    def merge(self, other: 'MaxAccumulator'):
+        self.add(other.value)
+
+    def result(self) -> Any:
+        return self.value
+
+
+class AvgAccumulator(Accumulator):
+    def __init__(self):
+        self.sum = 0
+        self.count = 0
+
+    def add(self, value: Any):
+        if value is not None:
+            self.sum += value
+            self.count += 1
+
+    def merge(self, other: 'AvgAccumulator'):
+        self.sum += other.sum
+        self.count += other.count
+
+    def result(self) -> Optional[float]:
+        return None if self.count == 0 else self.sum / self.count
+
+
+ACCUMULATORS: dict[str, Callable[[], Accumulator]] = {
+    'count': CountAccumulator,
+    'sum': SumAccumulator,
+    'min': MinAccumulator,
+    'max': MaxAccumulator,
+    'avg': AvgAccumulator,
+}
+
+
+class AggregationError(Exception):
+    pass
+
+
+class Aggregate:
+    """
+    Aggregate function over a column. Column None stands for `*`, so every record is counted.
+    """
+
+    def __init__(self, function: str, column: Optional[str] = None, distinct: bool = False):
+        function = function.lower()
+        if function not in ACCUMULATORS:
+            raise AggregationError(f'Unknown aggregate function "{function}"')
+        if distinct and function != 'count':
+            raise AggregationError(f'DISTINCT is supported only in COUNT, not in "{function}"')
+        if column is None and function != 'count':
+            raise AggregationError(f'Aggregate function "{function}" requires a column')
+        if column is None and distinct:
+            raise AggregationError('COUNT(DISTINCT *) is not supported, count distinct values of a column')
+
+        self.function = function
+        self.column = column
+        self.distinct = distinct
+
+    def __eq__(self, other):
+        if not isinstance(other, Aggregate):
+            return False
+
+        return self.function == other.function and self.column == other.column and self.distinct == other.distinct
+
+    def __hash__(self):
+        return hash((self.function, self.column, self.distinct))
+
+    def __repr__(self):
+        argument = '*' if self.column is None else self.column
+        return f'{self.function.upper()}({"DISTINCT " if self.distinct else ""}{argument})'
+
+    def columns(self) -> set[str]:
+        return set() if self.column is None else {self.column}
+
+    def create_accumulator(self) -> Accumulator:
+        if self.distinct:
+            return CountDistinctAccumulator()
+        return ACCUMULATORS[self.function]()
@@ -0,0 +1,61 @@
+"""
+Synthetic employees and tasks in the shape of the test fixtures, with configurable size, cardinality and skew.
+"""
+import random
+from itertools import accumulate
+from typing import Optional
+
+from database_engine import create_employee, create_task
+from models import Table
+
+
+def get_skewed_weights(count: int, skew: float) -> list[float]:
+    """
+    Cumulative Zipf-like weights: the value of rank r is picked with probability proportional to 1 / r^skew,
+    so skew 0 is uniform and higher skew concentrates rows on the first values.
+    """
+    return list(accumulate(1 / (rank ** skew) for rank in range(1, count + 1)))
+
+
+def generate_employees(
+    count: int,
+    positions: int = 10,
+    position_skew: float = 0.0,
+    salary_null_fraction: float = 0.0,
+    seed: int = 0
+) -> Table:
+    """
+    Employees with ids 0..count-1, positions drawn from `positions` distinct values and salaries
+    in steps of 1000, some of which may be NULL.
+    """
+    generator = random.Random(seed)
+    weights = get_skewed_weights(positions, position_skew)
+    position_names = [f'Position {i}' for i in range(positions)]
+    employees = set()
+    for i in range(count):
+        position, = generator.choices(position_names, cum_weights=weights)
+        salary: Optional[int] = None
+        if generator.random() >= salary_null_fraction:
+            salary = generator.randrange(30, 150) * 1000
+        employees.add(create_employee(i, f'Employee {i}', position, salary))
+    return employees
+
+
+def generate_tasks(
+    count: int,
+    employees: int,
+    employee_skew: float = 0.0,
+    completed_fraction: float = 0.5,
+    seed: int = 0
+) -> Table:
+    """
+    Tasks assigned to employees 0..employees-1, with skew a few employees get most of the tasks,
+    which makes their join keys heavy hitters.
+    """
+    generator = random.Random(seed)
+    weights = get_skewed_weights(employees, employee_skew)
+    employee_ids = range(employees)
+    return {
+        create_task(i, generator.choices(employee_ids, cum_weights=weights)[0], generator.random() < completed_fraction)
+        for i in range(count)
+    }
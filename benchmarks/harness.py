@@ -0,0 +1,134 @@
+"""
+Runs benchmark cases and reports throughput, latency percentiles and peak memory, results are saved
+as JSON so runs can be compared.
+"""
+import json
+import platform
+import time
+import tracemalloc
+from typing import Callable, Optional, Any
+
+# function running the measured operation once and returning the number of produced rows
+Operation = Callable[[], int]
+
+
+def get_percentile(values: list[float], percentile: float) -> float:
+    """
+    Percentile with linear interpolation between the closest ranks.
+    """
+    values = sorted(values)
+    position = (len(values) - 1) * percentile / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def measure(operation: Operation, repeat: int, warmup: int = 1) -> dict[str, Any]:
+    """
+    Latencies come from timed runs, peak memory from one extra run under tracemalloc, which slows
+    the run down, so it isn't timed.
+    """
+    for _ in range(warmup):
+        operation()
+
+    latencies = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = operation()
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        operation()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    total = sum(latencies)
+    return {
+        'iterations': repeat,
+        'rows': rows,
+        'rows_per_second': rows * repeat / total if total > 0 else None,
+        'iterations_per_second': repeat / total if total > 0 else None,
+        'latency_ms': {
+            'mean': total / repeat * 1000,
+            'p50': get_percentile(latencies, 50) * 1000,
+            'p95': get_percentile(latencies, 95) * 1000,
+            'p99': get_percentile(latencies, 99) * 1000,
+            'max': max(latencies) * 1000,
+        },
+        'peak_memory_bytes': peak,
+    }
+
+
+def run(
+    cases: dict[str, Operation],
+    repeat: int,
+    metadata: dict[str, Any],
+    report: Optional[Callable[[str, dict[str, Any]], None]] = None
+) -> dict[str, Any]:
+    results = {}
+    for name, operation in cases.items():
+        results[name] = measure(operation, repeat)
+        if report is not None:
+            report(name, results[name])
+
+    return {
+        'metadata': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            **metadata
+        },
+        'results': results,
+    }
+
+
+def format_header() -> str:
+    return f'{"benchmark":<28} {"rows":>9} {"rows/s":>12} {"p50 ms":>10} {"p95 ms":>10} {"p99 ms":>10} {"peak MiB":>9}'
+
+
+def format_result(name: str, result: dict[str, Any]) -> str:
+    latency = result['latency_ms']
+    throughput = result['rows_per_second']
+    return (
+        f'{name:<28} {result["rows"]:>9} {"-" if throughput is None else f"{throughput:.0f}":>12} '
+        f'{latency["p50"]:>10.2f} {latency["p95"]:>10.2f} {latency["p99"]:>10.2f} '
+        f'{result["peak_memory_bytes"] / 2 ** 20:>9.1f}'
+    )
+
+
+def compare(results: dict[str, Any], baseline: dict[str, Any]) -> list[str]:
+    """
+    Lines with the change of median latency and peak memory of each benchmark present in both runs.
+    """
+    lines = [f'{"benchmark":<28} {"p50 ms":>10} {"baseline":>10} {"change":>8} {"peak change":>12}']
+    for name, result in results['results'].items():
+        other = baseline['results'].get(name)
+        if other is None:
+            continue
+
+        p50, baseline_p50 = result['latency_ms']['p50'], other['latency_ms']['p50']
+        peak, baseline_peak = result['peak_memory_bytes'], other['peak_memory_bytes']
+        lines.append(
+            f'{name:<28} {p50:>10.2f} {baseline_p50:>10.2f} {format_change(p50, baseline_p50):>8} '
+            f'{format_change(peak, baseline_peak):>12}'
+        )
+    return lines
+
+
+def format_change(value: float, baseline: float) -> str:
+    if baseline == 0:
+        return '-'
+    return f'{(value - baseline) / baseline * 100:+.1f}%'
+
+
+def save(results: dict[str, Any], path: str):
+    with open(path, 'w') as file:
+        json.dump(results, file, indent=2)
+
+
+def load(path: str) -> dict[str, Any]:
+    with open(path) as file:
+        return json.load(file)
@@ -0,0 +1,71 @@
+"""
+Evaluation time of filter and join conditions: interpreted condition objects, which is how the executor
+evaluated them before, against predicates compiled into a single function.
+
+    python -m benchmarks.predicate_benchmark
+"""
+import random
+import timeit
+
+from models import Record
+from predicate_compiler import compile_predicate, compile_join_predicate
+from query_plan_builder import ComparisonCondition, LogicalCondition, BinaryCondition, Column
+
+ROWS = 100_000
+JOIN_ROWS = 300
+
+
+def create_records(count: int) -> list[Record]:
+    random.seed(0)
+    return [
+        Record.joined(
+            Record(id=i, salary=random.choice([None, *range(30000, 120000, 5000)]), position=random.choice(['Sales', 'HR'])),
+            Record(id=i, employee_id=random.randrange(count), completed=random.random() < 0.5)
+        )
+        for i in range(count)
+    ]
+
+
+def benchmark(name: str, interpreted, compiled):
+    interpreted_seconds = min(timeit.repeat(interpreted, number=1, repeat=3))
+    compiled_seconds = min(timeit.repeat(compiled, number=1, repeat=3))
+    print(
+        f'{name:<10} interpreted {interpreted_seconds * 1000:>8.1f} ms   compiled {compiled_seconds * 1000:>8.1f} ms'
+        f'   speedup {interpreted_seconds / compiled_seconds:.1f}x'
+    )
+
+
+def main():
+    records = create_records(ROWS)
+    condition = LogicalCondition(
+        'or',
+        LogicalCondition(
+            'and',
+            ComparisonCondition(Column('left.salary'), 50000, '>'),
+            ComparisonCondition(Column('left.position'), 'Sales', '=')
+        ),
+        ComparisonCondition(Column('right.completed'), True, '=')
+    )
+    executable = condition.get_executable_condition()
+    predicate = compile_predicate(condition)
+    benchmark(
+        'filter',
+        lambda: sum(1 for record in records if executable(record)),
+        lambda: sum(1 for record in records if predicate(record))
+    )
+
+    left = [record.left for record in records[:JOIN_ROWS]]
+    right = [record.right for record in records[:JOIN_ROWS]]
+    conditions = [BinaryCondition('id', 'employee_id', '='), BinaryCondition('salary', 'id', '>')]
+    # the executor used to get the executable conditions for every pair of records
+    join = lambda l, r: all(condition.get_executable_condition()(l, r) for condition in conditions)
+    join_predicate = compile_join_predicate(conditions)
+    benchmark(
+        'join',
+        lambda: sum(1 for l in left for r in right if join(l, r)),
+        lambda: sum(1 for l in left for r in right if join_predicate(l, r))
+    )
+
+
+if __name__ == '__main__':
+    main()
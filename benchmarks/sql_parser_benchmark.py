@@ -0,0 +1,32 @@
+"""
+Parse time of generated queries with a growing number of `or` terms, the time per term should stay flat.
+
+    python -m benchmarks.sql_parser_benchmark
+"""
+import timeit
+
+from sql_parser import parse_sql
+
+TERMS = [10, 100, 1000, 10000]
+
+
+def create_query(terms: int) -> str:
+    conditions = ' or '.join([f"(employees.id = {i} and employees.name != 'name {i}')" for i in range(terms)])
+    return (
+        'select employees.id, employees.name, tasks.id from employees '
+        'left outer join tasks on employees.id = tasks.employee_id '
+        f'where {conditions} order by employees.id desc'
+    )
+
+
+def main():
+    print(f'{"terms":>8} {"length":>10} {"parse ms":>10} {"us/term":>10}')
+    for terms in TERMS:
+        query = create_query(terms)
+        repeat = max(1, 1000 // terms)
+        seconds = min(timeit.repeat(lambda: parse_sql(query), number=repeat, repeat=3)) / repeat
+        print(f'{terms:>8} {len(query):>10} {seconds * 1000:>10.3f} {seconds * 1e6 / terms:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmarks of the database engine operators, the SQL parser and end-to-end queries over generated
+employees and tasks. Results are printed and optionally saved as JSON, a saved run can be used
+as the baseline of another one.
+
+    python -m benchmarks.suite --scale 10000 --output results.json
+    python -m benchmarks.suite --scale 10000 --baseline results.json --filter join
+"""
+import argparse
+from typing import Any
+
+from aggregation import Aggregate
+from benchmarks.data import generate_employees, generate_tasks
+from benchmarks.harness import Operation, run, save, load, compare, format_header, format_result
+from benchmarks.sql_parser_benchmark import create_query
+from database_engine import select, projection, rename, cross_join, inner_join, left_outer_join, semi_join, \
+    anti_join, hash_inner_join, hash_left_outer_join, hash_semi_join, hash_anti_join, index_nested_loop_join, \
+    order_by, sort_by, aggregate, iter_merge_join, iter_range_join, iter_grace_hash_join, BATCH_SIZE
+from indexes import HashIndex
+from query_plan_executor import execute_query_plan
+from sql_compiler import compile_sql
+from sql_parser import parse_sql
+
+QUERIES = {
+    'query_filter_sort': (
+        'select employees.id, employees.name from employees '
+        "where employees.salary > 100000 and employees.position != 'Position 0' order by employees.salary desc"
+    ),
+    'query_join': (
+        'select employees.name, tasks.id from employees '
+        'join tasks on employees.id = tasks.employee_id where tasks.completed = true'
+    ),
+    'query_left_join_sort': (
+        'select employees.id, tasks.id from employees '
+        'left outer join tasks on employees.id = tasks.employee_id order by employees.id, tasks.id'
+    ),
+    'query_filter_sort_page': (
+        'select employees.id, employees.name from employees '
+        "where employees.salary > 100000 and employees.position != 'Position 0' order by employees.salary desc "
+        'limit 20 offset 100'
+    ),
+    'query_join_page': (
+        'select employees.name, tasks.id from employees '
+        'join tasks on employees.id = tasks.employee_id where tasks.completed = true limit 20'
+    ),
+    'query_group_by': (
+        'select employees.position, count(*) as tasks, avg(employees.salary) as salary from employees '
+        'join tasks on employees.id = tasks.employee_id group by employees.position having count(*) > 10'
+    ),
+}
+
+
+def create_cases(scale: int, skew: float) -> dict[str, Operation]:
+    """
+    Operators with a hash table or an index run on `scale` employees and 10 times more tasks,
+    nested loops and the cross product on a 20 times smaller sample.
+    """
+    employees = generate_employees(scale, position_skew=skew, salary_null_fraction=0.05)
+    tasks = generate_tasks(scale * 10, scale, employee_skew=skew)
+    small_employees = {record for record in employees if record.id < max(5, scale // 20)}
+    small_tasks = {record for record in tasks if record.id < max(50, scale // 2)}
+    task_index = HashIndex('employee_id', tasks)
+    employees_by_id = sorted(employees, key=lambda record: record.id)
+    tasks_by_employee = sorted(tasks, key=lambda record: record.employee_id)
+    small_by_salary = sorted(
+        [record for record in small_employees if record.salary is not None], key=lambda record: record.salary
+    )
+
+    def equal_ids(left, right) -> bool:
+        return left.id == right.employee_id
+
+    def lower_salary(left, right) -> bool:
+        return left.salary is not None and right.salary is not None and left.salary < right.salary
+
+    def compare_salaries(left, right) -> int:
+        return (left.salary or 0) - (right.salary or 0)
+
+    cases: dict[str, Any] = {
+        'select': lambda: len(select(tasks, lambda record: record.completed)),
+        'projection': lambda: len(projection(tasks, {'id', 'employee_id'})),
+        'rename': lambda: len(rename(tasks, {'employee_id': 'owner'})),
+        'cross_join': lambda: len(cross_join(small_employees, small_employees)),
+        'inner_join': lambda: len(inner_join(small_employees, small_tasks, equal_ids)),
+        'left_outer_join': lambda: len(left_outer_join(small_employees, small_tasks, equal_ids)),
+        'semi_join': lambda: len(semi_join(small_employees, small_tasks, equal_ids)),
+        'anti_join': lambda: len(anti_join(small_employees, small_tasks, equal_ids)),
+        'hash_inner_join': lambda: len(hash_inner_join(employees, tasks, ['id'], ['employee_id'])),
+        'hash_left_outer_join': lambda: len(hash_left_outer_join(employees, tasks, ['id'], ['employee_id'])),
+        'hash_semi_join': lambda: len(hash_semi_join(employees, tasks, ['id'], ['employee_id'])),
+        'hash_anti_join': lambda: len(hash_anti_join(employees, tasks, ['id'], ['employee_id'])),
+        # the build side is 10 times larger than the memory limit, so it's partitioned to disk
+        'grace_hash_join': lambda: sum(1 for _ in iter_grace_hash_join(
+            iter(employees), tasks, ['id'], ['employee_id'], memory_limit=max(1, scale)
+        )),
+        'merge_join': lambda: sum(1 for _ in iter_merge_join(employees_by_id, tasks_by_employee, ['id'], ['employee_id'])),
+        'range_join': lambda: sum(
+            1 for _ in iter_range_join(small_by_salary, small_by_salary, 'salary', ('salary', False), None)
+        ),
+        'range_nested_loop_join': lambda: len(inner_join(small_employees, small_employees, lower_salary)),
+        'index_nested_loop_join': lambda: len(index_nested_loop_join(employees, task_index.lookup, 'id')),
+        'order_by': lambda: len(order_by(employees, compare_salaries)),
+        'sort_by': lambda: len(sort_by(tasks, lambda record: record.employee_id)),
+        'aggregate': lambda: len(aggregate(tasks, ['employee_id'], {'tasks': Aggregate('count')})),
+    }
+
+    for terms in (100, 1000):
+        query = create_query(terms)
+        cases[f'parse_sql_{terms}_terms'] = lambda query=query: len(parse_sql(query))
+
+    tables = {'employees': employees, 'tasks': tasks}
+    for name, sql in QUERIES.items():
+        plan = compile_sql(sql)
+        cases[name] = lambda plan=plan: len(execute_query_plan(plan, tables))
+        cases[f'{name}_batches'] = lambda plan=plan: len(execute_query_plan(plan, tables, batch_size=BATCH_SIZE))
+
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, default=10_000, help='number of employees, there are 10 times more tasks')
+    parser.add_argument('--skew', type=float, default=1.0, help='Zipf exponent of task owners and positions')
+    parser.add_argument('--repeat', type=int, default=5, help='timed runs of each benchmark')
+    parser.add_argument('--filter', default='', help='run only benchmarks containing the text')
+    parser.add_argument('--output', help='JSON file to save the results to')
+    parser.add_argument('--baseline', help='JSON file with results to compare with')
+    arguments = parser.parse_args()
+
+    cases = {
+        name: operation
+        for name, operation in create_cases(arguments.scale, arguments.skew).items()
+        if arguments.filter in name
+    }
+    print(format_header())
+    results = run(
+        cases,
+        arguments.repeat,
+        {'scale': arguments.scale, 'skew': arguments.skew},
+        lambda name, result: print(format_result(name, result))
+    )
+
+    if arguments.output is not None:
+        save(results, arguments.output)
+    if arguments.baseline is not None:
+        print()
+        print('\n'.join(compare(results, load(arguments.baseline))))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Throughput of small writes to a database backed by the write-ahead log: every write is synced
+on its own against group commit, where concurrent writers share fsyncs.
+
+    python -m benchmarks.wal_benchmark
+"""
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from database import Database
+from models import Record
+
+WRITERS = 16
+WRITES = 2_000
+
+
+def benchmark(group_commit: bool):
+    with tempfile.TemporaryDirectory() as directory, Database(directory, group_commit=group_commit) as database:
+        database.create_table('events')
+        flushes = database.log.flushes
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=WRITERS) as executor:
+            list(executor.map(lambda i: database.insert('events', [Record(id=i, value=i * 2)]), range(WRITES)))
+        seconds = time.perf_counter() - start
+
+        print(
+            f'{"group commit" if group_commit else "fsync per write":<16} {WRITES / seconds:>10.0f} writes/s'
+            f'   {database.log.flushes - flushes:>6} fsyncs'
+        )
+
+
+def main():
+    benchmark(group_commit=False)
+    benchmark(group_commit=True)
+
+
+if __name__ == '__main__':
+    main()
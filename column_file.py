@@ -0,0 +1,288 @@
+import json
+import mmap
+import struct
+from array import array
+from typing import Any, Iterable, Iterator, Optional
+
+from models import Record, Schema, TABLE_IDS
+from query_plan_builder import Condition, ConstantCondition, ComparisonCondition, LogicalCondition, Column, \
+    FLIPPED_OPERATORS
+
+MAGIC = b'RECCOL01'
+FOOTER_LENGTH = struct.Struct('<Q')
+BLOCK_SIZE = 4096
+ALIGNMENT = 8
+
+# column types and the array type codes of their values
+TYPE_CODES = {
+    'bool': 'B',
+    'int64': 'q',
+    'float64': 'd',
+}
+STRING = 'string'
+
+# [min, max, number of NULLs] of a column in a block
+BlockStatistics = list
+
+
+class ColumnFileError(Exception):
+    pass
+
+
+def write_column_file(
+    path: str,
+    records: Iterable[Record],
+    columns: Optional[Iterable[str]] = None,
+    block_size: int = BLOCK_SIZE
+):
+    """
+    Writes flat records column by column: a fixed-width array of values and a validity array per column,
+    strings are stored as offsets into a byte array. The footer holds the schema, positions of the arrays
+    and min/max of every column in each block of rows.
+    """
+    records = list(records)
+    if columns is None:
+        if len(records) == 0:
+            raise ColumnFileError('Columns can\'t be inferred from no records')
+        columns = records[0].keys()
+    columns = Schema.of(columns).columns
+
+    with open(path, 'wb') as file:
+        file.write(MAGIC)
+        footer = {'rows': len(records), 'block_size': block_size, 'columns': []}
+        for column in columns:
+            values = []
+            for record in records:
+                if record.keys() != columns:
+                    raise ColumnFileError(f'Record columns {list(record.keys())} don\'t match {list(columns)}')
+                values.append(record[column])
+
+            column_type = get_column_type(column, values)
+            sections = {}
+            for name, data in encode_column(column_type, values).items():
+                file.write(b'\0' * (-file.tell() % ALIGNMENT))
+                sections[name] = [file.tell(), len(data)]
+                file.write(data)
+
+            footer['columns'].append({
+                'name': column,
+                'type': column_type,
+                'sections': sections,
+                'blocks': [get_block_statistics(values[start:start + block_size]) for start in range(0, len(values), block_size)]
+            })
+
+        data = json.dumps(footer).encode('utf-8')
+        file.write(data)
+        file.write(FOOTER_LENGTH.pack(len(data)))
+        file.write(MAGIC)
+
+
+def get_column_type(column: str, values: list[Any]) -> str:
+    types = {type(value) for value in values if value is not None}
+    if types == {bool}:
+        return 'bool'
+    if types <= {int}:
+        return 'int64'
+    if types <= {int, float}:
+        return 'float64'
+    if types == {str}:
+        return STRING
+
+    raise ColumnFileError(f'Column "{column}" has values of unsupported types {sorted(t.__name__ for t in types)}')
+
+
+def encode_column(column_type: str, values: list[Any]) -> dict[str, bytes]:
+    valid = array('B', [value is not None for value in values]).tobytes()
+    if column_type == STRING:
+        offsets = array('q', [0])
+        data = bytearray()
+        for value in values:
+            if value is not None:
+                data += value.encode('utf-8')
+            offsets.append(len(data))
+        return {'valid': valid, 'offsets': offsets.tobytes(), 'data': bytes(data)}
+
+    fill = False if column_type == 'bool' else 0
+    try:
+        data = array(TYPE_CODES[column_type], [fill if value is None else value for value in values]).tobytes()
+    except OverflowError as error:
+        raise ColumnFileError(f'Value doesn\'t fit into {column_type}') from error
+    return {'valid': valid, 'values': data}
+
+
+def get_block_statistics(values: list[Any]) -> BlockStatistics:
+    present = [value for value in values if value is not None]
+    if len(present) == 0:
+        return [None, None, len(values)]
+    return [min(present), max(present), len(values) - len(present)]
+
+
+def get_type_code(column_type: str, section: str) -> str:
+    match section:
+        case 'valid' | 'data':
+            return 'B'
+        case 'offsets':
+            return 'q'
+    return TYPE_CODES[column_type]
+
+
+class MappedColumn:
+    """
+    Column arrays of a memory-mapped file, values are decoded only for the blocks which are read.
+    """
+
+    def __init__(self, name: str, column_type: str, buffer: memoryview, sections: dict[str, list[int]],
+                 blocks: list[BlockStatistics]):
+        self.name = name
+        self.type = column_type
+        self.blocks = blocks
+        self.views = {
+            section: buffer[offset:offset + length].cast(get_type_code(column_type, section))
+            for section, (offset, length) in sections.items()
+        }
+
+    def read(self, start: int, end: int, nulls: int) -> list[Any]:
+        if self.type == STRING:
+            offsets = self.views['offsets'][start:end + 1].tolist()
+            base = offsets[0]
+            data = self.views['data'][base:offsets[-1]].tobytes()
+            values = [data[offsets[i] - base:offsets[i + 1] - base].decode('utf-8') for i in range(end - start)]
+        else:
+            values = self.views['values'][start:end].tolist()
+            if self.type == 'bool':
+                values = [value == 1 for value in values]
+
+        if nulls > 0:
+            valid = self.views['valid'][start:end].tolist()
+            values = [value if is_valid else None for value, is_valid in zip(values, valid)]
+        return values
+
+    def release(self):
+        for view in self.views.values():
+            view.release()
+
+
+class MappedColumnTable:
+    """
+    Read-only table over a memory-mapped column file. Opening only reads the footer, records are
+    decoded block by block while the table is scanned and blocks whose min/max can't satisfy
+    the filter are skipped without touching their data.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.__map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.__buffer = memoryview(self.__map)
+        self.columns: dict[str, MappedColumn] = {}
+
+        footer_end = len(self.__map) - len(MAGIC) - FOOTER_LENGTH.size
+        if footer_end < len(MAGIC) or self.__map[:len(MAGIC)] != MAGIC or self.__map[-len(MAGIC):] != MAGIC:
+            self.close()
+            raise ColumnFileError(f'"{path}" is not a column file')
+
+        length, = FOOTER_LENGTH.unpack_from(self.__map, footer_end)
+        footer = json.loads(self.__map[footer_end - length:footer_end].decode('utf-8'))
+        self.rows: int = footer['rows']
+        self.block_size: int = footer['block_size']
+        self.columns = {
+            column['name']: MappedColumn(column['name'], column['type'], self.__buffer, column['sections'], column['blocks'])
+            for column in footer['columns']
+        }
+        self.skipped_blocks = 0
+        # the table is read-only, so its version never changes
+        self.version = (next(TABLE_IDS), 0)
+
+    def __enter__(self) -> 'MappedColumnTable':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for column in self.columns.values():
+            column.release()
+        self.__buffer.release()
+        self.__map.close()
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.scan()
+
+    def __contains__(self, record: Record) -> bool:
+        return any(record == stored for stored in self)
+
+    def __repr__(self):
+        return f'MappedColumnTable(path="{self.path}", columns={list(self.columns)}, rows={self.rows})'
+
+    def scan(self, columns: Optional[Iterable[str]] = None, condition: Optional[Condition] = None) -> Iterator[Record]:
+        """
+        Reads records with the given columns, all by default. Blocks for which the condition on table columns
+        can't hold are skipped, the condition still has to be applied to the returned records.
+        """
+        names = self.columns.keys() if columns is None else columns
+        selected = [self.columns[name] for name in Schema.of(names).columns if name in self.columns]
+        schema = Schema.of(column.name for column in selected)
+
+        for block, start in enumerate(range(0, self.rows, self.block_size)):
+            if condition is not None and not may_match(condition, self.get_block_statistics(block)):
+                self.skipped_blocks += 1
+                continue
+
+            end = min(start + self.block_size, self.rows)
+            values = [column.read(start, end, column.blocks[block][2]) for column in selected]
+            for row in zip(*values):
+                yield Record.from_values(schema, row)
+
+    def get_block_statistics(self, block: int) -> dict[str, BlockStatistics]:
+        return {name: column.blocks[block] for name, column in self.columns.items()}
+
+
+def may_match(condition: Condition, statistics: dict[str, BlockStatistics]) -> bool:
+    """
+    Whether a block with the column statistics may contain records satisfying the condition.
+    """
+    match condition:
+        case ConstantCondition(value=value):
+            return value
+        case LogicalCondition(operator='and', left=left, right=right):
+            return may_match(left, statistics) and may_match(right, statistics)
+        case LogicalCondition(operator='or', left=left, right=right):
+            return may_match(left, statistics) or may_match(right, statistics)
+        case ComparisonCondition(left=Column(name=name), right=None, operator='is') if name in statistics:
+            return statistics[name][2] > 0
+        case ComparisonCondition(left=Column(name=name), right=value, operator=operator) \
+                if name in statistics and not isinstance(value, Column) and operator in FLIPPED_OPERATORS:
+            return may_compare(statistics[name], operator, value)
+        case ComparisonCondition(left=value, right=Column(name=name), operator=operator) \
+                if name in statistics and not isinstance(value, Column) and operator in FLIPPED_OPERATORS:
+            return may_compare(statistics[name], FLIPPED_OPERATORS[operator], value)
+
+    return True
+
+
+def may_compare(statistics: BlockStatistics, operator: str, value: Any) -> bool:
+    low, high, _ = statistics
+    if value is None or low is None:
+        # comparisons with NULL are false
+        return False
+
+    try:
+        match operator:
+            case '=':
+                return low <= value <= high
+            case '!=' | '<>':
+                return not (low == value == high)
+            case '<':
+                return low < value
+            case '<=':
+                return low <= value
+            case '>':
+                return high > value
+            case '>=':
+                return high >= value
+    except TypeError:
+        pass
+    return True
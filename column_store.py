@@ -0,0 +1,225 @@
+import operator
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+import numpy as np
+
+from models import Record, Schema, Projection, Table
+from query_plan_builder import BinaryCondition
+from sql_parser import is_literal, parse_literal, InvalidTokenError
+
+Mask = np.ndarray
+
+ARRAY_OPERATORS: dict[str, Callable[[Any, Any], Mask]] = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+FILL_VALUES = {
+    np.dtype(bool): False,
+    np.dtype(np.int64): 0,
+    np.dtype(np.float64): 0.0,
+}
+
+
+class ColumnTable:
+    """
+    Column-oriented table: one NumPy array per column plus a validity mask which is False for NULLs.
+    Filters are evaluated as boolean masks over whole columns and projections share the column arrays.
+    """
+
+    def __init__(self, columns: dict[str, np.ndarray], valid: dict[str, Mask], nested: Optional[dict[str, Mask]] = None):
+        self.columns = columns
+        self.valid = valid
+        # nested records by path, e.g. 'right', with a mask which is False where the record is absent
+        self.nested = nested or {}
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.to_records()
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __eq__(self, other):
+        if not isinstance(other, ColumnTable):
+            return False
+
+        return self.to_table() == other.to_table()
+
+    def __repr__(self):
+        return f'ColumnTable(columns={list(self.columns)}, rows={len(self)})'
+
+    @staticmethod
+    def from_records(records: Iterable[Record], columns: Optional[list[str]] = None) -> 'ColumnTable':
+        records = list(records)
+        if columns is None:
+            columns = sorted(set().union(*(record.columns() for record in records)))
+
+        arrays = {}
+        valid = {}
+        for column in columns:
+            arrays[column], valid[column] = to_array([record[column] for record in records])
+
+        nested = {
+            path: np.array([has_path(record, path) for record in records], dtype=bool)
+            for path in get_nested_paths(columns)
+        }
+        return ColumnTable(arrays, valid, nested)
+
+    def to_records(self) -> Iterator[Record]:
+        names = list(self.columns)
+        schema = Schema.of(names)
+        values = [
+            [value if is_valid else None for value, is_valid in zip(self.columns[name].tolist(), self.valid[name].tolist())]
+            for name in schema.columns
+        ]
+        records = (Record.from_values(schema, row) for row in zip(*values))
+
+        if any('.' in name for name in names):
+            # flat records address nested columns like 'left.id' directly, projection nests them
+            # into the nested records present in the row
+            return self.nest(records, names)
+
+        return records
+
+    def nest(self, records: Iterator[Record], names: list[str]) -> Iterator[Record]:
+        paths = [path for path in self.nested if any(name.startswith(f'{path}.') for name in names)]
+        if not paths:
+            yield from map(Projection(set(names)), records)
+            return
+
+        # rows with the same absent nested records share a projection
+        projections: dict[tuple[str, ...], Projection] = {}
+        for record, present in zip(records, zip(*(self.nested[path].tolist() for path in paths))):
+            absent = tuple(f'{path}.' for path, is_present in zip(paths, present) if not is_present)
+            projection = projections.get(absent)
+            if projection is None:
+                projection = projections[absent] = Projection({name for name in names if not name.startswith(absent)})
+            yield projection(record)
+
+    def to_table(self) -> Table:
+        return Table(self.to_records())
+
+    def filter(self, mask: Mask) -> 'ColumnTable':
+        return ColumnTable(
+            {name: values[mask] for name, values in self.columns.items()},
+            {name: valid[mask] for name, valid in self.valid.items()},
+            {path: present[mask] for path, present in self.nested.items()}
+        )
+
+    def select(self, condition: BinaryCondition | list[BinaryCondition] | tuple) -> 'ColumnTable':
+        return self.filter(compile_mask(self, condition))
+
+    def projection(self, columns: set[str]) -> 'ColumnTable':
+        return ColumnTable(
+            {name: values for name, values in self.columns.items() if name in columns},
+            {name: valid for name, valid in self.valid.items() if name in columns},
+            self.nested
+        )
+
+
+def get_nested_paths(columns: list[str]) -> set[str]:
+    """
+    Paths of the nested records holding the columns, e.g. 'left' and 'left.manager' for 'left.manager.id'.
+    """
+    paths = set()
+    for column in columns:
+        path = column.split('.')
+        paths.update('.'.join(path[:length]) for length in range(1, len(path)))
+    return paths
+
+
+def has_path(record: Record, path: str) -> bool:
+    value = record
+    for name in path.split('.'):
+        if not isinstance(value, Record) or name not in value:
+            return False
+        value = value[name]
+    return isinstance(value, Record)
+
+
+def to_array(values: list[Any]) -> tuple[np.ndarray, Mask]:
+    valid = np.array([value is not None for value in values], dtype=bool)
+    types = {type(value) for value in values if value is not None}
+
+    if types == {bool}:
+        dtype = np.dtype(bool)
+    elif types == {int}:
+        dtype = np.dtype(np.int64)
+    elif types and types <= {int, float}:
+        dtype = np.dtype(np.float64)
+    elif types == {str}:
+        dtype = np.dtype(str)
+    else:
+        dtype = np.dtype(object)
+
+    fill = FILL_VALUES.get(dtype, '' if dtype.kind == 'U' else None)
+    array = np.array([fill if value is None else value for value in values], dtype=dtype)
+    return array, valid
+
+
+def compile_mask(table: ColumnTable, condition: BinaryCondition | list[BinaryCondition] | tuple) -> Mask:
+    """
+    Evaluates a condition over the whole table at once. Supported conditions are BinaryCondition
+    (operands are column names or literals), a list of them combined with AND, and condition trees
+    produced by sql_parser.read_conditions. Comparisons involving NULL are false.
+    """
+    match condition:
+        case list():
+            mask = np.ones(len(table), dtype=bool)
+            for item in condition:
+                mask &= compile_mask(table, item)
+            return mask
+        case BinaryCondition(left=left, right=right, operator=comparison):
+            return compare(table, left, comparison, right)
+        case ('and', left, right):
+            return compile_mask(table, left) & compile_mask(table, right)
+        case ('or', left, right):
+            return compile_mask(table, left) | compile_mask(table, right)
+        case (left, comparison, right):
+            return compare(table, left, comparison, right)
+
+    raise ValueError(f'Unsupported condition {condition}')
+
+
+def compare(table: ColumnTable, left: str, comparison: str, right: str) -> Mask:
+    left_values, left_valid = get_operand(table, left)
+    right_values, right_valid = get_operand(table, right)
+
+    if comparison.lower() == 'is':
+        if right_values is not None:
+            raise InvalidTokenError(f'Only "is null" comparisons are supported, got "{left} is {right}"')
+        return to_mask(table, np.logical_not(left_valid) if isinstance(left_valid, np.ndarray) else left_values is None)
+
+    if left_values is None or right_values is None:
+        return to_mask(table, False)
+
+    # NULLs are filled with None in object columns, so only valid rows are compared
+    valid = to_mask(table, left_valid & right_valid)
+    mask = np.zeros(len(table), dtype=bool)
+    mask[valid] = ARRAY_OPERATORS[comparison](get_valid_values(left_values, valid), get_valid_values(right_values, valid))
+    return mask
+
+
+def get_valid_values(values: Any, valid: Mask) -> Any:
+    return values[valid] if isinstance(values, np.ndarray) else values
+
+
+def to_mask(table: ColumnTable, value: Mask | bool) -> Mask:
+    if isinstance(value, np.ndarray):
+        return value
+    return np.full(len(table), bool(value))
+
+
+def get_operand(table: ColumnTable, operand: str) -> tuple[Any, Mask | bool]:
+    if operand in table.columns:
+        return table.columns[operand], table.valid[operand]
+
+    if is_literal(operand):
+        return parse_literal(operand), True
+
+    raise InvalidTokenError(f'Unknown column "{operand}"')
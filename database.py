@@ -0,0 +1,330 @@
+import os
+import pickle
+import threading
+from collections import Counter
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from models import Record, Condition, Table, TABLE_IDS
+from query_plan_builder import QueryPlan
+from query_plan_executor import execute_query_plan
+from write_ahead_log import WriteAheadLog
+
+LOG_FILE = 'wal.log'
+SNAPSHOT_FILE = 'snapshot.pickle'
+GC_INTERVAL = 1.0
+
+Changes = dict[str, Any] | Callable[[Record], Record]
+
+
+class DatabaseError(Exception):
+    pass
+
+
+class RowVersion:
+    """
+    Version of a row created by one transaction and deleted by another one, None while it's live.
+    """
+    __slots__ = ('record', 'created', 'deleted')
+
+    def __init__(self, record: Record, created: int):
+        self.record = record
+        self.created = created
+        self.deleted: Optional[int] = None
+
+    def is_visible(self, transaction: int) -> bool:
+        return self.created <= transaction and (self.deleted is None or self.deleted > transaction)
+
+    def __repr__(self):
+        return f'RowVersion(record={self.record}, created={self.created}, deleted={self.deleted})'
+
+
+class VersionedTable:
+    """
+    Row versions of a table. Only writers, which the database serializes, change the table: they append
+    new versions and mark deleted ones. Readers iterate over the version list without locks, garbage
+    collection replaces the list instead of changing it, so running scans keep reading the old one.
+    """
+
+    def __init__(self, created: int):
+        self.id = next(TABLE_IDS)
+        self.created = created
+        # last transaction which changed the table
+        self.modified = created
+        self.versions: list[RowVersion] = []
+        self.live: dict[Record, RowVersion] = {}
+
+    def insert(self, record: Record, transaction: int):
+        if record not in self.live:
+            version = self.live[record] = RowVersion(record, transaction)
+            self.versions.append(version)
+            self.modified = transaction
+
+    def delete(self, record: Record, transaction: int):
+        version = self.live.pop(record, None)
+        if version is not None:
+            version.deleted = transaction
+            self.modified = transaction
+
+    def read(self, transaction: int) -> Iterator[Record]:
+        for version in self.versions:
+            if version.is_visible(transaction):
+                yield version.record
+
+    def collect_garbage(self, oldest: int) -> int:
+        """
+        Removes versions deleted before the oldest transaction any snapshot reads, returns their number.
+        """
+        versions = [version for version in self.versions if version.deleted is None or version.deleted > oldest]
+        removed = len(self.versions) - len(versions)
+        if removed > 0:
+            self.versions = versions
+        return removed
+
+
+class SnapshotTable:
+    """
+    Read-only table with the rows visible to a snapshot.
+    """
+
+    def __init__(self, table: VersionedTable, transaction: int):
+        self.table = table
+        self.transaction = transaction
+        # snapshots of the same table contents have the same version, the contents are as of
+        # the last change the snapshot sees, or as of the snapshot if the table changed after it
+        self.version = (table.id, min(table.modified, transaction))
+        self.__length: Optional[int] = None
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.table.read(self.transaction)
+
+    def __len__(self) -> int:
+        if self.__length is None:
+            self.__length = sum(1 for _ in self)
+        return self.__length
+
+    def __contains__(self, record: Record) -> bool:
+        return any(record == visible for visible in self)
+
+    def __eq__(self, other):
+        if isinstance(other, (SnapshotTable, set, frozenset)):
+            return set(self) == set(other)
+        return False
+
+    def __repr__(self):
+        return f'SnapshotTable(transaction={self.transaction}, rows={len(self)})'
+
+
+class Snapshot:
+    """
+    Consistent view of the tables as of the last committed transaction. Versions the snapshot can read
+    are kept by the garbage collector until the snapshot is closed.
+    """
+
+    def __init__(self, database: 'Database', transaction: int, tables: dict[str, SnapshotTable]):
+        self.database = database
+        self.transaction = transaction
+        self.tables = tables
+        self.closed = False
+
+    def __enter__(self) -> dict[str, SnapshotTable]:
+        return self.tables
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.database.release_snapshot(self)
+
+
+class Database:
+    """
+    Tables which can be changed with INSERT, UPDATE and DELETE operations. Every operation is a transaction
+    identified by the log sequence number of its entry in the write-ahead log. Its changes are applied
+    in memory as new row versions and become visible once the log entry is durable, at which point
+    the operation returns.
+
+    Readers query a snapshot, so they see the tables as of one transaction and never wait for writers.
+    Versions no snapshot can see anymore are removed by a background garbage collector.
+
+    A checkpoint writes the live rows of all tables and empties the log, on startup the checkpoint is loaded
+    and the log entries written after it are replayed. The log stores the deleted and inserted records
+    of a change rather than the operation, so replaying an entry doesn't have to evaluate conditions again.
+    """
+
+    def __init__(self, directory: str, group_commit: bool = True, gc_interval: Optional[float] = GC_INTERVAL):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.__tables: dict[str, VersionedTable] = {}
+        self.__lock = threading.Lock()
+        self.__snapshot_lock = threading.Lock()
+        self.__snapshots: Counter[int] = Counter()
+        self.collected_versions = 0
+
+        lsn = self.__load_checkpoint()
+        for entry_lsn, (operation, table, deleted, inserted) in WriteAheadLog.recover(self.__path(LOG_FILE)):
+            if entry_lsn > lsn:
+                self.__apply(entry_lsn, operation, table, deleted, inserted)
+                lsn = entry_lsn
+
+        self.log = WriteAheadLog(self.__path(LOG_FILE), lsn, group_commit)
+        self.__committed = lsn
+
+        self.__stopped = threading.Event()
+        self.__collector = None
+        if gc_interval is not None:
+            self.__collector = threading.Thread(target=self.__collect_periodically, args=(gc_interval,), daemon=True)
+            self.__collector.start()
+
+    def __enter__(self) -> 'Database':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.__stopped.set()
+        if self.__collector is not None:
+            self.__collector.join()
+        self.log.close()
+
+    def create_table(self, name: str, records: Iterable[Record] = ()):
+        with self.__lock:
+            if name in self.__tables:
+                raise DatabaseError(f'Table "{name}" already exists')
+            lsn = self.__log('create', name, (), tuple(set(records)))
+        self.__commit(lsn)
+
+    def insert(self, name: str, records: Iterable[Record]) -> int:
+        """
+        Inserts records into the table and returns the number of new records.
+        """
+        with self.__lock:
+            table = self.__get_table(name)
+            inserted = {record for record in records if record not in table.live}
+            lsn = self.__log('insert', name, (), tuple(inserted))
+        self.__commit(lsn)
+        return len(inserted)
+
+    def update(self, name: str, condition: Condition, changes: Changes) -> int:
+        """
+        Replaces records satisfying the condition, changes are either new values of columns or
+        a function creating the new record. Returns the number of updated records.
+        """
+        change = changes if callable(changes) else lambda record: Record(dict(record.items()) | changes)
+        with self.__lock:
+            deleted = tuple(record for record in self.__get_table(name).live if condition(record))
+            lsn = self.__log('update', name, deleted, tuple(change(record) for record in deleted))
+        self.__commit(lsn)
+        return len(deleted)
+
+    def delete(self, name: str, condition: Condition) -> int:
+        """
+        Deletes records satisfying the condition and returns their number.
+        """
+        with self.__lock:
+            deleted = tuple(record for record in self.__get_table(name).live if condition(record))
+            lsn = self.__log('delete', name, deleted, ())
+        self.__commit(lsn)
+        return len(deleted)
+
+    def snapshot(self) -> Snapshot:
+        with self.__snapshot_lock:
+            transaction = self.__committed
+            self.__snapshots[transaction] += 1
+
+        tables = {
+            name: SnapshotTable(table, transaction)
+            for name, table in list(self.__tables.items())
+            if table.created <= transaction
+        }
+        return Snapshot(self, transaction, tables)
+
+    def release_snapshot(self, snapshot: Snapshot):
+        with self.__snapshot_lock:
+            self.__snapshots[snapshot.transaction] -= 1
+            if self.__snapshots[snapshot.transaction] == 0:
+                del self.__snapshots[snapshot.transaction]
+
+    def execute_query_plan(self, plan: QueryPlan, **options) -> Table:
+        with self.snapshot() as tables:
+            return execute_query_plan(plan, tables, **options)
+
+    def collect_garbage(self) -> int:
+        """
+        Removes row versions deleted before the oldest open snapshot, returns the number of removed versions.
+        """
+        with self.__lock:
+            with self.__snapshot_lock:
+                oldest = min(self.__snapshots, default=self.__committed)
+            removed = sum(table.collect_garbage(oldest) for table in self.__tables.values())
+            self.collected_versions += removed
+            return removed
+
+    def checkpoint(self):
+        with self.__lock:
+            self.log.flush()
+            checkpoint = {
+                'lsn': self.log.lsn,
+                'tables': {name: list(table.live) for name, table in self.__tables.items()}
+            }
+            path = self.__path(SNAPSHOT_FILE)
+            with open(path + '.tmp', 'wb') as file:
+                pickle.dump(checkpoint, file, protocol=pickle.HIGHEST_PROTOCOL)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(path + '.tmp', path)
+            self.log.reset()
+
+    def __log(self, operation: str, name: str, deleted: tuple[Record, ...], inserted: tuple[Record, ...]) -> int:
+        lsn = self.log.append((operation, name, deleted, inserted))
+        self.__apply(lsn, operation, name, deleted, inserted)
+        return lsn
+
+    def __commit(self, lsn: int):
+        """
+        Waits for the log entry and makes the transaction visible. The log is synced in order,
+        so all transactions with lower log sequence numbers are durable and applied as well.
+        """
+        self.log.wait(lsn)
+        with self.__snapshot_lock:
+            self.__committed = max(self.__committed, lsn)
+
+    def __apply(self, lsn: int, operation: str, name: str, deleted: Iterable[Record], inserted: Iterable[Record]):
+        if operation == 'create':
+            self.__tables[name] = VersionedTable(lsn)
+
+        table = self.__tables[name]
+        for record in deleted:
+            table.delete(record, lsn)
+        for record in inserted:
+            table.insert(record, lsn)
+
+    def __get_table(self, name: str) -> VersionedTable:
+        table = self.__tables.get(name)
+        if table is None:
+            raise DatabaseError(f'Table "{name}" doesn\'t exist')
+        return table
+
+    def __collect_periodically(self, interval: float):
+        while not self.__stopped.wait(interval):
+            self.collect_garbage()
+
+    def __load_checkpoint(self) -> int:
+        path = self.__path(SNAPSHOT_FILE)
+        if not os.path.exists(path):
+            return 0
+
+        with open(path, 'rb') as file:
+            checkpoint = pickle.load(file)
+
+        lsn = checkpoint['lsn']
+        for name, records in checkpoint['tables'].items():
+            table = self.__tables[name] = VersionedTable(lsn)
+            for record in records:
+                table.insert(record, lsn)
+        return lsn
+
+    def __path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
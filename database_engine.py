@@ -1,22 +1,458 @@
+import heapq
+import pickle
+import tempfile
+from collections import deque
 from functools import cmp_to_key
-from typing import Callable
+from itertools import islice, chain
+from typing import Callable, Optional, Iterable, Iterator, Collection, Any, IO
 
-from models import Table, Condition, Record, BiCondition
+from aggregation import Aggregate, Accumulator
+from models import Table, Condition, Record, BiCondition, Records, Projection
+
+
+def iter_select(records: Records, predicate: Condition) -> Iterator[Record]:
+    return filter(predicate, records)
+
+
+def iter_projection(records: Records, columns: set[str]) -> Iterator[Record]:
+    return map(Projection(columns), records)
+
+
+def iter_rename(records: Records, columns: dict[str, str]) -> Iterator[Record]:
+    return map(lambda r: r.with_aliases(columns), records)
+
+
+def iter_cross_join(left: Records, right: Records) -> Iterator[Record]:
+    right = materialize(right)
+    for left_record in left:
+        for right_record in right:
+            yield Record.joined(left_record, right_record)
+
+
+def iter_inner_join(left: Records, right: Records, condition: BiCondition) -> Iterator[Record]:
+    right = materialize(right)
+    for left_record in left:
+        for right_record in right:
+            if condition(left_record, right_record):
+                yield Record.joined(left_record, right_record)
+
+
+def iter_left_outer_join(left: Records, right: Records, condition: BiCondition) -> Iterator[Record]:
+    right = materialize(right)
+    for left_record in left:
+        matched = False
+        for right_record in right:
+            if condition(left_record, right_record):
+                matched = True
+                yield Record.joined(left_record, right_record)
+
+        if not matched:
+            yield Record.joined(left_record)
+
+
+def iter_semi_join(left: Records, right: Records, condition: BiCondition) -> Iterator[Record]:
+    """
+    Left records with at least one matching right record, each left record is returned once.
+    """
+    right = materialize(right)
+    for left_record in left:
+        if any(condition(left_record, right_record) for right_record in right):
+            yield left_record
+
+
+def iter_anti_join(left: Records, right: Records, condition: BiCondition) -> Iterator[Record]:
+    """
+    Left records without any matching right record.
+    """
+    right = materialize(right)
+    for left_record in left:
+        if not any(condition(left_record, right_record) for right_record in right):
+            yield left_record
+
+
+def iter_hash_inner_join(
+    left: Records,
+    right: Records,
+    left_columns: list[str],
+    right_columns: list[str],
+    build_left: Optional[bool] = None
+) -> Iterator[Record]:
+    """
+    Equi-join which builds a hash table on the smaller input and probes it with the other one.
+    When the size of the inputs is not known the right input is used as the build side,
+    unless the caller chooses the side. Records with NULL in any of the join columns never match.
+    """
+    if is_smaller(left, right) if build_left is None else build_left:
+        build = build_hash_table(left, left_columns)
+        for right_record in right:
+            for left_record in build.get(get_join_key(right_record, right_columns), ()):
+                yield Record.joined(left_record, right_record)
+        return
+
+    build = build_hash_table(right, right_columns)
+    for left_record in left:
+        for right_record in build.get(get_join_key(left_record, left_columns), ()):
+            yield Record.joined(left_record, right_record)
+
+
+def iter_hash_left_outer_join(
+    left: Records,
+    right: Records,
+    left_columns: list[str],
+    right_columns: list[str],
+    build_left: Optional[bool] = None
+) -> Iterator[Record]:
+    """
+    Left outer equi-join using a hash table built on the smaller input, or on the side chosen by the caller.
+    When the left input is the build side, matched keys are tracked during the probe
+    and the remaining left records are emitted without a right part afterwards.
+    """
+    if is_smaller(left, right) if build_left is None else build_left:
+        left = materialize(left)
+        build = build_hash_table(left, left_columns)
+        matched_keys = set()
+        for right_record in right:
+            key = get_join_key(right_record, right_columns)
+            left_records = build.get(key)
+            if left_records is None:
+                continue
+
+            matched_keys.add(key)
+            for left_record in left_records:
+                yield Record.joined(left_record, right_record)
+
+        for key, left_records in build.items():
+            if key not in matched_keys:
+                for left_record in left_records:
+                    yield Record.joined(left_record)
+
+        for left_record in left:
+            if get_join_key(left_record, left_columns) is None:
+                yield Record.joined(left_record)
+        return
+
+    build = build_hash_table(right, right_columns)
+    for left_record in left:
+        right_records = build.get(get_join_key(left_record, left_columns))
+        if right_records is None:
+            yield Record.joined(left_record)
+        else:
+            for right_record in right_records:
+                yield Record.joined(left_record, right_record)
+
+
+def iter_hash_semi_join(
+    left: Records,
+    right: Records,
+    left_columns: list[str],
+    right_columns: list[str]
+) -> Iterator[Record]:
+    """
+    Semi equi-join, only the join keys of the right input are kept in memory.
+    """
+    keys = build_key_set(right, right_columns)
+    for left_record in left:
+        if get_join_key(left_record, left_columns) in keys:
+            yield left_record
+
+
+def iter_hash_anti_join(
+    left: Records,
+    right: Records,
+    left_columns: list[str],
+    right_columns: list[str]
+) -> Iterator[Record]:
+    """
+    Anti equi-join, left records with NULL in any of the join columns never match, so they are always returned.
+    """
+    keys = build_key_set(right, right_columns)
+    for left_record in left:
+        if get_join_key(left_record, left_columns) not in keys:
+            yield left_record
+
+
+def iter_index_nested_loop_join(
+    left: Records,
+    lookup: Callable[[Any], Iterable[Record]],
+    left_column: str,
+    condition: Optional[BiCondition] = None,
+    left_outer: bool = False
+) -> Iterator[Record]:
+    """
+    Join which probes an index of the right input with the value of the left column for every left record
+    instead of building a hash table or reading the cross product. The optional condition is checked
+    on each matched pair, e.g. for the rest of the join conditions.
+    """
+    for left_record in left:
+        matched = False
+        value = left_record[left_column]
+        if value is not None:
+            for right_record in lookup(value):
+                if condition is None or condition(left_record, right_record):
+                    matched = True
+                    yield Record.joined(left_record, right_record)
+
+        if left_outer and not matched:
+            yield Record.joined(left_record)
+
+
+# bound of a merge join: function returning the bound from a left record and whether the bound is inclusive
+Bound = tuple[Callable[[Record], Any], bool]
+
+
+def iter_merge_join(
+    left: Records,
+    right: Records,
+    left_columns: list[str],
+    right_columns: list[str],
+    left_outer: bool = False
+) -> Iterator[Record]:
+    """
+    Equi-join of inputs sorted in ascending order by the join columns, read in one pass. Only right records
+    with the current key are kept in memory. Records with NULL in any of the join columns never match.
+    """
+    def left_key(record: Record) -> Optional[tuple]:
+        return get_join_key(record, left_columns)
+
+    return iter_window_join(
+        left, right, lambda record: get_join_key(record, right_columns), (left_key, True), (left_key, True),
+        left_outer=left_outer
+    )
+
+
+def iter_range_join(
+    left: Records,
+    right: Records,
+    column: str,
+    lower: Optional[tuple[str, bool]],
+    upper: Optional[tuple[str, bool]],
+    predicate: Optional[BiCondition] = None,
+    left_outer: bool = False
+) -> Iterator[Record]:
+    """
+    Joins right records whose column lies between bounds taken from left columns, given as
+    (left column, inclusive). The right input has to be sorted by the column, the left input by the
+    column of the lower bound, or of the upper bound when there is no lower one. The predicate
+    is evaluated on the pairs within the bounds.
+    """
+    def get_bound(bound: Optional[tuple[str, bool]]) -> Optional[Bound]:
+        if bound is None:
+            return None
+        bound_column, inclusive = bound
+        return lambda record: record[bound_column], inclusive
+
+    return iter_window_join(
+        left, right, lambda record: record[column], get_bound(lower), get_bound(upper), predicate, left_outer
+    )
+
+
+def iter_window_join(
+    left: Records,
+    right: Records,
+    right_key: Callable[[Record], Any],
+    lower: Optional[Bound],
+    upper: Optional[Bound],
+    predicate: Optional[BiCondition] = None,
+    left_outer: bool = False
+) -> Iterator[Record]:
+    """
+    Merge join keeping a window of right records, sorted by their key, between the bounds of the current
+    left record. Right records below the lower bound are dropped since the lower bounds of the following
+    left records are not smaller, so the window holds only right records which can still match.
+    NULL keys and bounds never match.
+    """
+    window: deque[tuple[Any, Record]] = deque()
+    right_entries = ((key, record) for record in right if (key := right_key(record)) is not None)
+    entry = next(right_entries, None)
+
+    for left_record in left:
+        low = None if lower is None else lower[0](left_record)
+        high = None if upper is None else upper[0](left_record)
+        if (lower is not None and low is None) or (upper is not None and high is None):
+            if left_outer:
+                yield Record.joined(left_record)
+            continue
+
+        if lower is not None:
+            while window and is_below(window[0][0], low, lower[1]):
+                window.popleft()
+            while entry is not None and is_below(entry[0], low, lower[1]):
+                entry = next(right_entries, None)
+
+        while entry is not None and (upper is None or not is_above(entry[0], high, upper[1])):
+            window.append(entry)
+            entry = next(right_entries, None)
+
+        matched = False
+        for key, right_record in window:
+            if upper is not None and is_above(key, high, upper[1]):
+                break
+            if predicate is None or predicate(left_record, right_record):
+                matched = True
+                yield Record.joined(left_record, right_record)
+
+        if not matched and left_outer:
+            yield Record.joined(left_record)
+
+
+def is_below(value: Any, bound: Any, inclusive: bool) -> bool:
+    return value < bound if inclusive else value <= bound
+
+
+def is_above(value: Any, bound: Any, inclusive: bool) -> bool:
+    return value > bound if inclusive else value >= bound
+
+
+# number of records operators exchange at once in batch execution, larger batches keep more
+# young objects alive and make the garbage collector slower than the saved calls
+BATCH_SIZE = 256
+
+Batch = list[Record]
+Batches = Iterable[Batch]
+BatchFilter = Callable[[Batch], Batch]
+
+
+def iter_batches(records: Records, size: int = BATCH_SIZE) -> Iterator[Batch]:
+    iterator = iter(records)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def flatten_batches(batches: Batches) -> Iterator[Record]:
+    return chain.from_iterable(batches)
+
+
+def iter_batch_select(batches: Batches, batch_filter: BatchFilter) -> Iterator[Batch]:
+    """
+    Filters whole batches at once, the filter returns the records of a batch satisfying the condition.
+    """
+    for batch in batches:
+        selected = batch_filter(batch)
+        if selected:
+            yield selected
+
+
+def iter_batch_projection(batches: Batches, columns: set[str]) -> Iterator[Batch]:
+    project = Projection(columns)
+    for batch in batches:
+        yield list(map(project, batch))
+
+
+def iter_batch_rename(batches: Batches, columns: dict[str, str]) -> Iterator[Batch]:
+    for batch in batches:
+        yield [record.with_aliases(columns) for record in batch]
+
+
+def iter_batch_hash_inner_join(
+    left: Batches,
+    right: Records,
+    left_columns: list[str],
+    right_columns: list[str]
+) -> Iterator[Batch]:
+    """
+    Equi-join probing a hash table built on the right input with batches of left records.
+    """
+    build = build_hash_table(right, right_columns)
+    joined = Record.joined
+    for batch in left:
+        output = [
+            joined(left_record, right_record)
+            for left_record in batch
+            for right_record in build.get(get_join_key(left_record, left_columns), ())
+        ]
+        if output:
+            yield output
+
+
+def iter_batch_hash_inner_join_build_left(
+    left: Records,
+    right: Batches,
+    left_columns: list[str],
+    right_columns: list[str]
+) -> Iterator[Batch]:
+    """
+    Equi-join probing a hash table built on the left input with batches of right records.
+    """
+    build = build_hash_table(left, left_columns)
+    joined = Record.joined
+    for batch in right:
+        output = [
+            joined(left_record, right_record)
+            for right_record in batch
+            for left_record in build.get(get_join_key(right_record, right_columns), ())
+        ]
+        if output:
+            yield output
+
+
+def iter_batch_hash_left_outer_join(
+    left: Batches,
+    right: Records,
+    left_columns: list[str],
+    right_columns: list[str]
+) -> Iterator[Batch]:
+    """
+    Left outer equi-join probing a hash table built on the right input with batches of left records.
+    """
+    build = build_hash_table(right, right_columns)
+    joined = Record.joined
+    for batch in left:
+        output = []
+        for left_record in batch:
+            right_records = build.get(get_join_key(left_record, left_columns))
+            if right_records is None:
+                output.append(joined(left_record))
+            else:
+                output.extend([joined(left_record, right_record) for right_record in right_records])
+        if output:
+            yield output
+
+
+def materialize(records: Records) -> Collection[Record]:
+    return records if isinstance(records, Collection) else list(records)
+
+
+def is_smaller(left: Records, right: Records) -> bool:
+    return isinstance(left, Collection) and isinstance(right, Collection) and len(left) <= len(right)
+
+
+def get_join_key(record: Record, columns: list[str]) -> Optional[tuple]:
+    key = tuple(record[column] for column in columns)
+    return None if None in key else key
+
+
+def build_hash_table(records: Iterable[Record], columns: list[str]) -> dict[tuple, list[Record]]:
+    hash_table = {}
+    for record in records:
+        key = get_join_key(record, columns)
+        if key is not None:
+            hash_table.setdefault(key, []).append(record)
+    return hash_table
+
+
+def build_key_set(records: Iterable[Record], columns: list[str]) -> set[tuple]:
+    keys = {get_join_key(record, columns) for record in records}
+    keys.discard(None)
+    return keys
 
 
 def select(table: Table, predicate: Condition) -> Table:
-    return Table(filter(predicate, table))
+    return Table(iter_select(table, predicate))
+
+
+def batch_select(table: Table, batch_filter: BatchFilter, batch_size: int = BATCH_SIZE) -> Table:
+    return Table(flatten_batches(iter_batch_select(iter_batches(table, batch_size), batch_filter)))
 
 
 def projection(table: Table, columns: set[str]) -> Table:
-    return Table(map(lambda r: r.projection(columns), table))
+    return Table(iter_projection(table, columns))
 
 
 def rename(table: Table, columns: dict[str, str]) -> Table:
     """
     Function to rename columns. Doesn't work with nested records yet.
     """
-    return Table(map(lambda r: Record(**r, aliases=columns), table))
+    return Table(iter_rename(table, columns))
 
 
 def union(left: Table, right: Table) -> Table:
@@ -28,36 +464,420 @@ def difference(left: Table, right: Table) -> Table:
 
 
 def cross_join(left: Table, right: Table) -> Table:
-    return {
-        Record(left=left_record, right=right_record)
-        for left_record in left
-        for right_record in right
-    }
+    return Table(iter_cross_join(left, right))
 
 
 def inner_join(left: Table, right: Table, condition: BiCondition) -> Table:
-    return select(cross_join(left, right), lambda r: condition(r.left, r.right))
+    return Table(iter_inner_join(left, right, condition))
+
+
+def hash_inner_join(left: Table, right: Table, left_columns: list[str], right_columns: list[str]) -> Table:
+    return Table(iter_hash_inner_join(left, right, left_columns, right_columns))
+
+
+def hash_left_outer_join(left: Table, right: Table, left_columns: list[str], right_columns: list[str]) -> Table:
+    return Table(iter_hash_left_outer_join(left, right, left_columns, right_columns))
+
+
+def index_nested_loop_join(
+    left: Table,
+    lookup: Callable[[Any], Iterable[Record]],
+    left_column: str,
+    condition: Optional[BiCondition] = None,
+    left_outer: bool = False
+) -> Table:
+    return Table(iter_index_nested_loop_join(left, lookup, left_column, condition, left_outer))
 
 
 def left_outer_join(left: Table, right: Table, condition: BiCondition) -> Table:
-    all_records = cross_join(left, right)
-    matching_records = select(all_records, lambda r: condition(r.left, r.right))
+    return Table(iter_left_outer_join(left, right, condition))
 
-    non_matching_records = difference(
-        projection(all_records, columns={'left'}),
-        projection(matching_records, columns={'left'})
-    )
 
-    return union(
-        matching_records,
-        non_matching_records
-    )
+def semi_join(left: Table, right: Table, condition: BiCondition) -> Table:
+    return Table(iter_semi_join(left, right, condition))
+
 
+def anti_join(left: Table, right: Table, condition: BiCondition) -> Table:
+    return Table(iter_anti_join(left, right, condition))
 
-def order_by(table: Table, comparator: Callable[[Record, Record], int]) -> list[Record]:
+
+def hash_semi_join(left: Table, right: Table, left_columns: list[str], right_columns: list[str]) -> Table:
+    return Table(iter_hash_semi_join(left, right, left_columns, right_columns))
+
+
+def hash_anti_join(left: Table, right: Table, left_columns: list[str], right_columns: list[str]) -> Table:
+    return Table(iter_hash_anti_join(left, right, left_columns, right_columns))
+
+
+def order_by(table: Table, comparator: Callable[[Record, Record], int], limit: Optional[int] = None) -> list[Record]:
+    """
+    With a limit only the first records are kept, in a bounded heap instead of sorting the whole table.
+    """
+    if limit is not None:
+        return heapq.nsmallest(limit, table, key=cmp_to_key(comparator))
     return sorted(table, key=cmp_to_key(comparator))
 
 
+# number of records sorted in memory, larger inputs are sorted in runs spilled to temporary files
+SORT_MEMORY_LIMIT = 100_000
+SPILL_BATCH_SIZE = 1000
+
+SortKeyFunction = Callable[[Record], Any]
+
+
+def iter_sort(
+    records: Records,
+    key: SortKeyFunction,
+    reverse: bool = False,
+    memory_limit: Optional[int] = None
+) -> Iterator[Record]:
+    """
+    External merge sort: records are sorted in runs of at most memory_limit records, runs are spilled
+    to temporary files and merged. An input which fits into the limit is sorted in memory.
+    """
+    memory_limit = SORT_MEMORY_LIMIT if memory_limit is None else memory_limit
+    if memory_limit < 1:
+        raise ValueError(f'Memory limit of a sort must be at least 1 record, got {memory_limit}')
+    return iter_merged_runs(iter(records), key, reverse, memory_limit)
+
+
+def iter_merged_runs(records: Iterator[Record], key: SortKeyFunction, reverse: bool, memory_limit: int) -> Iterator[Record]:
+    # one record past the limit tells whether the input fits into memory
+    run = list(islice(records, memory_limit + 1))
+    if len(run) <= memory_limit:
+        yield from sorted(run, key=key, reverse=reverse)
+        return
+
+    records = chain(run[memory_limit:], records)
+    del run[memory_limit:]
+    run.sort(key=key, reverse=reverse)
+    runs = []
+    try:
+        while len(run) > 0:
+            runs.append(spill_run(run))
+            run = sorted(islice(records, memory_limit), key=key, reverse=reverse)
+
+        yield from heapq.merge(*[read_run(file) for file in runs], key=key, reverse=reverse)
+    finally:
+        for file in runs:
+            file.close()
+
+
+def iter_top_n(records: Records, n: int, key: SortKeyFunction, reverse: bool = False) -> Iterator[Record]:
+    """
+    First n records in the sort order, kept in a bounded heap instead of sorting the whole input.
+    """
+    if reverse:
+        return iter(heapq.nlargest(n, records, key=key))
+    return iter(heapq.nsmallest(n, records, key=key))
+
+
+def spill_run(records: list[Any]) -> IO[bytes]:
+    file = tempfile.TemporaryFile()
+    for start in range(0, len(records), SPILL_BATCH_SIZE):
+        pickle.dump(records[start:start + SPILL_BATCH_SIZE], file, pickle.HIGHEST_PROTOCOL)
+    file.seek(0)
+    return file
+
+
+def read_run(file: IO[bytes]) -> Iterator[Any]:
+    while True:
+        try:
+            batch = pickle.load(file)
+        except EOFError:
+            return
+        yield from batch
+
+
+def sort_by(table: Table, key: SortKeyFunction, reverse: bool = False, memory_limit: Optional[int] = None) -> list[Record]:
+    return list(iter_sort(table, key, reverse, memory_limit))
+
+
+# number of groups aggregated in memory, partial groups are spilled to partitions above it
+AGGREGATE_MEMORY_LIMIT = 100_000
+AGGREGATE_SPILL_PARTITIONS = 16
+
+Groups = dict[tuple, list[Accumulator]]
+
+
+def iter_hash_aggregate(
+    records: Records,
+    group_by: list[str],
+    aggregates: dict[str, Aggregate],
+    memory_limit: Optional[int] = None
+) -> Iterator[Record]:
+    """
+    Hash aggregation computing the aggregates of each group incrementally while records stream in.
+    When the number of groups exceeds memory_limit, partial groups are spilled to partitions by the
+    hash of the group key and the partials of each partition are merged at the end.
+    Without group columns a single record is produced even for an empty input.
+    """
+    memory_limit = AGGREGATE_MEMORY_LIMIT if memory_limit is None else memory_limit
+    columns = [aggregate.column for aggregate in aggregates.values()]
+    groups: Groups = {}
+    partitions: list[list[IO[bytes]]] = []
+
+    try:
+        for record in records:
+            key = tuple([record[column] for column in group_by])
+            accumulators = groups.get(key)
+            if accumulators is None:
+                if len(groups) >= memory_limit:
+                    spill_groups(groups, partitions)
+                    groups = {}
+                accumulators = groups[key] = [aggregate.create_accumulator() for aggregate in aggregates.values()]
+
+            for accumulator, column in zip(accumulators, columns):
+                # COUNT(*) counts every record, so any value which is not NULL will do
+                accumulator.add(True if column is None else record[column])
+
+        if len(partitions) == 0:
+            if len(groups) == 0 and len(group_by) == 0:
+                groups[()] = [aggregate.create_accumulator() for aggregate in aggregates.values()]
+            yield from create_group_records(groups, group_by, aggregates)
+            return
+
+        spill_groups(groups, partitions)
+        for runs in partitions:
+            groups = {}
+            for file in runs:
+                for key, accumulators in read_run(file):
+                    merged = groups.setdefault(key, accumulators)
+                    if merged is not accumulators:
+                        for accumulator, other in zip(merged, accumulators):
+                            accumulator.merge(other)
+            yield from create_group_records(groups, group_by, aggregates)
+    finally:
+        for runs in partitions:
+            for file in runs:
+                file.close()
+
+
+def spill_groups(groups: Groups, partitions: list[list[IO[bytes]]]):
+    if len(partitions) == 0:
+        partitions.extend([] for _ in range(AGGREGATE_SPILL_PARTITIONS))
+
+    items = [[] for _ in partitions]
+    for key, accumulators in groups.items():
+        items[hash(key) % len(partitions)].append((key, accumulators))
+
+    for runs, partition_items in zip(partitions, items):
+        if len(partition_items) > 0:
+            runs.append(spill_run(partition_items))
+
+
+# records of the build side of a hash join kept in memory, larger inputs are partitioned to temporary files
+JOIN_MEMORY_LIMIT = 100_000
+JOIN_SPILL_PARTITIONS = 16
+# partitioning levels before a partition too large for memory is joined in chunks
+JOIN_MAX_DEPTH = 4
+
+
+class SpillStatistics:
+    """
+    Counters of a join spilling to disk: bytes written to temporary files, partitions created,
+    the deepest partitioning level and partitions joined in chunks because they couldn't be split.
+    """
+
+    def __init__(self):
+        self.bytes_spilled = 0
+        self.partitions = 0
+        self.depth = 0
+        self.chunked_partitions = 0
+
+    def __repr__(self):
+        return (
+            f'SpillStatistics(bytes_spilled={self.bytes_spilled}, partitions={self.partitions}, depth={self.depth}, '
+            f'chunked_partitions={self.chunked_partitions})'
+        )
+
+
+class SpillPartitions:
+    """
+    Temporary files receiving records by the hash of their join key, each level of partitioning
+    uses other bits of the hash. Records are buffered and written in batches.
+    """
+
+    def __init__(self, count: int, level: int, statistics: SpillStatistics):
+        self.files = [tempfile.TemporaryFile() for _ in range(count)]
+        self.sizes = [0] * count
+        self.level = level
+        self.__shift = level * (count - 1).bit_length()
+        self.__buffers: list[list[Record]] = [[] for _ in range(count)]
+        self.__statistics = statistics
+        statistics.partitions += count
+        statistics.depth = max(statistics.depth, level + 1)
+
+    def add(self, key: tuple, record: Record):
+        position = (hash(key) >> self.__shift) % len(self.files)
+        buffer = self.__buffers[position]
+        buffer.append(record)
+        self.sizes[position] += 1
+        if len(buffer) >= SPILL_BATCH_SIZE:
+            self.__write(position)
+
+    def finish(self):
+        for position, file in enumerate(self.files):
+            self.__write(position)
+            self.__statistics.bytes_spilled += file.tell()
+            file.seek(0)
+
+    def close(self):
+        for file in self.files:
+            file.close()
+
+    def __write(self, position: int):
+        if self.__buffers[position]:
+            pickle.dump(self.__buffers[position], self.files[position], pickle.HIGHEST_PROTOCOL)
+            self.__buffers[position] = []
+
+
+class GraceHashJoin:
+    """
+    Equi-join whose hash table holds at most memory_limit records. When the right input is larger,
+    both inputs are partitioned to temporary files by the hash of the join key, so matching records
+    end up in the same pair of partitions, and the pairs are joined one by one. Partitions still too
+    large are partitioned again with another hash up to JOIN_MAX_DEPTH levels. A partition which doesn't
+    get smaller, because most of its records share a key, is joined in chunks of memory_limit right
+    records, each probed with the whole left partition.
+    """
+
+    def __init__(
+        self,
+        left_columns: list[str],
+        right_columns: list[str],
+        left_outer: bool = False,
+        memory_limit: Optional[int] = None,
+        statistics: Optional[SpillStatistics] = None
+    ):
+        self.left_columns = left_columns
+        self.right_columns = right_columns
+        self.left_outer = left_outer
+        self.memory_limit = JOIN_MEMORY_LIMIT if memory_limit is None else memory_limit
+        self.statistics = SpillStatistics() if statistics is None else statistics
+
+    def iterate(self, left: Records, right: Records, build_left: Optional[bool] = None) -> Iterator[Record]:
+        """
+        The smaller input is the build side, the caller may choose it when the size of the inputs is not known.
+        A left build side larger than the memory limit is partitioned like a right one.
+        """
+        if is_smaller(left, right) if build_left is None else build_left:
+            left = iter(left)
+            build = list(islice(left, self.memory_limit + 1))
+            if len(build) <= self.memory_limit:
+                yield from self.iterate_in_memory(build, right, True)
+                return
+            left = chain(build, left)
+
+        right = iter(right)
+        build = list(islice(right, self.memory_limit + 1))
+        if len(build) <= self.memory_limit:
+            yield from self.iterate_in_memory(left, build)
+            return
+
+        left_partitions = SpillPartitions(JOIN_SPILL_PARTITIONS, 0, self.statistics)
+        right_partitions = SpillPartitions(JOIN_SPILL_PARTITIONS, 0, self.statistics)
+        try:
+            self.partition(chain(build, right), self.right_columns, right_partitions)
+            build.clear()
+            for left_record in left:
+                key = get_join_key(left_record, self.left_columns)
+                if key is not None:
+                    left_partitions.add(key, left_record)
+                elif self.left_outer:
+                    yield Record.joined(left_record)
+            left_partitions.finish()
+
+            yield from self.iterate_partitions(left_partitions, right_partitions)
+        finally:
+            left_partitions.close()
+            right_partitions.close()
+
+    def iterate_in_memory(self, left: Records, right: Records, build_left: Optional[bool] = None) -> Iterator[Record]:
+        if self.left_outer:
+            return iter_hash_left_outer_join(left, right, self.left_columns, self.right_columns, build_left)
+        return iter_hash_inner_join(left, right, self.left_columns, self.right_columns, build_left)
+
+    def partition(self, records: Iterable[Record], columns: list[str], partitions: SpillPartitions):
+        for record in records:
+            key = get_join_key(record, columns)
+            if key is not None:
+                partitions.add(key, record)
+        partitions.finish()
+
+    def iterate_partitions(self, left: SpillPartitions, right: SpillPartitions) -> Iterator[Record]:
+        for position, (left_file, right_file) in enumerate(zip(left.files, right.files)):
+            if left.sizes[position] == 0:
+                continue
+
+            size = right.sizes[position]
+            if size <= self.memory_limit:
+                yield from self.iterate_in_memory(read_run(left_file), list(read_run(right_file)))
+            elif right.level + 1 >= JOIN_MAX_DEPTH or size == sum(right.sizes):
+                # another hash can't split a partition of a single key
+                yield from self.iterate_in_chunks(left_file, right_file)
+            else:
+                yield from self.repartition(left_file, right_file, right.level + 1)
+
+    def repartition(self, left_file: IO[bytes], right_file: IO[bytes], level: int) -> Iterator[Record]:
+        left_partitions = SpillPartitions(JOIN_SPILL_PARTITIONS, level, self.statistics)
+        right_partitions = SpillPartitions(JOIN_SPILL_PARTITIONS, level, self.statistics)
+        try:
+            self.partition(read_run(right_file), self.right_columns, right_partitions)
+            self.partition(read_run(left_file), self.left_columns, left_partitions)
+            yield from self.iterate_partitions(left_partitions, right_partitions)
+        finally:
+            left_partitions.close()
+            right_partitions.close()
+
+    def iterate_in_chunks(self, left_file: IO[bytes], right_file: IO[bytes]) -> Iterator[Record]:
+        self.statistics.chunked_partitions += 1
+        # positions of matched left records, so unmatched ones are returned by the outer join at the end
+        matched: set[int] = set()
+        for chunk in iter_batches(read_run(right_file), self.memory_limit):
+            build = build_hash_table(chunk, self.right_columns)
+            left_file.seek(0)
+            for position, left_record in enumerate(read_run(left_file)):
+                right_records = build.get(get_join_key(left_record, self.left_columns), ())
+                if right_records and self.left_outer:
+                    matched.add(position)
+                for right_record in right_records:
+                    yield Record.joined(left_record, right_record)
+
+        if self.left_outer:
+            left_file.seek(0)
+            for position, left_record in enumerate(read_run(left_file)):
+                if position not in matched:
+                    yield Record.joined(left_record)
+
+
+def iter_grace_hash_join(
+    left: Records,
+    right: Records,
+    left_columns: list[str],
+    right_columns: list[str],
+    left_outer: bool = False,
+    memory_limit: Optional[int] = None,
+    statistics: Optional[SpillStatistics] = None,
+    build_left: Optional[bool] = None
+) -> Iterator[Record]:
+    join = GraceHashJoin(left_columns, right_columns, left_outer, memory_limit, statistics)
+    return join.iterate(left, right, build_left)
+
+
+def create_group_records(groups: Groups, group_by: list[str], aggregates: dict[str, Aggregate]) -> Iterator[Record]:
+    names = list(aggregates)
+    projection = Projection(set(group_by) | set(names))
+    for key, accumulators in groups.items():
+        values = dict(zip(group_by, key))
+        values.update(zip(names, [accumulator.result() for accumulator in accumulators]))
+        yield projection(values)
+
+
+def aggregate(table: Table, group_by: list[str], aggregates: dict[str, Aggregate]) -> Table:
+    return Table(iter_hash_aggregate(table, group_by, aggregates))
+
+
 def create_employee(id: int, name: str, position: str, salary: int) -> Record:
     return Record(id=id, name=name, position=position, salary=salary)
 
@@ -0,0 +1,269 @@
+from bisect import bisect_left, bisect_right
+from typing import Any, Iterable, Iterator, Optional
+
+from models import Record, TABLE_IDS
+
+
+class Index:
+    def __init__(self, column: str):
+        self.column = column
+
+    def add(self, record: Record):
+        pass
+
+    def remove(self, record: Record):
+        pass
+
+    def lookup(self, value: Any) -> Iterable[Record]:
+        return ()
+
+
+class HashIndex(Index):
+    """
+    Index for equality lookups. Records with NULL in the column are not indexed as NULL never equals anything.
+    """
+
+    def __init__(self, column: str, records: Iterable[Record] = ()):
+        super().__init__(column)
+        self.__entries: dict[Any, set[Record]] = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: Record):
+        value = record[self.column]
+        if value is not None:
+            self.__entries.setdefault(value, set()).add(record)
+
+    def remove(self, record: Record):
+        value = record[self.column]
+        records = self.__entries.get(value)
+        if records is not None:
+            records.discard(record)
+            if len(records) == 0:
+                del self.__entries[value]
+
+    def lookup(self, value: Any) -> Iterable[Record]:
+        return self.__entries.get(value, ())
+
+    def __repr__(self):
+        return f'HashIndex(column="{self.column}")'
+
+
+class SortedIndex(Index):
+    """
+    Index keeping records ordered by the column, used for equality and range lookups and to
+    read records in order. Keys and records are stored in two parallel lists, so lookups are binary
+    searches over plain values. Records with NULL in the column are kept separately.
+    """
+
+    def __init__(self, column: str, records: Iterable[Record] = ()):
+        super().__init__(column)
+        entries = []
+        self.nulls: set[Record] = set()
+        for record in records:
+            value = record[column]
+            if value is None:
+                self.nulls.add(record)
+            else:
+                entries.append((value, record))
+
+        entries.sort(key=lambda entry: entry[0])
+        self.__keys = [value for value, _ in entries]
+        self.__records = [record for _, record in entries]
+
+    def __len__(self):
+        return len(self.__keys) + len(self.nulls)
+
+    def add(self, record: Record):
+        value = record[self.column]
+        if value is None:
+            self.nulls.add(record)
+            return
+
+        position = bisect_right(self.__keys, value)
+        self.__keys.insert(position, value)
+        self.__records.insert(position, record)
+
+    def remove(self, record: Record):
+        value = record[self.column]
+        if value is None:
+            self.nulls.discard(record)
+            return
+
+        start = bisect_left(self.__keys, value)
+        end = bisect_right(self.__keys, value, lo=start)
+        for position in range(start, end):
+            if self.__records[position] == record:
+                del self.__keys[position]
+                del self.__records[position]
+                return
+
+    def lookup(self, value: Any) -> Iterable[Record]:
+        if value is None:
+            return ()
+        return self.range(value, value)
+
+    def range(
+        self,
+        low: Optional[Any] = None,
+        high: Optional[Any] = None,
+        include_low: bool = True,
+        include_high: bool = True
+    ) -> Iterable[Record]:
+        """
+        Records with values between low and high in ascending order, None means the range is unbounded.
+        """
+        if low is None:
+            start = 0
+        elif include_low:
+            start = bisect_left(self.__keys, low)
+        else:
+            start = bisect_right(self.__keys, low)
+
+        if high is None:
+            end = len(self.__keys)
+        elif include_high:
+            end = bisect_right(self.__keys, high)
+        else:
+            end = bisect_left(self.__keys, high)
+
+        return self.__records[start:end]
+
+    def scan(self, ascending: bool = True) -> Iterator[Record]:
+        """
+        All records in order, NULLs come last in ascending and first in descending order.
+        """
+        if ascending:
+            yield from self.__records
+            yield from self.nulls
+        else:
+            yield from self.nulls
+            yield from reversed(self.__records)
+
+    def __repr__(self):
+        return f'SortedIndex(column="{self.column}")'
+
+
+class IndexedTable(set):
+    """
+    Table which maintains secondary indexes on its columns when records are inserted or deleted.
+    Its version changes with every inserted or deleted record.
+    """
+
+    def __init__(self, records: Iterable[Record] = ()):
+        super().__init__(records)
+        self.indexes: dict[str, list[Index]] = {}
+        self.__id = next(TABLE_IDS)
+        self.__changes = 0
+
+    @property
+    def version(self) -> tuple[int, int]:
+        return self.__id, self.__changes
+
+    def create_hash_index(self, column: str) -> HashIndex:
+        return self.__add_index(HashIndex(column, self))
+
+    def create_sorted_index(self, column: str) -> SortedIndex:
+        return self.__add_index(SortedIndex(column, self))
+
+    def __add_index(self, index: Index) -> Any:
+        self.indexes.setdefault(index.column, []).append(index)
+        return index
+
+    def get_hash_index(self, column: str) -> Optional[Index]:
+        """
+        Index which can be used for equality lookups, a hash index is preferred over a sorted one.
+        """
+        indexes = self.indexes.get(column, [])
+        for index in indexes:
+            if isinstance(index, HashIndex):
+                return index
+        return self.get_sorted_index(column)
+
+    def get_sorted_index(self, column: str) -> Optional[SortedIndex]:
+        for index in self.indexes.get(column, []):
+            if isinstance(index, SortedIndex):
+                return index
+        return None
+
+    def insert(self, record: Record):
+        if record in self:
+            return
+
+        super().add(record)
+        self.__changes += 1
+        for indexes in self.indexes.values():
+            for index in indexes:
+                index.add(record)
+
+    def delete(self, record: Record):
+        if record not in self:
+            return
+
+        super().discard(record)
+        self.__changes += 1
+        for indexes in self.indexes.values():
+            for index in indexes:
+                index.remove(record)
+
+    def add(self, record: Record):
+        self.insert(record)
+
+    def discard(self, record: Record):
+        self.delete(record)
+
+    def remove(self, record: Record):
+        if record not in self:
+            raise KeyError(record)
+        self.delete(record)
+
+    def pop(self) -> Record:
+        if len(self) == 0:
+            raise KeyError('pop from an empty table')
+
+        record = next(iter(self))
+        self.delete(record)
+        return record
+
+    def clear(self):
+        for record in list(self):
+            self.delete(record)
+
+    def update(self, *others: Iterable[Record]):
+        for records in others:
+            for record in records:
+                self.insert(record)
+
+    def difference_update(self, *others: Iterable[Record]):
+        for records in others:
+            for record in records:
+                self.delete(record)
+
+    def intersection_update(self, *others: Iterable[Record]):
+        kept = set(self).intersection(*others)
+        for record in list(self):
+            if record not in kept:
+                self.delete(record)
+
+    def symmetric_difference_update(self, other: Iterable[Record]):
+        for record in set(other):
+            if record in self:
+                self.delete(record)
+            else:
+                self.insert(record)
+
+    def __ior__(self, other: Iterable[Record]) -> 'IndexedTable':
+        self.update(other)
+        return self
+
+    def __isub__(self, other: Iterable[Record]) -> 'IndexedTable':
+        self.difference_update(other)
+        return self
+
+    def __iand__(self, other: Iterable[Record]) -> 'IndexedTable':
+        self.intersection_update(other)
+        return self
+
+    def __ixor__(self, other: Iterable[Record]) -> 'IndexedTable':
+        self.symmetric_difference_update(other)
+        return self
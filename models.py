@@ -1,45 +1,167 @@
-from typing import Optional, Any, Callable
+from itertools import count
+from typing import Optional, Any, Callable, Iterable, Iterator, Mapping
+
+
+class Schema:
+    """
+    Column layout shared by records: column names in a canonical order, their positions
+    in the value tuple of a record and the column aliases.
+
+    Schemas are interned, so all records with the same columns and aliases reference
+    a single instance and a record only has to store its values.
+    """
+    __slots__ = ('columns', 'positions', 'aliases', 'aliases_to_columns', 'direct_positions', 'paths')
+    __schemas: dict[tuple, 'Schema'] = {}
+
+    def __init__(self, columns: tuple[str, ...], aliases: Optional[dict[str, str]] = None):
+        self.columns = columns
+        self.positions = {column: position for position, column in enumerate(columns)}
+        self.aliases = {} if aliases is None else dict(aliases)
+        self.aliases_to_columns = {
+            alias: column
+            for column, alias in self.aliases.items()
+        }
+        # columns which can be read without resolving an alias or a path
+        self.direct_positions = {
+            column: position
+            for column, position in self.positions.items()
+            if column not in self.aliases_to_columns
+        }
+        # resolved column names, e.g. 'left.id' -> (position of 'left', 'id')
+        self.paths: dict[str, tuple[Optional[int], Optional[str]]] = {}
+
+    @staticmethod
+    def of(columns: Iterable[str], aliases: Optional[dict[str, str]] = None) -> 'Schema':
+        columns = tuple(sorted(columns))
+        key = (columns, tuple(sorted(aliases.items())) if aliases else ())
+        schema = Schema.__schemas.get(key)
+        if schema is None:
+            schema = Schema.__schemas.setdefault(key, Schema(columns, aliases))
+        return schema
+
+    def resolve(self, name: str) -> tuple[Optional[int], Optional[str]]:
+        """
+        Returns position of the top level column referenced by the name and the remaining
+        path inside the nested record, or None as a position if the column doesn't exist.
+        """
+        path = self.paths.get(name)
+        if path is not None:
+            return path
+
+        column = self.aliases_to_columns.get(name, name)
+        head, _, tail = column.partition('.')
+        path = self.paths[name] = (self.positions.get(head), tail or None)
+        return path
+
+    def __reduce__(self):
+        return Schema.of, (self.columns, self.aliases)
 
+    def __repr__(self):
+        return f'Schema(columns={self.columns}, aliases={self.aliases})'
+
+
+class Record:
+    """
+    Immutable record which stores its values in a tuple laid out by a shared schema.
+    Hash is computed lazily on first use.
+    """
+    __slots__ = ('__schema', '__values', '__hash')
 
-class Record(dict):
     def __init__(self, *args, aliases: Optional[dict[str, str]] = None, **kwargs):
-        super().__init__(*args, **kwargs)
-        self.__hash = hash(tuple(sorted(self.items())))
-        self.__aliases = {} if aliases is None else dict(aliases)
-        self.__aliases_to_columns = {
-            alias: column
-            for column, alias in self.__aliases.items()
-        }
+        values = dict(*args, **kwargs) if args else kwargs
+        self.__schema = Schema.of(values, aliases)
+        self.__values = tuple(values[column] for column in self.__schema.columns)
+        self.__hash = None
+
+    @staticmethod
+    def from_values(schema: Schema, values: tuple) -> 'Record':
+        record = object.__new__(Record)
+        record.__schema = schema
+        record.__values = values
+        record.__hash = None
+        return record
+
+    @staticmethod
+    def joined(left: 'Record', right: Optional['Record'] = None) -> 'Record':
+        if right is None:
+            return Record.from_values(LEFT_SCHEMA, (left,))
+        return Record.from_values(JOINED_SCHEMA, (left, right))
+
+    @property
+    def schema(self) -> Schema:
+        return self.__schema
 
     def __hash__(self):
+        if self.__hash is None:
+            self.__hash = hash((self.__schema.columns, self.__values))
         return self.__hash
 
+    def __eq__(self, other):
+        if isinstance(other, Record):
+            return self.__schema.columns == other.__schema.columns and self.__values == other.__values
+
+        if isinstance(other, Mapping):
+            return dict(self.items()) == dict(other.items())
+
+        return NotImplemented
+
+    def __reduce__(self):
+        return Record.from_values, (self.__schema, self.__values)
+
     def __setitem__(self, key, value):
-        raise NotImplemented('Record is immutable')
+        raise TypeError('Record is immutable')
 
     def __getitem__(self, name: str) -> Optional[Any]:
-        if name in self.__aliases_to_columns:
-            name = self.__aliases_to_columns[name]
+        schema = self.__schema
+        position = schema.direct_positions.get(name)
+        if position is not None:
+            return self.__values[position]
 
-        record = self
-        path = name.split('.')
-        for item in path[:-1]:
-            record = super(Record, record).get(item)
+        # resolved paths are cached in the schema, so only a miss has to call resolve
+        position, path = schema.paths.get(name) or schema.resolve(name)
+        if position is None:
+            return None
 
-            if record is None:
-                return None
+        value = self.__values[position]
+        if path is None or value is None:
+            return value
 
-        return super(Record, record).get(path[-1])
+        return value[path]
 
     def get(self, name: str) -> Any | None:
         return self[name]
 
     def __getattr__(self, name: str) -> Optional[Any]:
+        if name.startswith('__') and name.endswith('__') or name.startswith('_Record__'):
+            raise AttributeError(name)
+
         return self[name]
 
+    def __contains__(self, name: str) -> bool:
+        return name in self.__schema.positions
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__schema.columns)
+
+    def __len__(self) -> int:
+        return len(self.__values)
+
+    def keys(self) -> tuple[str, ...]:
+        return self.__schema.columns
+
+    def values(self) -> tuple:
+        return self.__values
+
+    def items(self) -> Iterable[tuple[str, Any]]:
+        return zip(self.__schema.columns, self.__values)
+
+    def with_aliases(self, aliases: dict[str, str]) -> 'Record':
+        return Record.from_values(Schema.of(self.__schema.columns, aliases), self.__values)
+
     def __repr__(self):
+        aliases = self.__schema.aliases
         values = {
-            self.__aliases.get(column, column): self.get(column)
+            aliases.get(column, column): self.get(column)
             for column in self.columns()
         }
 
@@ -63,22 +185,58 @@ class Record(dict):
         })
 
     def projection(self, columns: set[str]) -> 'Record':
-        root = {}
+        return Projection(columns)(self)
+
+
+LEFT_SCHEMA = Schema.of(('left',))
+JOINED_SCHEMA = Schema.of(('left', 'right'))
 
+
+class Projection:
+    """
+    Projection onto a fixed set of columns. The nested layout of the resulting records
+    and their schemas are prepared once, so projecting a record is a tuple build per level.
+    """
+
+    def __init__(self, columns: set[str]):
+        root = {}
         for name in columns:
             path = name.split('.')
 
             node = root
             for item in path[:-1]:
-                if item not in node:
+                if not isinstance(node.get(item), dict):
                     node[item] = {}
                 node = node[item]
 
-            node[path[-1]] = self.get(name)
+            node.setdefault(path[-1], name)
 
-        return Record.from_dict(root)
+        self.__layout = Projection.__prepare(root)
+
+    @staticmethod
+    def __prepare(node: dict) -> tuple[Schema, tuple]:
+        schema = Schema.of(node)
+        return schema, tuple(
+            Projection.__prepare(node[column]) if isinstance(node[column], dict) else node[column]
+            for column in schema.columns
+        )
+
+    def __call__(self, record: Record) -> Record:
+        return Projection.__apply(self.__layout, record)
+
+    @staticmethod
+    def __apply(layout: tuple[Schema, tuple], record: Record) -> Record:
+        schema, items = layout
+        return Record.from_values(schema, tuple(
+            record[item] if isinstance(item, str) else Projection.__apply(item, record)
+            for item in items
+        ))
 
 
 Table = set[Record]
+Records = Iterable[Record]
 Condition = Callable[[Record], bool]
 BiCondition = Callable[[Record, Record], bool]
+
+# identifiers of tables which track their version, a version is unique across tables as it includes the identifier
+TABLE_IDS = count()
@@ -0,0 +1,171 @@
+from operator import itemgetter
+from typing import Any, Callable, Optional
+
+from models import Condition as Predicate, BiCondition, Record
+from query_plan_builder import Condition, ConstantCondition, BinaryCondition, ComparisonCondition, LogicalCondition, \
+    Column
+from sql_parser import is_literal, parse_literal
+
+# Python operators used in the generated source for the SQL comparison operators
+SOURCE_OPERATORS = {
+    '=': '==',
+    '!=': '!=',
+    '<>': '!=',
+    '<': '<',
+    '<=': '<=',
+    '>': '>',
+    '>=': '>=',
+}
+
+
+class PredicateSource:
+    """
+    Source of a generated predicate. Column getters and constants are passed to the generated
+    function through its namespace, so the source only contains generated names and operators.
+    """
+
+    def __init__(self, arguments: list[str]):
+        self.arguments = arguments
+        self.namespace: dict[str, Any] = {}
+        self.variables = 0
+
+    def add(self, prefix: str, value: Any) -> str:
+        name = f'{prefix}{len(self.namespace)}'
+        self.namespace[name] = value
+        return name
+
+    def variable(self) -> str:
+        self.variables += 1
+        return f'v{self.variables}'
+
+    def column(self, name: str, argument: str) -> str:
+        # Record.__getitem__ resolves a column path once per schema, itemgetter calls it without a Python frame
+        return f'{self.add("get", itemgetter(name))}({argument})'
+
+    def constant(self, value: Any) -> str:
+        return self.add('c', value)
+
+    def compile(self, expression: str, name: str = 'predicate') -> Callable[..., Any]:
+        source = f'def {name}({", ".join(self.arguments)}):\n    return {expression}\n'
+        namespace = dict(self.namespace)
+        exec(compile(source, f'<{name}>', 'exec'), namespace)
+        return namespace[name]
+
+
+def compile_predicate(condition: Condition) -> Predicate:
+    """
+    Compiles a condition on a single record into one Python function.
+    """
+    source = PredicateSource(['record'])
+    return source.compile(generate_condition(condition, source))
+
+
+def compile_batch_filter(condition: Condition) -> Callable[[list[Record]], list[Record]]:
+    """
+    Compiles a condition into a function returning the records of a batch which satisfy it. The condition
+    is evaluated inline in a list comprehension, so there's no function call per record.
+    """
+    source = PredicateSource(['records'])
+    expression = generate_condition(condition, source)
+    return source.compile(f'[record for record in records if {expression}]', 'batch_filter')
+
+
+def compile_join_predicate(conditions: list[Condition]) -> Optional[BiCondition]:
+    """
+    Compiles join conditions, which all have to hold, into one function of the left and the right record.
+    Returns None when there are no conditions.
+    """
+    if len(conditions) == 0:
+        return None
+
+    source = PredicateSource(['left', 'right'])
+    return source.compile(' and '.join([generate_join_condition(condition, source) for condition in conditions]))
+
+
+def compile_parsed_condition(condition: tuple) -> Predicate:
+    """
+    Compiles conditions produced by sql_parser.read_conditions, column names are used as they are.
+    """
+    return compile_predicate(to_condition(condition))
+
+
+def to_condition(condition: tuple) -> Condition:
+    match condition:
+        case ('and' | 'or' as operator, left, right):
+            return LogicalCondition(operator, to_condition(left), to_condition(right))
+        case (left, operator, right):
+            return ComparisonCondition(to_operand(left), to_operand(right), operator.lower())
+
+    raise ValueError(f'Unsupported condition {condition}')
+
+
+def to_operand(operand: str) -> Column | Any:
+    return parse_literal(operand) if is_literal(operand) else Column(operand)
+
+
+def generate_condition(condition: Condition, source: PredicateSource) -> str:
+    match condition:
+        case ConstantCondition(value=value):
+            return 'True' if value else 'False'
+        case LogicalCondition(operator=operator, left=left, right=right):
+            return f'({generate_condition(left, source)} {operator} {generate_condition(right, source)})'
+        case ComparisonCondition(left=left, right=right, operator='is'):
+            return f'({generate_operand(left, source)} is {generate_operand(right, source)})'
+        case ComparisonCondition(left=left, right=right, operator=operator):
+            return generate_comparison(
+                generate_operand(left, source), left, generate_operand(right, source), right, operator, source
+            )
+
+    # conditions the compiler doesn't know are evaluated by their own implementation
+    return f'{source.add("condition", condition.get_executable_condition())}(record)'
+
+
+def generate_join_condition(condition: Condition, source: PredicateSource) -> str:
+    match condition:
+        case ConstantCondition(value=value):
+            return 'True' if value else 'False'
+        case BinaryCondition(left=left, right=right, operator=operator):
+            return generate_comparison(
+                source.column(left, 'left'), Column(left), source.column(right, 'right'), Column(right), operator, source
+            )
+
+    return f'{source.add("condition", condition.get_executable_condition())}(left, right)'
+
+
+def generate_operand(operand: Column | Any, source: PredicateSource) -> str:
+    if isinstance(operand, Column):
+        return source.column(operand.name, 'record')
+
+    return 'None' if operand is None else source.constant(operand)
+
+
+def generate_comparison(
+    left: str,
+    left_operand: Column | Any,
+    right: str,
+    right_operand: Column | Any,
+    operator: str,
+    source: PredicateSource
+) -> str:
+    """
+    Null-safe comparison: a comparison with NULL is false. Columns are read once into variables,
+    constants are known not to be NULL.
+    """
+    if operator not in SOURCE_OPERATORS:
+        raise ValueError(f'Unsupported operator "{operator}"')
+
+    if left == 'None' or right == 'None':
+        return 'False'
+
+    checks = []
+    if isinstance(left_operand, Column):
+        variable = source.variable()
+        checks.append(f'({variable} := {left}) is not None')
+        left = variable
+    if isinstance(right_operand, Column):
+        variable = source.variable()
+        checks.append(f'({variable} := {right}) is not None')
+        right = variable
+
+    return f'({" and ".join(checks + [f"{left} {SOURCE_OPERATORS[operator]} {right}"])})'
+
@@ -1,8 +1,31 @@
+import operator
 from enum import Enum
-from typing import Callable
+from typing import Callable, Any, Optional
 
+from aggregation import Aggregate
 from database_engine import Record
 
+OPERATORS: dict[str, Callable[[Any, Any], bool]] = {
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+
+# operators to use when operands of a comparison are swapped
+FLIPPED_OPERATORS = {
+    '=': '=',
+    '!=': '!=',
+    '<>': '<>',
+    '<': '>',
+    '<=': '>=',
+    '>': '<',
+    '>=': '<=',
+}
+
 
 class Condition:
     def get_executable_condition(self) -> Callable[..., bool]:
@@ -11,6 +34,33 @@ class Condition:
 
         return condition
 
+    def columns(self) -> set[str]:
+        return set()
+
+    def map_columns(self, function: Callable[[str], str]) -> 'Condition':
+        return self
+
+
+class ConstantCondition(Condition):
+    def __init__(self, value: bool):
+        self.value = value
+
+    def __eq__(self, other):
+        if not isinstance(other, ConstantCondition):
+            return False
+
+        return self.value == other.value
+
+    def __hash__(self):
+        return hash(('constant', self.value))
+
+    def __repr__(self):
+        return 'true' if self.value else 'false'
+
+    def get_executable_condition(self) -> Callable[..., bool]:
+        value = self.value
+        return lambda *records: value
+
 
 class BinaryCondition(Condition):
     def __init__(self, left: str, right: str, operator: str):
@@ -24,18 +74,192 @@ class BinaryCondition(Condition):
 
         return self.left == other.left and self.right == other.right and self.operator == other.operator
 
+    def __hash__(self):
+        return hash(('binary', self.left, self.right, self.operator))
+
     def __repr__(self):
         return f'{self.left} {self.operator} {self.right}'
 
+    def is_equality(self) -> bool:
+        return self.operator == '='
+
     def get_executable_condition(self) -> Callable[..., bool]:
+        compare = OPERATORS[self.operator]
+
         def condition(left: Record, right: Record) -> bool:
-            return left[self.left] == right[self.right]
+            left_value = left[self.left]
+            right_value = right[self.right]
+            return left_value is not None and right_value is not None and compare(left_value, right_value)
 
         return condition
 
 
+class Column:
+    def __init__(self, name: str):
+        self.name = name
+
+    def __eq__(self, other):
+        if not isinstance(other, Column):
+            return False
+
+        return self.name == other.name
+
+    def __hash__(self):
+        return hash(('column', self.name))
+
+    def __repr__(self):
+        return self.name
+
+
+def format_operand(operand: Column | Any) -> str:
+    if isinstance(operand, Column):
+        return repr(operand)
+
+    if operand is None:
+        return 'null'
+
+    if isinstance(operand, bool):
+        return 'true' if operand else 'false'
+
+    return repr(operand)
+
+
+def map_operand(operand: Column | Any, function: Callable[[str], str]) -> Column | Any:
+    return Column(function(operand.name)) if isinstance(operand, Column) else operand
+
+
+def get_operand_getter(operand: Column | Any) -> Callable[[Record], Any]:
+    if isinstance(operand, Column):
+        name = operand.name
+        return lambda record: record[name]
+
+    return lambda record: operand
+
+
+class ComparisonCondition(Condition):
+    """
+    Condition on a single record comparing a column with another column or a constant,
+    e.g. `salary > 10000` or `right.id is null`.
+    """
+
+    def __init__(self, left: Column | Any, right: Column | Any, operator: str):
+        self.left = left
+        self.right = right
+        self.operator = operator
+
+    def __eq__(self, other):
+        if not isinstance(other, ComparisonCondition):
+            return False
+
+        return self.left == other.left and self.right == other.right and self.operator == other.operator
+
+    def __hash__(self):
+        return hash(('comparison', self.left, self.right, self.operator))
+
+    def __repr__(self):
+        return f'{format_operand(self.left)} {self.operator} {format_operand(self.right)}'
+
+    def columns(self) -> set[str]:
+        return {operand.name for operand in (self.left, self.right) if isinstance(operand, Column)}
+
+    def map_columns(self, function: Callable[[str], str]) -> 'ComparisonCondition':
+        return ComparisonCondition(map_operand(self.left, function), map_operand(self.right, function), self.operator)
+
+    def get_executable_condition(self) -> Callable[..., bool]:
+        get_left = get_operand_getter(self.left)
+        get_right = get_operand_getter(self.right)
+
+        if self.operator == 'is':
+            return lambda record: get_left(record) is get_right(record)
+
+        compare = OPERATORS[self.operator]
+
+        def condition(record: Record) -> bool:
+            left_value = get_left(record)
+            if left_value is None:
+                return False
+
+            right_value = get_right(record)
+            return right_value is not None and compare(left_value, right_value)
+
+        return condition
+
+
+class LogicalCondition(Condition):
+    def __init__(self, operator: str, left: Condition, right: Condition):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def __eq__(self, other):
+        if not isinstance(other, LogicalCondition):
+            return False
+
+        return self.operator == other.operator and self.left == other.left and self.right == other.right
+
+    def __hash__(self):
+        return hash((self.operator, self.left, self.right))
+
+    def __repr__(self):
+        return f'({self.left} {self.operator.upper()} {self.right})'
+
+    def columns(self) -> set[str]:
+        return self.left.columns() | self.right.columns()
+
+    def map_columns(self, function: Callable[[str], str]) -> 'LogicalCondition':
+        return LogicalCondition(self.operator, self.left.map_columns(function), self.right.map_columns(function))
+
+    def get_executable_condition(self) -> Callable[..., bool]:
+        left = self.left.get_executable_condition()
+        right = self.right.get_executable_condition()
+
+        if self.operator == 'and':
+            return lambda record: left(record) and right(record)
+
+        return lambda record: left(record) or right(record)
+
+
+class SortKey:
+    """
+    Sort key of a column. Unless nulls_first is given, NULLs sort as larger than any value,
+    so they come last in ascending and first in descending order.
+    """
+
+    def __init__(self, column: str, ascending: bool = True, nulls_first: Optional[bool] = None):
+        self.column = column
+        self.ascending = ascending
+        self.nulls_first = nulls_first
+
+    @property
+    def nulls_last(self) -> bool:
+        return self.ascending if self.nulls_first is None else not self.nulls_first
+
+    def __eq__(self, other):
+        if not isinstance(other, SortKey):
+            return False
+
+        return self.column == other.column and self.ascending == other.ascending and self.nulls_first == other.nulls_first
+
+    def __hash__(self):
+        return hash((self.column, self.ascending, self.nulls_first))
+
+    def __repr__(self):
+        nulls = '' if self.nulls_first is None else f' NULLS {"FIRST" if self.nulls_first else "LAST"}'
+        return f'{self.column} {"ASC" if self.ascending else "DESC"}{nulls}'
+
+
 class Node:
-    pass
+    def children(self) -> list['Node']:
+        return []
+
+    def with_children(self, children: list['Node']) -> 'Node':
+        return self
+
+    def describe(self) -> str:
+        """
+        Description of the node itself without its children.
+        """
+        return repr(self)
 
 
 class ScanNode(Node):
@@ -48,6 +272,9 @@ class ScanNode(Node):
 
         return self.table == other.table
 
+    def __hash__(self):
+        return hash(('scan', self.table))
+
     def __repr__(self):
         return f'Scan(table="{self.table}")'
 
@@ -56,6 +283,9 @@ class JoinType(Enum):
     CARTESIAN_JOIN = 'cartesian_join'
     INNER_JOIN = 'inner_join'
     LEFT_OUTER_JOIN = 'left_outer_join'
+    # semi and anti joins return only the left part of the joined records
+    SEMI_JOIN = 'semi_join'
+    ANTI_JOIN = 'anti_join'
 
 
 class JoinNode(Node):
@@ -76,12 +306,203 @@ class JoinNode(Node):
             and self.conditions == other.conditions
         )
 
+    def __hash__(self):
+        return hash((self.join_type, self.left, self.right, tuple(self.conditions)))
+
     def __repr__(self):
         conditions = ' AND '.join([
             repr(condition) for condition in self.conditions
         ])
         return f'Join(type={self.join_type}, left={self.left}, right={self.right}, on="{conditions}")'
 
+    def children(self) -> list[Node]:
+        return [self.left, self.right]
+
+    def with_children(self, children: list[Node]) -> 'JoinNode':
+        left, right = children
+        return JoinNode(self.join_type, left, right, self.conditions)
+
+    def describe(self) -> str:
+        conditions = ' AND '.join([
+            repr(condition) for condition in self.conditions
+        ])
+        return f'Join(type={self.join_type}, on="{conditions}")'
+
+
+class FilterNode(Node):
+    def __init__(self, node: Node, condition: Condition):
+        self.node = node
+        self.condition = condition
+
+    def __eq__(self, other):
+        if not isinstance(other, FilterNode):
+            return False
+
+        return self.node == other.node and self.condition == other.condition
+
+    def __hash__(self):
+        return hash(('filter', self.node, self.condition))
+
+    def __repr__(self):
+        return f'Filter(node={self.node}, condition="{self.condition}")'
+
+    def children(self) -> list[Node]:
+        return [self.node]
+
+    def with_children(self, children: list[Node]) -> 'FilterNode':
+        return FilterNode(children[0], self.condition)
+
+    def describe(self) -> str:
+        return f'Filter(condition="{self.condition}")'
+
+
+class ProjectionNode(Node):
+    """
+    Projects records onto the output columns. Columns map output names to the source columns.
+    """
+
+    def __init__(self, node: Node, columns: dict[str, str]):
+        self.node = node
+        self.columns = columns
+
+    def __eq__(self, other):
+        if not isinstance(other, ProjectionNode):
+            return False
+
+        return self.node == other.node and self.columns == other.columns
+
+    def __hash__(self):
+        return hash(('projection', self.node, frozenset(self.columns.items())))
+
+    def __repr__(self):
+        return f'Projection(node={self.node}, columns="{self.format_columns()}")'
+
+    def format_columns(self) -> str:
+        return ', '.join([
+            source if name == source else f'{source} AS {name}'
+            for name, source in self.columns.items()
+        ])
+
+    def children(self) -> list[Node]:
+        return [self.node]
+
+    def with_children(self, children: list[Node]) -> 'ProjectionNode':
+        return ProjectionNode(children[0], self.columns)
+
+    def describe(self) -> str:
+        return f'Projection(columns="{self.format_columns()}")'
+
+
+class SortNode(Node):
+    """
+    Sorts records by the keys. With a limit only the first records are produced (top-N sort).
+    """
+
+    def __init__(self, node: Node, keys: list[SortKey], limit: Optional[int] = None):
+        self.node = node
+        self.keys = keys
+        self.limit = limit
+
+    def __eq__(self, other):
+        if not isinstance(other, SortNode):
+            return False
+
+        return self.node == other.node and self.keys == other.keys and self.limit == other.limit
+
+    def __hash__(self):
+        return hash(('sort', self.node, tuple(self.keys), self.limit))
+
+    def __repr__(self):
+        keys = ', '.join([repr(key) for key in self.keys])
+        limit = '' if self.limit is None else f', limit={self.limit}'
+        return f'Sort(node={self.node}, keys="{keys}"{limit})'
+
+    def children(self) -> list[Node]:
+        return [self.node]
+
+    def with_children(self, children: list[Node]) -> 'SortNode':
+        return SortNode(children[0], self.keys, self.limit)
+
+    def describe(self) -> str:
+        keys = ', '.join([repr(key) for key in self.keys])
+        limit = '' if self.limit is None else f', limit={self.limit}'
+        return f'Sort(keys="{keys}"{limit})'
+
+
+class LimitNode(Node):
+    """
+    Skips the first `offset` records and produces at most `limit` of the following ones,
+    without a limit all the remaining records are produced.
+    """
+
+    def __init__(self, node: Node, limit: Optional[int], offset: int = 0):
+        self.node = node
+        self.limit = limit
+        self.offset = offset
+
+    def __eq__(self, other):
+        if not isinstance(other, LimitNode):
+            return False
+
+        return self.node == other.node and self.limit == other.limit and self.offset == other.offset
+
+    def __hash__(self):
+        return hash(('limit', self.node, self.limit, self.offset))
+
+    def __repr__(self):
+        return f'Limit(node={self.node}, {self.format_bounds()})'
+
+    def format_bounds(self) -> str:
+        bounds = [] if self.limit is None else [f'limit={self.limit}']
+        if self.offset > 0 or self.limit is None:
+            bounds.append(f'offset={self.offset}')
+        return ', '.join(bounds)
+
+    def children(self) -> list[Node]:
+        return [self.node]
+
+    def with_children(self, children: list[Node]) -> 'LimitNode':
+        return LimitNode(children[0], self.limit, self.offset)
+
+    def describe(self) -> str:
+        return f'Limit({self.format_bounds()})'
+
+
+class AggregateNode(Node):
+    """
+    Groups records by the group columns and computes the aggregates of each group. Output records
+    have the group columns under their names and the aggregate results under the aggregate names.
+    """
+
+    def __init__(self, node: Node, group_by: list[str], aggregates: dict[str, Aggregate]):
+        self.node = node
+        self.group_by = group_by
+        self.aggregates = aggregates
+
+    def __eq__(self, other):
+        if not isinstance(other, AggregateNode):
+            return False
+
+        return self.node == other.node and self.group_by == other.group_by and self.aggregates == other.aggregates
+
+    def __hash__(self):
+        return hash(('aggregate', self.node, tuple(self.group_by), frozenset(self.aggregates.items())))
+
+    def __repr__(self):
+        return f'Aggregate(node={self.node}, group_by="{", ".join(self.group_by)}", aggregates="{self.format_aggregates()}")'
+
+    def format_aggregates(self) -> str:
+        return ', '.join([f'{aggregate} AS {name}' for name, aggregate in self.aggregates.items()])
+
+    def children(self) -> list[Node]:
+        return [self.node]
+
+    def with_children(self, children: list[Node]) -> 'AggregateNode':
+        return AggregateNode(children[0], self.group_by, self.aggregates)
+
+    def describe(self) -> str:
+        return f'Aggregate(group_by="{", ".join(self.group_by)}", aggregates="{self.format_aggregates()}")'
+
 
 class QueryPlan:
     def __init__(self, node: Node):
@@ -93,10 +514,66 @@ class QueryPlan:
 
         return self.node == other.node
 
+    def __hash__(self):
+        return hash(self.node)
+
     def __repr__(self):
         return f'QueryPlan(node={self.node})'
 
 
+def format_plan(node: Node, depth: int = 0) -> str:
+    """
+    Renders the plan as an indented tree with one node per line.
+    """
+    lines = ['  ' * depth + node.describe()]
+    for child in node.children():
+        lines.append(format_plan(child, depth + 1))
+    return '\n'.join(lines)
+
+
+def is_null_check(condition: Condition, columns: set[str]) -> bool:
+    match condition:
+        case ComparisonCondition(left=Column(name=name), right=None, operator='is'):
+            return name in columns
+
+    return False
+
+
+def rewrite_anti_join(join: JoinNode, condition: Condition) -> tuple[JoinNode, Optional[Condition]]:
+    """
+    A left outer join filtered by `right.x is null`, where x is compared in a join condition, keeps only
+    the left records without a match, as a matched right record can't have NULL in x. Such a join is
+    replaced by an anti join and the remaining part of the condition is returned.
+    """
+    join_columns = {
+        f'right.{join_condition.right}'
+        for join_condition in join.conditions
+        if isinstance(join_condition, BinaryCondition)
+    }
+
+    conjuncts = []
+    pending = [condition]
+    while pending:
+        conjunct = pending.pop()
+        if isinstance(conjunct, LogicalCondition) and conjunct.operator == 'and':
+            pending.extend([conjunct.right, conjunct.left])
+        else:
+            conjuncts.append(conjunct)
+
+    remaining = [conjunct for conjunct in conjuncts if not is_null_check(conjunct, join_columns)]
+    if len(remaining) == len(conjuncts):
+        return join, condition
+
+    join = JoinNode(JoinType.ANTI_JOIN, join.left, join.right, join.conditions)
+    if len(remaining) == 0:
+        return join, None
+
+    result = remaining[0]
+    for conjunct in remaining[1:]:
+        result = LogicalCondition('and', result, conjunct)
+    return join, result
+
+
 class QueryPlanBuilder:
     def __init__(self):
         self.__stack = []
@@ -111,5 +588,29 @@ class QueryPlanBuilder:
         self.__stack.append(JoinNode(join_type, left, right, conditions))
         return self
 
+    def filter(self, condition: Condition):
+        node = self.__stack.pop()
+        if isinstance(node, JoinNode) and node.join_type == JoinType.LEFT_OUTER_JOIN:
+            node, condition = rewrite_anti_join(node, condition)
+
+        self.__stack.append(node if condition is None else FilterNode(node, condition))
+        return self
+
+    def projection(self, columns: dict[str, str]):
+        self.__stack.append(ProjectionNode(self.__stack.pop(), columns))
+        return self
+
+    def aggregate(self, group_by: list[str], aggregates: dict[str, Aggregate]):
+        self.__stack.append(AggregateNode(self.__stack.pop(), group_by, aggregates))
+        return self
+
+    def sort(self, keys: list[SortKey]):
+        self.__stack.append(SortNode(self.__stack.pop(), keys))
+        return self
+
+    def limit(self, limit: Optional[int], offset: int = 0):
+        self.__stack.append(LimitNode(self.__stack.pop(), limit, offset))
+        return self
+
     def build(self) -> QueryPlan:
         return QueryPlan(self.__stack.pop())
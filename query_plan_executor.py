@@ -1,27 +1,776 @@
-from database_engine import inner_join, left_outer_join
-from models import Table
-from query_plan_builder import QueryPlan, JoinNode, JoinType, ScanNode, Node
+import os
+from collections.abc import Collection
+from concurrent.futures import ProcessPoolExecutor, Executor
+from contextvars import ContextVar
+from itertools import islice, chain
+from typing import Optional, Callable, Any, Iterable
 
+from database_engine import iter_inner_join, iter_left_outer_join, iter_cross_join, iter_select, iter_projection, \
+    iter_rename, iter_index_nested_loop_join, iter_sort, iter_top_n, iter_semi_join, iter_anti_join, \
+    iter_hash_semi_join, iter_hash_anti_join, iter_hash_aggregate, get_join_key, iter_batches, iter_batch_select, \
+    iter_batch_projection, iter_batch_rename, iter_batch_hash_inner_join, \
+    iter_batch_hash_inner_join_build_left, iter_batch_hash_left_outer_join, flatten_batches, Batches, BATCH_SIZE, \
+    iter_merge_join, iter_range_join, iter_grace_hash_join, GraceHashJoin, SpillStatistics
+from column_file import MappedColumnTable
+from indexes import IndexedTable, SortedIndex
+from models import Table, Records, Record, Condition as Predicate, BiCondition
+from query_plan_builder import QueryPlan, JoinNode, JoinType, ScanNode, Node, Condition, BinaryCondition, FilterNode, \
+    ProjectionNode, SortNode, SortKey, AggregateNode, LimitNode, ComparisonCondition, Column, FLIPPED_OPERATORS
+from predicate_compiler import compile_predicate, compile_join_predicate, compile_batch_filter
+from query_plan_optimizer import reorder_joins, split_conjuncts, push_down_limits
+from table_statistics import StatisticsCatalog
 
-def execute_query_plan_node(plan: Node, tables: dict[str, Table]) -> Table:
+
+def get_equi_join_columns(conditions: list[Condition]) -> Optional[tuple[list[str], list[str]]]:
+    """
+    Returns left and right join columns when all conditions are equality comparisons,
+    otherwise None and the join has to be evaluated with a nested loop.
+    """
+    if len(conditions) == 0:
+        return None
+
+    if not all(isinstance(condition, BinaryCondition) and condition.is_equality() for condition in conditions):
+        return None
+
+    return [condition.left for condition in conditions], [condition.right for condition in conditions]
+
+
+class Descending:
+    """
+    Sort key wrapper inverting the order of the wrapped value, used for keys sorted in the opposite
+    direction than the first key.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __lt__(self, other: 'Descending') -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return isinstance(other, Descending) and self.value == other.value
+
+
+def get_sort_key(keys: list[SortKey]) -> tuple[Callable[[Record], Any], bool]:
+    """
+    Key function producing native, directly comparable keys, and whether the sort is reversed.
+    Each column becomes a (rank, value) pair where the rank places NULLs before or after the values.
+    Only columns sorted in the other direction than the first one need the Descending wrapper.
+    """
+    reverse = not keys[0].ascending
+    getters = []
+    for key in keys:
+        null_rank = int(key.nulls_last == key.ascending)
+        getters.append(get_sort_key_getter(key.column, null_rank, key.ascending == reverse))
+
+    if len(getters) == 1:
+        return getters[0], reverse
+
+    return lambda record: tuple([getter(record) for getter in getters]), reverse
+
+
+def get_sort_key_getter(column: str, null_rank: int, inverted: bool) -> Callable[[Record], Any]:
+    value_rank = 1 - null_rank
+
+    def getter(record: Record) -> Any:
+        value = record[column]
+        return (null_rank, None) if value is None else (value_rank, value)
+
+    if inverted:
+        return lambda record: Descending(getter(record))
+    return getter
+
+
+def iter_projected(records: Records, columns: dict[str, str]) -> Records:
+    aliases = {source: name for name, source in columns.items() if name != source}
+    if len(aliases) > 0:
+        records = iter_rename(records, aliases)
+    return iter_projection(records, set(columns))
+
+
+def iter_batch_projected(batches: Batches, columns: dict[str, str]) -> Batches:
+    aliases = {source: name for name, source in columns.items() if name != source}
+    if len(aliases) > 0:
+        batches = iter_batch_rename(batches, aliases)
+    return iter_batch_projection(batches, set(columns))
+
+
+IndexLookup = Callable[[Any], Iterable[Record]]
+
+
+class TableSource:
+    """
+    Table read by a scan, optionally through a projection as inserted by column pruning.
+    Column names of the node output are mapped to the table columns.
+    """
+
+    def __init__(self, table: Table, columns: Optional[dict[str, str]] = None):
+        self.table = table
+        self.columns = columns
+
+    def get_column(self, name: str) -> Optional[str]:
+        return name if self.columns is None else self.columns.get(name)
+
+    def output(self, records: Records) -> Records:
+        return records if self.columns is None else iter_projected(records, self.columns)
+
+
+class IndexedSource(TableSource):
+    """
+    Indexed table read by a scan, column names are mapped to the table columns to find their indexes.
+    """
+    table: IndexedTable
+
+    def get_lookup(self, name: str, operator: str) -> Optional[IndexLookup]:
+        """
+        Function returning the records for which `name operator value` may hold, read from an index.
+        Returns None when the column has no index usable for the operator.
+        """
+        column = self.get_column(name)
+        if column is None:
+            return None
+
+        if operator == '=':
+            index = self.table.get_hash_index(column)
+            return None if index is None else index.lookup
+
+        index = self.table.get_sorted_index(column)
+        if index is None:
+            return None
+
+        match operator:
+            case '<':
+                return lambda value: () if value is None else index.range(high=value, include_high=False)
+            case '<=':
+                return lambda value: () if value is None else index.range(high=value)
+            case '>':
+                return lambda value: () if value is None else index.range(low=value, include_low=False)
+            case '>=':
+                return lambda value: () if value is None else index.range(low=value)
+
+        return None
+
+    def get_sorted_index(self, name: str) -> Optional[SortedIndex]:
+        column = self.get_column(name)
+        return None if column is None else self.table.get_sorted_index(column)
+
+
+def get_indexed_source(node: Node, tables: dict[str, Table]) -> Optional[IndexedSource]:
+    match node:
+        case ScanNode(table=table) if isinstance(tables.get(table), IndexedTable):
+            return IndexedSource(tables[table])
+        case ProjectionNode(node=ScanNode(table=table), columns=columns) if isinstance(tables.get(table), IndexedTable):
+            return IndexedSource(tables[table], columns)
+
+    return None
+
+
+class ColumnFileSource(TableSource):
+    """
+    Memory-mapped column file read by a scan, only the columns of the projection are decoded.
+    """
+    table: MappedColumnTable
+
+    def scan(self, condition: Optional[Condition] = None) -> Records:
+        """
+        Records of the blocks where the condition may hold, the condition is mapped to the table columns
+        so block statistics can be checked, but it still has to be applied to the records.
+        """
+        if self.columns is None:
+            return self.table.scan(condition=condition)
+
+        if condition is not None:
+            condition = condition.map_columns(lambda name: self.columns.get(name, name))
+        return self.output(self.table.scan(set(self.columns.values()), condition))
+
+
+def get_column_file_source(node: Node, tables: dict[str, Table]) -> Optional[ColumnFileSource]:
+    match node:
+        case ScanNode(table=table) if isinstance(tables.get(table), MappedColumnTable):
+            return ColumnFileSource(tables[table])
+        case ProjectionNode(node=ScanNode(table=table), columns=columns) \
+                if isinstance(tables.get(table), MappedColumnTable):
+            return ColumnFileSource(tables[table], columns)
+
+    return None
+
+
+def index_scan(source: Optional[IndexedSource], condition: Condition) -> Optional[Records]:
+    """
+    Candidate records for a filter read from an index on a column compared with a constant in one
+    of the conjuncts, equality lookups are preferred over ranges. The whole condition still has to be
+    applied to the candidates. Returns None when no index can be used.
+    """
+    if source is None:
+        return None
+
+    lookups = []
+    for conjunct in split_conjuncts(condition):
+        match conjunct:
+            case ComparisonCondition(left=Column(name=name), right=value, operator=operator) \
+                    if not isinstance(value, Column) and operator in FLIPPED_OPERATORS:
+                pass
+            case ComparisonCondition(left=value, right=Column(name=name), operator=operator) \
+                    if not isinstance(value, Column) and operator in FLIPPED_OPERATORS:
+                operator = FLIPPED_OPERATORS[operator]
+            case _:
+                continue
+
+        lookup = source.get_lookup(name, operator)
+        if lookup is not None:
+            lookups.append((operator != '=', lookup, value))
+
+    if len(lookups) == 0:
+        return None
+
+    _, lookup, value = min(lookups, key=lambda item: item[0])
+    return source.output(lookup(value))
+
+
+def get_index_join(
+    source: Optional[IndexedSource],
+    conditions: list[Condition]
+) -> Optional[tuple[IndexLookup, str, list[Condition]]]:
+    """
+    Finds a join condition on a column with an index of the right input, so the join can probe the index
+    with values of the left records. Returns the lookup, the left column and the remaining conditions.
+    """
+    if source is None:
+        return None
+
+    candidates = [
+        condition for condition in conditions
+        if isinstance(condition, BinaryCondition) and condition.operator in FLIPPED_OPERATORS
+    ]
+    for condition in sorted(candidates, key=lambda condition: not condition.is_equality()):
+        # `left operator right` is looked up as `right flipped operator left` in the index of the right column
+        lookup = source.get_lookup(condition.right, FLIPPED_OPERATORS[condition.operator])
+        if lookup is not None:
+            remaining = [other for other in conditions if other is not condition]
+            return lambda value: source.output(lookup(value)), condition.left, remaining
+
+    return None
+
+
+def get_range_join(
+    conditions: list[Condition]
+) -> Optional[tuple[str, Optional[tuple[str, bool]], Optional[tuple[str, bool]], list[Condition]]]:
+    """
+    Finds comparisons bounding a column of the right input by columns of the left input, so the join
+    can merge inputs sorted by them. Returns the right column, the lower and the upper bound
+    as (left column, inclusive) and the remaining conditions.
+    """
+    comparisons = [
+        condition for condition in conditions
+        if isinstance(condition, BinaryCondition) and condition.operator in ('<', '<=', '>', '>=')
+    ]
+    if len(comparisons) == 0:
+        return None
+
+    column = comparisons[0].right
+    lower = upper = None
+    bounds = []
+    for condition in comparisons:
+        if condition.right != column:
+            continue
+        # `left < right` bounds the right column from below, `left > right` from above
+        if condition.operator in ('<', '<=') and lower is None:
+            lower = condition.left, condition.operator == '<='
+            bounds.append(condition)
+        elif condition.operator in ('>', '>=') and upper is None:
+            upper = condition.left, condition.operator == '>='
+            bounds.append(condition)
+
+    remaining = [condition for condition in conditions if all(condition is not bound for bound in bounds)]
+    return column, lower, upper, remaining
+
+
+def get_max_rows(node: Node, tables: dict[str, Table]) -> Optional[int]:
+    """
+    Upper bound of the number of records produced by the node, None when it isn't known without executing it.
+    """
+    match node:
+        case ScanNode(table=table) if isinstance(tables[table], Collection):
+            return len(tables[table])
+        case FilterNode(node=child) | ProjectionNode(node=child) | SortNode(node=child, limit=None):
+            return get_max_rows(child, tables)
+        case SortNode(node=child, limit=limit) | LimitNode(node=child, limit=limit):
+            rows = get_max_rows(child, tables)
+            return limit if rows is None or limit is None else min(rows, limit)
+    return None
+
+
+def is_build_left(left: Node, right: Node, tables: dict[str, Table]) -> Optional[bool]:
+    """
+    Whether a hash join should build on the left input, because it's known to be smaller than the right one.
+    The probe side is streamed, so a limit above the join stops reading it. None when a bound isn't known.
+    """
+    left_rows, right_rows = get_max_rows(left, tables), get_max_rows(right, tables)
+    if left_rows is None or right_rows is None:
+        return None
+    return left_rows < right_rows
+
+
+def is_sorted(node: Node, tables: dict[str, Table], columns: list[str]) -> bool:
+    """
+    Whether the records of the node are known to be in ascending order of the columns, because the node
+    sorts by them or reads a table with a sorted index of the column.
+    """
+    match node:
+        case SortNode(keys=keys) if [key.column for key in keys[:len(columns)]] == columns \
+                and all(key.ascending for key in keys[:len(columns)]):
+            return True
+
+    source = get_indexed_source(node, tables)
+    return source is not None and len(columns) == 1 and source.get_sorted_index(columns[0]) is not None
+
+
+def iterate_sorted(node: Node, tables: dict[str, Table], columns: list[str]) -> Records:
+    """
+    Records of the node in ascending order of the columns, they are sorted only when the order isn't known.
+    """
+    source = get_indexed_source(node, tables)
+    if source is not None and len(columns) == 1 and (index := source.get_sorted_index(columns[0])) is not None:
+        return source.output(index.scan())
+
+    records = iterate_query_plan_node(node, tables)
+    if is_sorted(node, tables, columns):
+        return records
+
+    key, _ = get_sort_key([SortKey(column) for column in columns])
+    return iter_sort(records, key)
+
+
+# profiler instrumenting the executed nodes, set by query_profiler.explain_analyze
+ACTIVE_PROFILER: ContextVar[Optional[Any]] = ContextVar('active_profiler', default=None)
+
+
+def get_predicate(condition: Condition) -> Predicate:
+    predicate = compile_predicate(condition)
+    profiler = ACTIVE_PROFILER.get()
+    return predicate if profiler is None else profiler.count_evaluations(predicate)
+
+
+def get_join_predicate(conditions: list[Condition]) -> Optional[BiCondition]:
+    predicate = compile_join_predicate(conditions)
+    profiler = ACTIVE_PROFILER.get()
+    return predicate if profiler is None or predicate is None else profiler.count_evaluations(predicate)
+
+
+def get_spill_statistics() -> SpillStatistics:
+    statistics = SpillStatistics()
+    profiler = ACTIVE_PROFILER.get()
+    return statistics if profiler is None else profiler.track_spills(statistics)
+
+
+def iterate_query_plan_node(plan: Node, tables: dict[str, Table]) -> Records:
+    """
+    Pull-based execution of a plan node: records are produced lazily as the consumer asks for them.
+    Only pipeline breakers such as the build side of a join keep records in memory.
+    """
+    profiler = ACTIVE_PROFILER.get()
+    if profiler is not None:
+        return profiler.iterate(plan, tables, iterate_operator)
+    return iterate_operator(plan, tables)
+
+
+def iterate_operator(plan: Node, tables: dict[str, Table]) -> Records:
     match plan:
+        case JoinNode(join_type=JoinType.INNER_JOIN | JoinType.LEFT_OUTER_JOIN as join_type, left=left, right=right,
+                      conditions=conditions) \
+                if (index_join := get_index_join(get_indexed_source(right, tables), conditions)) is not None:
+            lookup, left_column, remaining = index_join
+            return iter_index_nested_loop_join(
+                iterate_query_plan_node(left, tables),
+                lookup,
+                left_column,
+                get_join_predicate(remaining),
+                join_type == JoinType.LEFT_OUTER_JOIN
+            )
+        case JoinNode(join_type=JoinType.INNER_JOIN | JoinType.LEFT_OUTER_JOIN as join_type, left=left, right=right,
+                      conditions=conditions) \
+                if (columns := get_equi_join_columns(conditions)) is not None \
+                and is_sorted(left, tables, columns[0]) and is_sorted(right, tables, columns[1]):
+            return iter_merge_join(
+                iterate_sorted(left, tables, columns[0]),
+                iterate_sorted(right, tables, columns[1]),
+                *columns,
+                join_type == JoinType.LEFT_OUTER_JOIN
+            )
+        case JoinNode(join_type=JoinType.INNER_JOIN | JoinType.LEFT_OUTER_JOIN as join_type, left=left, right=right,
+                      conditions=conditions) \
+                if (columns := get_equi_join_columns(conditions)) is not None:
+            return iter_grace_hash_join(
+                iterate_query_plan_node(left, tables),
+                iterate_query_plan_node(right, tables),
+                *columns,
+                join_type == JoinType.LEFT_OUTER_JOIN,
+                statistics=get_spill_statistics(),
+                build_left=is_build_left(left, right, tables)
+            )
+        case JoinNode(join_type=JoinType.INNER_JOIN | JoinType.LEFT_OUTER_JOIN as join_type, left=left, right=right,
+                      conditions=conditions) \
+                if (range_join := get_range_join(conditions)) is not None:
+            column, lower, upper, remaining = range_join
+            left_column, _ = lower or upper
+            return iter_range_join(
+                iterate_sorted(left, tables, [left_column]),
+                iterate_sorted(right, tables, [column]),
+                column,
+                lower,
+                upper,
+                get_join_predicate(remaining),
+                join_type == JoinType.LEFT_OUTER_JOIN
+            )
         case JoinNode(join_type=JoinType.INNER_JOIN, left=left, right=right, conditions=conditions):
-            return inner_join(
-                execute_query_plan_node(left, tables),
-                execute_query_plan_node(right, tables),
-                lambda l, r: all(condition.get_executable_condition()(l, r) for condition in conditions)
+            return iter_inner_join(
+                iterate_query_plan_node(left, tables),
+                iterate_query_plan_node(right, tables),
+                get_join_predicate(conditions) or (lambda l, r: True)
             )
         case JoinNode(join_type=JoinType.LEFT_OUTER_JOIN, left=left, right=right, conditions=conditions):
-            return left_outer_join(
-                execute_query_plan_node(left, tables),
-                execute_query_plan_node(right, tables),
-                lambda l, r: all(condition.get_executable_condition()(l, r) for condition in conditions)
+            return iter_left_outer_join(
+                iterate_query_plan_node(left, tables),
+                iterate_query_plan_node(right, tables),
+                get_join_predicate(conditions) or (lambda l, r: True)
+            )
+        case JoinNode(join_type=JoinType.SEMI_JOIN | JoinType.ANTI_JOIN as join_type, left=left, right=right,
+                      conditions=conditions):
+            return map(Record.joined, iterate_filtering_join(
+                join_type == JoinType.SEMI_JOIN,
+                iterate_query_plan_node(left, tables),
+                iterate_query_plan_node(right, tables),
+                conditions
+            ))
+        case JoinNode(join_type=JoinType.CARTESIAN_JOIN, left=left, right=right):
+            return iter_cross_join(
+                iterate_query_plan_node(left, tables),
+                iterate_query_plan_node(right, tables)
             )
+        case FilterNode(node=node, condition=condition) \
+                if (records := index_scan(get_indexed_source(node, tables), condition)) is not None:
+            return iter_select(records, get_predicate(condition))
+        case FilterNode(node=node, condition=condition) \
+                if (source := get_column_file_source(node, tables)) is not None:
+            return iter_select(source.scan(condition), get_predicate(condition))
+        case FilterNode(node=node, condition=condition):
+            return iter_select(iterate_query_plan_node(node, tables), get_predicate(condition))
+        case ProjectionNode() if (source := get_column_file_source(plan, tables)) is not None:
+            return source.scan()
+        case ProjectionNode(node=node, columns=columns):
+            return iter_projected(iterate_query_plan_node(node, tables), columns)
+        case SortNode(node=node, keys=[key], limit=limit) \
+                if key.nulls_last == key.ascending \
+                and (source := get_indexed_source(node, tables)) is not None \
+                and (column := source.get_column(key.column)) is not None \
+                and (index := source.table.get_sorted_index(column)) is not None:
+            return source.output(islice(index.scan(key.ascending), limit))
+        case SortNode(node=node, keys=keys, limit=limit):
+            key, reverse = get_sort_key(keys)
+            records = iterate_query_plan_node(node, tables)
+            if limit is not None:
+                return iter_top_n(records, limit, key, reverse)
+            return iter_sort(records, key, reverse)
+        case LimitNode(node=node, limit=limit, offset=offset):
+            return islice(iterate_query_plan_node(node, tables), offset, None if limit is None else offset + limit)
+        case AggregateNode(node=node, group_by=group_by, aggregates=aggregates):
+            return iter_hash_aggregate(iterate_query_plan_node(node, tables), group_by, aggregates)
         case ScanNode(table=table):
             return tables[table]
         case _:
-            return set()
+            return iter(())
+
+
+def iterate_filtering_join(semi: bool, left: Records, right: Records, conditions: list[Condition]) -> Records:
+    """
+    Semi or anti join of the inputs, producing the left records.
+    """
+    columns = get_equi_join_columns(conditions)
+    if columns is not None:
+        return (iter_hash_semi_join if semi else iter_hash_anti_join)(left, right, *columns)
+
+    condition = get_join_predicate(conditions) or (lambda l, r: True)
+    return (iter_semi_join if semi else iter_anti_join)(left, right, condition)
+
+
+class ParallelOptions:
+    """
+    Settings of parallel execution. Inputs smaller than min_rows are processed serially, as sending
+    records to the worker processes would cost more than it saves.
+    """
+
+    def __init__(self, workers: Optional[int] = None, partitions: Optional[int] = None, min_rows: int = 50_000):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.partitions = self.workers if partitions is None else partitions
+        self.min_rows = min_rows
+
+    def __repr__(self):
+        return f'ParallelOptions(workers={self.workers}, partitions={self.partitions}, min_rows={self.min_rows})'
+
+
+PARTITIONED_JOIN_TYPES = (JoinType.INNER_JOIN, JoinType.LEFT_OUTER_JOIN, JoinType.SEMI_JOIN, JoinType.ANTI_JOIN)
+
+
+class ParallelExecution:
+    """
+    Executes equi-joins and filters in a process pool. Both join inputs are hash partitioned by the join key,
+    so the partitions can be joined independently, and filter inputs are split into chunks. Other nodes run
+    serially over the results of their children. The pool is started only when an input is large enough.
+    """
+
+    def __init__(self, tables: dict[str, Table], options: ParallelOptions):
+        self.tables = tables
+        self.options = options
+        self.__pool: Optional[Executor] = None
+
+    def close(self):
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+    def iterate(self, node: Node) -> Records:
+        match node:
+            case JoinNode() if is_index_join(node, self.tables):
+                return iterate_query_plan_node(node, self.tables)
+            case FilterNode(node=child, condition=condition) \
+                    if index_scan(get_indexed_source(child, self.tables), condition) is not None:
+                return iterate_query_plan_node(node, self.tables)
+            case FilterNode(node=JoinNode(join_type=join_type, conditions=conditions) as join, condition=condition) \
+                    if join_type in PARTITIONED_JOIN_TYPES and get_equi_join_columns(conditions) is not None \
+                    and not is_index_join(join, self.tables):
+                return self.iterate_join(join, condition)
+            case JoinNode(join_type=join_type, conditions=conditions) \
+                    if join_type in PARTITIONED_JOIN_TYPES and get_equi_join_columns(conditions) is not None:
+                return self.iterate_join(node, None)
+            case FilterNode(node=child, condition=condition):
+                return self.iterate_filter(child, condition)
+            case ScanNode(table=table):
+                return self.tables[table]
+
+        if all(isinstance(child, ScanNode) for child in node.children()):
+            return iterate_query_plan_node(node, self.tables)
+
+        return self.iterate_serially(node, [self.iterate(child) for child in node.children()])
+
+    def iterate_join(self, join: JoinNode, condition: Optional[Condition]) -> Records:
+        left = materialize_list(self.iterate(join.left))
+        right = materialize_list(self.iterate(join.right))
+        node = JoinNode(join.join_type, ScanNode('left'), ScanNode('right'), join.conditions)
+        if condition is not None:
+            node = FilterNode(node, condition)
+
+        if self.is_small(len(left) + len(right)):
+            return iterate_query_plan_node(node, {'left': left, 'right': right})
+
+        left_columns, right_columns = get_equi_join_columns(join.conditions)
+        # left records with NULL keys never match, but outer and anti joins still have to return them
+        keep_nulls = join.join_type in (JoinType.LEFT_OUTER_JOIN, JoinType.ANTI_JOIN)
+        left_partitions = partition_by_key(left, left_columns, self.options.partitions, keep_nulls)
+        right_partitions = partition_by_key(right, right_columns, self.options.partitions, False)
+
+        return self.run([
+            (node, {'left': left_partition, 'right': right_partition})
+            for left_partition, right_partition in zip(left_partitions, right_partitions)
+            if len(left_partition) > 0
+        ])
+
+    def iterate_filter(self, child: Node, condition: Condition) -> Records:
+        records = materialize_list(self.iterate(child))
+        node = FilterNode(ScanNode('input'), condition)
+        if self.is_small(len(records)):
+            return iterate_query_plan_node(node, {'input': records})
+
+        size = -(-len(records) // self.options.partitions)
+        return self.run([
+            (node, {'input': records[start:start + size]})
+            for start in range(0, len(records), size)
+        ])
+
+    def is_small(self, rows: int) -> bool:
+        return rows == 0 or rows < self.options.min_rows or self.options.workers <= 1
+
+    def iterate_serially(self, node: Node, inputs: list[Records]) -> Records:
+        names = [f'${position}' for position in range(len(inputs))]
+        return iterate_query_plan_node(
+            node.with_children([ScanNode(name) for name in names]),
+            dict(zip(names, inputs))
+        )
+
+    def run(self, tasks: list[tuple[Node, dict[str, Table]]]) -> Records:
+        if self.__pool is None:
+            self.__pool = ProcessPoolExecutor(max_workers=self.options.workers)
+
+        futures = [self.__pool.submit(execute_partition, node, tables) for node, tables in tasks]
+        return chain.from_iterable(future.result() for future in futures)
+
+
+class BatchExecution:
+    """
+    Executes filters, projections and hash joins on batches of records, so predicates and projections
+    are applied to a whole batch at once and operators pass one batch instead of every record.
+    Other nodes run record by record over the flattened batches of their children, as do nodes
+    reading an index or a column file.
+    """
+
+    def __init__(self, tables: dict[str, Table], batch_size: int = BATCH_SIZE):
+        self.tables = tables
+        self.batch_size = batch_size
+
+    def iterate(self, node: Node) -> Batches:
+        match node:
+            case JoinNode() if is_index_join(node, self.tables):
+                return self.iterate_rows(node)
+            case FilterNode(node=child, condition=condition) \
+                    if index_scan(get_indexed_source(child, self.tables), condition) is not None \
+                    or get_column_file_source(child, self.tables) is not None:
+                return self.iterate_rows(node)
+            case FilterNode(node=child, condition=condition):
+                return iter_batch_select(self.iterate(child), compile_batch_filter(condition))
+            case ProjectionNode() if get_column_file_source(node, self.tables) is not None:
+                return self.iterate_rows(node)
+            case ProjectionNode(node=child, columns=columns):
+                return iter_batch_projected(self.iterate(child), columns)
+            case JoinNode(join_type=JoinType.INNER_JOIN | JoinType.LEFT_OUTER_JOIN as join_type, left=left,
+                          right=right, conditions=conditions) \
+                    if (columns := get_equi_join_columns(conditions)) is not None:
+                return self.iterate_hash_join(left, right, columns, join_type == JoinType.LEFT_OUTER_JOIN)
+            case ScanNode(table=table):
+                return iter_batches(self.tables[table], self.batch_size)
+
+        if all(is_table_source(child) for child in node.children()):
+            return self.iterate_rows(node)
+
+        names = [f'${position}' for position in range(len(node.children()))]
+        inputs = [flatten_batches(self.iterate(child)) for child in node.children()]
+        return iter_batches(
+            iterate_query_plan_node(node.with_children([ScanNode(name) for name in names]), dict(zip(names, inputs))),
+            self.batch_size
+        )
+
+    def iterate_hash_join(
+        self,
+        left: Node,
+        right: Node,
+        columns: tuple[list[str], list[str]],
+        left_outer: bool
+    ) -> Batches:
+        """
+        Right records are read up to the memory limit of joins, a larger right input is joined
+        record by record by the grace hash join spilling partitions to disk.
+        """
+        join = GraceHashJoin(*columns, left_outer, statistics=get_spill_statistics())
+        left_rows = get_max_rows(left, self.tables)
+        if not left_outer and is_build_left(left, right, self.tables) and left_rows <= join.memory_limit:
+            # the right input is streamed, so a limit above the join stops reading it
+            return iter_batch_hash_inner_join_build_left(
+                flatten_batches(self.iterate(left)), self.iterate(right), *columns
+            )
+
+        right_records = flatten_batches(self.iterate(right))
+        build = list(islice(right_records, join.memory_limit + 1))
+        if len(build) > join.memory_limit:
+            return iter_batches(
+                join.iterate(flatten_batches(self.iterate(left)), chain(build, right_records)), self.batch_size
+            )
+
+        if left_outer:
+            return iter_batch_hash_left_outer_join(self.iterate(left), build, *columns)
+        if left_rows is not None and left_rows < len(build):
+            return iter_batch_hash_inner_join_build_left(
+                flatten_batches(self.iterate(left)), iter_batches(build, self.batch_size), *columns
+            )
+        return iter_batch_hash_inner_join(self.iterate(left), build, *columns)
+
+    def iterate_rows(self, node: Node) -> Batches:
+        return iter_batches(iterate_query_plan_node(node, self.tables), self.batch_size)
+
+
+def is_table_source(node: Node) -> bool:
+    """
+    Whether the node reads a table directly, operators may use indexes of such tables.
+    """
+    match node:
+        case ScanNode() | ProjectionNode(node=ScanNode()):
+            return True
+    return False
+
+
+def is_index_join(join: JoinNode, tables: dict[str, Table]) -> bool:
+    return (
+        join.join_type in (JoinType.INNER_JOIN, JoinType.LEFT_OUTER_JOIN)
+        and get_index_join(get_indexed_source(join.right, tables), join.conditions) is not None
+    )
+
+
+def execute_partition(node: Node, tables: dict[str, Table]) -> list[Record]:
+    return list(iterate_query_plan_node(node, tables))
+
+
+def materialize_list(records: Records) -> list[Record]:
+    return records if isinstance(records, list) else list(records)
+
+
+def partition_by_key(records: list[Record], columns: list[str], count: int, keep_nulls: bool) -> list[list[Record]]:
+    partitions = [[] for _ in range(count)]
+    for record in records:
+        key = get_join_key(record, columns)
+        if key is not None:
+            partitions[hash(key) % count].append(record)
+        elif keep_nulls:
+            partitions[0].append(record)
+    return partitions
+
+
+def iterate_query_plan(
+    plan: QueryPlan,
+    tables: dict[str, Table],
+    limit: Optional[int] = None,
+    statistics: Optional[StatisticsCatalog] = None,
+    batch_size: Optional[int] = None
+) -> Records:
+    """
+    When a statistics catalog is provided, statistics of the tables are collected (or taken from the catalog)
+    and used to reorder inner joins before execution. With a batch size, operators exchange batches of records.
+    Limits, including the limit argument, are pushed down to sorts, and as records are pulled lazily, scans and
+    joins below a limit stop once it's reached.
+    """
+    if statistics is not None:
+        plan = reorder_joins(plan, statistics.collect(tables))
+
+    node = push_down_limits(plan.node if limit is None else LimitNode(plan.node, limit))
+    if batch_size is None:
+        return iterate_query_plan_node(node, tables)
+    return flatten_batches(BatchExecution(tables, batch_size).iterate(node))
+
+
+def execute_query_plan_node(plan: Node, tables: dict[str, Table]) -> Table:
+    return Table(iterate_query_plan_node(plan, tables))
+
+
+def execute_query_plan(
+    plan: QueryPlan,
+    tables: dict[str, Table],
+    statistics: Optional[StatisticsCatalog] = None,
+    parallel: Optional[ParallelOptions] = None,
+    batch_size: Optional[int] = None
+) -> Table:
+    """
+    With parallel options, joins and filters of large inputs are executed in a pool of worker processes.
+    Otherwise, with a batch size, filters, projections and hash joins are executed on batches of records.
+    Workers execute their partitions record by record, so parallel options can't be combined with a batch size.
+    """
+    if parallel is not None and batch_size is not None:
+        raise ValueError('Batch execution is not supported with parallel options, pass only one of them')
+
+    if parallel is None:
+        return Table(iterate_query_plan(plan, tables, statistics=statistics, batch_size=batch_size))
 
+    if statistics is not None:
+        plan = reorder_joins(plan, statistics.collect(tables))
 
-def execute_query_plan(plan: QueryPlan, tables: dict[str, Table]) -> Table:
-    return execute_query_plan_node(plan.node, tables)
+    execution = ParallelExecution(tables, parallel)
+    try:
+        return Table(execution.iterate(push_down_limits(plan.node)))
+    finally:
+        execution.close()
@@ -0,0 +1,572 @@
+from functools import reduce
+from typing import Optional
+
+from query_plan_builder import QueryPlan, Node, FilterNode, JoinNode, JoinType, ProjectionNode, SortNode, ScanNode, \
+    AggregateNode, Condition, ConstantCondition, ComparisonCondition, LogicalCondition, BinaryCondition, Column, OPERATORS, \
+    FLIPPED_OPERATORS, LimitNode, format_plan
+from table_statistics import TableStatistics
+
+
+def optimize(plan: QueryPlan, statistics: Optional[dict[str, TableStatistics]] = None) -> QueryPlan:
+    """
+    Rewrites the plan with rule-based optimizations:
+
+    * constant conditions are folded and filters which are always true are removed
+    * predicates are pushed down below sorts, projections and joins, and comparisons between both join
+      inputs which sit above a join are turned into join conditions
+    * columns which are not used by the rest of the plan are pruned right after scans
+    * limits are passed to the sorts below them, which then keep only the first records in a bounded heap
+
+    When table statistics are provided, inner joins are reordered by estimated cost as well.
+    """
+    node = fold_constants(plan.node)
+    node = push_down_predicates(node)
+    node = prune_columns(node, None)
+    node = push_down_limits(node)
+    plan = QueryPlan(node)
+
+    if statistics is not None:
+        plan = reorder_joins(plan, statistics)
+
+    return plan
+
+
+def explain(plan: QueryPlan, statistics: Optional[dict[str, TableStatistics]] = None) -> str:
+    return '\n'.join([
+        'Original plan:',
+        format_plan(plan.node),
+        '',
+        'Optimized plan:',
+        format_plan(optimize(plan, statistics).node),
+    ])
+
+
+def fold_constants(node: Node) -> Node:
+    node = node.with_children([fold_constants(child) for child in node.children()])
+
+    if isinstance(node, FilterNode):
+        condition = fold_condition(node.condition)
+        if condition == ConstantCondition(True):
+            return node.node
+        return FilterNode(node.node, condition)
+
+    return node
+
+
+def fold_condition(condition: Condition) -> Condition:
+    match condition:
+        case ComparisonCondition(left=left, right=right) \
+                if not isinstance(left, Column) and not isinstance(right, Column):
+            try:
+                return ConstantCondition(bool(condition.get_executable_condition()(None)))
+            except TypeError:
+                return condition
+        case LogicalCondition(operator=operator, left=left, right=right):
+            left = fold_condition(left)
+            right = fold_condition(right)
+
+            # value which decides the result on its own: false for AND, true for OR
+            dominant = ConstantCondition(operator == 'or')
+            neutral = ConstantCondition(operator != 'or')
+            if left == dominant or right == dominant:
+                return dominant
+            if left == neutral:
+                return right
+            if right == neutral:
+                return left
+
+            return LogicalCondition(operator, left, right)
+
+    return condition
+
+
+def split_conjuncts(condition: Condition) -> list[Condition]:
+    if isinstance(condition, LogicalCondition) and condition.operator == 'and':
+        return split_conjuncts(condition.left) + split_conjuncts(condition.right)
+    return [condition]
+
+
+def create_filter(node: Node, conjuncts: list[Condition]) -> Node:
+    if len(conjuncts) == 0:
+        return node
+
+    return FilterNode(node, reduce(lambda left, right: LogicalCondition('and', left, right), conjuncts))
+
+
+def push_down_predicates(node: Node) -> Node:
+    if isinstance(node, FilterNode):
+        return push_filter(push_down_predicates(node.node), split_conjuncts(node.condition))
+
+    return node.with_children([push_down_predicates(child) for child in node.children()])
+
+
+def push_filter(node: Node, conjuncts: list[Condition]) -> Node:
+    """
+    Places each conjunct of a filter as close to the scans as its columns allow.
+    """
+    if len(conjuncts) == 0:
+        return node
+
+    match node:
+        case FilterNode(node=child, condition=condition):
+            return push_filter(child, split_conjuncts(condition) + conjuncts)
+        case SortNode(node=child, limit=None):
+            return node.with_children([push_filter(child, conjuncts)])
+        case ProjectionNode(node=ScanNode()):
+            # filters read scans through projections (e.g. inserted by column pruning) and their indexes
+            return create_filter(node, conjuncts)
+        case ProjectionNode(node=child, columns=columns):
+            pushed = [conjunct for conjunct in conjuncts if conjunct.columns() <= columns.keys()]
+            remaining = [conjunct for conjunct in conjuncts if conjunct not in pushed]
+            child = push_filter(child, [conjunct.map_columns(lambda name: columns[name]) for conjunct in pushed])
+            return create_filter(node.with_children([child]), remaining)
+        case JoinNode(join_type=join_type, left=left, right=right, conditions=join_conditions):
+            left_conjuncts = []
+            right_conjuncts = []
+            join_conditions = list(join_conditions)
+            remaining = []
+
+            for conjunct in conjuncts:
+                side = get_side(conjunct.columns())
+                inner = join_type in (JoinType.INNER_JOIN, JoinType.CARTESIAN_JOIN)
+
+                if side == 'left':
+                    left_conjuncts.append(conjunct.map_columns(lambda name: name.removeprefix('left.')))
+                elif side == 'right' and inner:
+                    right_conjuncts.append(conjunct.map_columns(lambda name: name.removeprefix('right.')))
+                elif inner and (join_condition := to_join_condition(conjunct)) is not None:
+                    join_conditions.append(join_condition)
+                else:
+                    remaining.append(conjunct)
+
+            if join_type == JoinType.CARTESIAN_JOIN and len(join_conditions) > 0:
+                join_type = JoinType.INNER_JOIN
+
+            join = JoinNode(join_type, push_filter(left, left_conjuncts), push_filter(right, right_conjuncts), join_conditions)
+            return create_filter(join, remaining)
+
+    return create_filter(node, conjuncts)
+
+
+def get_side(columns: set[str]) -> Optional[str]:
+    """
+    Returns the join input, 'left' or 'right', which provides all the columns, or None.
+    """
+    for side in ('left', 'right'):
+        if len(columns) > 0 and all(column.startswith(f'{side}.') for column in columns):
+            return side
+    return None
+
+
+def to_join_condition(condition: Condition) -> Optional[BinaryCondition]:
+    match condition:
+        case ComparisonCondition(left=Column(name=left), right=Column(name=right), operator=operator) \
+                if operator in OPERATORS:
+            if get_side({left}) == 'left' and get_side({right}) == 'right':
+                return BinaryCondition(left.removeprefix('left.'), right.removeprefix('right.'), operator)
+            if get_side({left}) == 'right' and get_side({right}) == 'left':
+                return BinaryCondition(right.removeprefix('left.'), left.removeprefix('right.'), FLIPPED_OPERATORS[operator])
+    return None
+
+
+def push_down_limits(node: Node) -> Node:
+    if isinstance(node, LimitNode) and node.limit is not None:
+        node = node.with_children([push_down_limit(node.node, node.offset + node.limit)])
+
+    return node.with_children([push_down_limits(child) for child in node.children()])
+
+
+def push_down_limit(node: Node, limit: int) -> Node:
+    """
+    Passes the limit through projections to a sort, which then only keeps the first records in a bounded heap.
+    """
+    match node:
+        case ProjectionNode(node=child):
+            return node.with_children([push_down_limit(child, limit)])
+        case SortNode(limit=None):
+            return SortNode(node.node, node.keys, limit)
+        case SortNode(limit=sort_limit):
+            return SortNode(node.node, node.keys, min(sort_limit, limit))
+        case LimitNode(limit=None, offset=offset):
+            return LimitNode(node.node, limit, offset)
+        case LimitNode(limit=inner_limit, offset=offset):
+            return LimitNode(node.node, min(inner_limit, limit), offset)
+
+    return node
+
+
+def prune_columns(node: Node, required: Optional[set[str]]) -> Node:
+    """
+    Inserts projections after scans which keep only the columns used above them.
+    Required columns are None when the whole record is needed.
+    """
+    match node:
+        case ProjectionNode(node=ScanNode()):
+            # the projection already keeps only the columns it needs from the scan
+            return node
+        case ProjectionNode(node=child, columns=columns):
+            return ProjectionNode(prune_columns(child, set(columns.values())), columns)
+        case FilterNode(node=child, condition=condition):
+            return FilterNode(prune_columns(child, add_columns(required, condition.columns())), condition)
+        case SortNode(node=child, keys=keys):
+            return node.with_children([prune_columns(child, add_columns(required, {key.column for key in keys}))])
+        case LimitNode(node=child):
+            return node.with_children([prune_columns(child, required)])
+        case AggregateNode(node=child, group_by=group_by, aggregates=aggregates):
+            columns = set(group_by).union(*[aggregate.columns() for aggregate in aggregates.values()])
+            return node.with_children([prune_columns(child, columns)])
+        case JoinNode(join_type=join_type, left=left, right=right, conditions=conditions):
+            left_required = get_child_columns(required, 'left')
+            right_required = get_child_columns(required, 'right')
+
+            if all(isinstance(condition, BinaryCondition) for condition in conditions):
+                left_required = add_columns(left_required, {condition.left for condition in conditions})
+                right_required = add_columns(right_required, {condition.right for condition in conditions})
+            else:
+                left_required = right_required = None
+
+            return JoinNode(join_type, prune_columns(left, left_required), prune_columns(right, right_required), conditions)
+        case ScanNode() if required is not None:
+            return ProjectionNode(node, {column: column for column in sorted(required)})
+
+    return node.with_children([prune_columns(child, None) for child in node.children()])
+
+
+def add_columns(required: Optional[set[str]], columns: set[str]) -> Optional[set[str]]:
+    return None if required is None else required | columns
+
+
+def get_child_columns(required: Optional[set[str]], side: str) -> Optional[set[str]]:
+    if required is None or side in required:
+        return None
+
+    prefix = f'{side}.'
+    return {column.removeprefix(prefix) for column in required if column.startswith(prefix)}
+
+
+class Estimate:
+    """
+    Estimated number of records produced by a plan node and distinct values of its columns.
+    """
+
+    def __init__(self, rows: float, distinct: dict[str, float]):
+        self.rows = rows
+        self.distinct = distinct
+
+    def distinct_count(self, column: str) -> float:
+        return max(min(self.distinct.get(column, self.rows), self.rows), 1.0)
+
+
+class Relation:
+    """
+    Input of a reorderable join tree together with its path inside records produced by the original tree.
+    """
+
+    def __init__(self, node: Node, path: str, estimate: Estimate):
+        self.node = node
+        self.path = path
+        self.estimate = estimate
+
+
+class JoinEdge:
+    """
+    Join condition between the columns of two relations: `left.left_column operator right.right_column`.
+    """
+
+    def __init__(self, left: int, left_column: str, right: int, right_column: str, operator: str):
+        self.left = left
+        self.left_column = left_column
+        self.right = right
+        self.right_column = right_column
+        self.operator = operator
+
+    def selectivity(self, relations: list[Relation]) -> float:
+        if self.operator != '=':
+            return 1 / 3
+
+        return 1 / max(
+            relations[self.left].estimate.distinct_count(self.left_column),
+            relations[self.right].estimate.distinct_count(self.right_column)
+        )
+
+
+DEFAULT_ROW_COUNT = 1000
+DYNAMIC_PROGRAMMING_LIMIT = 8
+
+
+def reorder_joins(plan: QueryPlan, statistics: dict[str, TableStatistics]) -> QueryPlan:
+    """
+    Reorders trees of inner and cartesian joins to minimize the estimated size of intermediate results.
+    Dynamic programming over subsets of relations is used for up to DYNAMIC_PROGRAMMING_LIMIT relations
+    and greedy ordering beyond that. A projection on top of a reordered tree restores the original
+    nesting of records, so the rest of the plan is not affected.
+    """
+    return QueryPlan(reorder_node(plan.node, statistics))
+
+
+def reorder_node(node: Node, statistics: dict[str, TableStatistics]) -> Node:
+    if not is_reorderable(node):
+        return node.with_children([reorder_node(child, statistics) for child in node.children()])
+
+    relations = []
+    edges = []
+    flatten_joins(node, '', relations, edges, statistics)
+    if len(relations) < 3:
+        return node.with_children([reorder_node(child, statistics) for child in node.children()])
+
+    for relation in relations:
+        relation.node = reorder_node(relation.node, statistics)
+
+    if len(relations) <= DYNAMIC_PROGRAMMING_LIMIT:
+        order = order_with_dynamic_programming(relations, edges)
+    else:
+        order = order_greedily(relations, edges)
+
+    reordered, paths = build_join_tree(order, relations, edges)
+    columns = {relation.path: paths[index] for index, relation in enumerate(relations)}
+    if all(path == original for path, original in columns.items()):
+        return reordered
+
+    return ProjectionNode(reordered, columns)
+
+
+def is_reorderable(node: Node) -> bool:
+    return (
+        isinstance(node, JoinNode)
+        and node.join_type in (JoinType.INNER_JOIN, JoinType.CARTESIAN_JOIN)
+        and all(isinstance(condition, BinaryCondition) for condition in node.conditions)
+    )
+
+
+def join_path(path: str, name: str) -> str:
+    return '.'.join(item for item in (path, name) if item)
+
+
+def flatten_joins(
+    node: Node,
+    path: str,
+    relations: list[Relation],
+    edges: list[JoinEdge],
+    statistics: dict[str, TableStatistics]
+):
+    if not is_reorderable(node):
+        relations.append(Relation(node, path, estimate_node(node, statistics)))
+        return
+
+    left_path = join_path(path, 'left')
+    right_path = join_path(path, 'right')
+    flatten_joins(node.left, left_path, relations, edges, statistics)
+    flatten_joins(node.right, right_path, relations, edges, statistics)
+
+    for condition in node.conditions:
+        left, left_column = find_relation(relations, join_path(left_path, condition.left))
+        right, right_column = find_relation(relations, join_path(right_path, condition.right))
+        edges.append(JoinEdge(left, left_column, right, right_column, condition.operator))
+
+
+def find_relation(relations: list[Relation], column: str) -> tuple[int, str]:
+    for index, relation in enumerate(relations):
+        if column.startswith(f'{relation.path}.'):
+            return index, column.removeprefix(f'{relation.path}.')
+
+    raise ValueError(f'Column "{column}" does not belong to any join input')
+
+
+JoinTree = int | tuple['JoinTree', 'JoinTree']
+
+
+def estimate_join(left: float, right: float, left_set: int, right_set: int, relations: list[Relation], edges: list[JoinEdge]) -> float:
+    rows = left * right
+    for edge in edges:
+        if is_crossing(edge, left_set, right_set):
+            rows *= edge.selectivity(relations)
+    return rows
+
+
+def is_crossing(edge: JoinEdge, left_set: int, right_set: int) -> bool:
+    left = 1 << edge.left
+    right = 1 << edge.right
+    return bool(left & left_set and right & right_set or left & right_set and right & left_set)
+
+
+def order_with_dynamic_programming(relations: list[Relation], edges: list[JoinEdge]) -> JoinTree:
+    # best plan for every subset of relations: (cost, rows, tree), cost is the sum of intermediate result sizes
+    best: dict[int, tuple[float, float, JoinTree]] = {
+        1 << index: (0.0, relation.estimate.rows, index)
+        for index, relation in enumerate(relations)
+    }
+
+    for subset in range(1, 1 << len(relations)):
+        if subset in best:
+            continue
+
+        candidates = []
+        left = (subset - 1) & subset
+        while left > 0:
+            right = subset ^ left
+            if right in best and left in best:
+                connected = any(is_crossing(edge, left, right) for edge in edges)
+                left_cost, left_rows, left_tree = best[left]
+                right_cost, right_rows, right_tree = best[right]
+                # smaller input goes to the right, it is used as a hash join build side
+                if right_rows <= left_rows:
+                    rows = estimate_join(left_rows, right_rows, left, right, relations, edges)
+                    candidates.append((not connected, left_cost + right_cost + rows, rows, (left_tree, right_tree)))
+            left = (left - 1) & subset
+
+        if candidates:
+            _, cost, rows, tree = min(candidates, key=lambda candidate: candidate[:2])
+            best[subset] = (cost, rows, tree)
+
+    return best[(1 << len(relations)) - 1][2]
+
+
+def order_greedily(relations: list[Relation], edges: list[JoinEdge]) -> JoinTree:
+    remaining = set(range(len(relations)))
+    first = min(remaining, key=lambda index: relations[index].estimate.rows)
+    remaining.remove(first)
+
+    tree: JoinTree = first
+    joined = 1 << first
+    rows = relations[first].estimate.rows
+    while remaining:
+        def score(index: int) -> tuple[bool, float]:
+            connected = any(is_crossing(edge, joined, 1 << index) for edge in edges)
+            return not connected, estimate_join(rows, relations[index].estimate.rows, joined, 1 << index, relations, edges)
+
+        index = min(remaining, key=score)
+        rows = score(index)[1]
+        tree = (tree, index)
+        joined |= 1 << index
+        remaining.remove(index)
+
+    return tree
+
+
+def build_join_tree(tree: JoinTree, relations: list[Relation], edges: list[JoinEdge]) -> tuple[Node, dict[int, str]]:
+    """
+    Builds join nodes for the tree of relation indexes. Returns the node and the paths of relations in its records.
+    """
+    if isinstance(tree, int):
+        return relations[tree].node, {tree: ''}
+
+    left, left_paths = build_join_tree(tree[0], relations, edges)
+    right, right_paths = build_join_tree(tree[1], relations, edges)
+
+    conditions = []
+    for edge in edges:
+        if edge.left in left_paths and edge.right in right_paths:
+            conditions.append(BinaryCondition(
+                join_path(left_paths[edge.left], edge.left_column),
+                join_path(right_paths[edge.right], edge.right_column),
+                edge.operator
+            ))
+        elif edge.right in left_paths and edge.left in right_paths:
+            conditions.append(BinaryCondition(
+                join_path(left_paths[edge.right], edge.right_column),
+                join_path(right_paths[edge.left], edge.left_column),
+                FLIPPED_OPERATORS[edge.operator]
+            ))
+
+    paths = {index: join_path('left', path) for index, path in left_paths.items()}
+    paths.update({index: join_path('right', path) for index, path in right_paths.items()})
+
+    join_type = JoinType.INNER_JOIN if conditions else JoinType.CARTESIAN_JOIN
+    return JoinNode(join_type, left, right, conditions), paths
+
+
+def estimate_node(node: Node, statistics: dict[str, TableStatistics]) -> Estimate:
+    match node:
+        case ScanNode(table=table):
+            table_statistics = statistics.get(table)
+            if table_statistics is None:
+                return Estimate(DEFAULT_ROW_COUNT, {})
+            return Estimate(
+                table_statistics.row_count,
+                {column: column_statistics.distinct_count for column, column_statistics in table_statistics.columns.items()}
+            )
+        case ProjectionNode(node=child, columns=columns):
+            estimate = estimate_node(child, statistics)
+            return Estimate(estimate.rows, {
+                name: estimate.distinct[source]
+                for name, source in columns.items()
+                if source in estimate.distinct
+            })
+        case FilterNode(node=child, condition=condition):
+            estimate = estimate_node(child, statistics)
+            rows = estimate.rows * estimate_selectivity(condition, estimate, node, statistics)
+            return Estimate(rows, {column: min(distinct, rows) for column, distinct in estimate.distinct.items()})
+        case JoinNode(join_type=join_type, left=left, right=right, conditions=conditions):
+            left_estimate = estimate_node(left, statistics)
+            right_estimate = estimate_node(right, statistics)
+            rows = left_estimate.rows * right_estimate.rows
+            for condition in conditions:
+                if isinstance(condition, BinaryCondition) and condition.is_equality():
+                    rows /= max(left_estimate.distinct_count(condition.left), right_estimate.distinct_count(condition.right))
+                else:
+                    rows /= 3
+            if join_type == JoinType.LEFT_OUTER_JOIN:
+                rows = max(rows, left_estimate.rows)
+
+            distinct = {f'left.{column}': value for column, value in left_estimate.distinct.items()}
+            match join_type:
+                case JoinType.SEMI_JOIN:
+                    rows = min(rows, left_estimate.rows)
+                case JoinType.ANTI_JOIN:
+                    rows = max(left_estimate.rows - rows, left_estimate.rows / 10)
+                case _:
+                    distinct.update({f'right.{column}': value for column, value in right_estimate.distinct.items()})
+            return Estimate(rows, distinct)
+        case LimitNode(node=child, limit=limit, offset=offset):
+            estimate = estimate_node(child, statistics)
+            rows = max(estimate.rows - offset, 0.0)
+            if limit is not None:
+                rows = min(rows, limit)
+            return Estimate(rows, {column: min(distinct, rows) for column, distinct in estimate.distinct.items()})
+        case AggregateNode(node=child, group_by=group_by, aggregates=aggregates):
+            estimate = estimate_node(child, statistics)
+            rows = 1.0
+            for column in group_by:
+                rows *= estimate.distinct_count(column)
+            rows = min(rows, estimate.rows)
+            distinct = {column: min(estimate.distinct_count(column), rows) for column in group_by}
+            distinct.update({name: rows for name in aggregates})
+            return Estimate(rows, distinct)
+
+    children = node.children()
+    return estimate_node(children[0], statistics) if children else Estimate(DEFAULT_ROW_COUNT, {})
+
+
+def estimate_selectivity(condition: Condition, estimate: Estimate, node: Node, statistics: dict[str, TableStatistics]) -> float:
+    match condition:
+        case ConstantCondition(value=value):
+            return 1.0 if value else 0.0
+        case LogicalCondition(operator='and', left=left, right=right):
+            return estimate_selectivity(left, estimate, node, statistics) * estimate_selectivity(right, estimate, node, statistics)
+        case LogicalCondition(operator='or', left=left, right=right):
+            left = estimate_selectivity(left, estimate, node, statistics)
+            right = estimate_selectivity(right, estimate, node, statistics)
+            return left + right - left * right
+        case ComparisonCondition(left=Column(name=column), right=None, operator='is'):
+            return get_null_fraction(node, column, statistics)
+        case ComparisonCondition(left=Column(name=column), operator='='):
+            return 1 / estimate.distinct_count(column)
+        case ComparisonCondition(operator='!=' | '<>'):
+            return 0.9
+        case ComparisonCondition():
+            return 1 / 3
+
+    return 0.5
+
+
+def get_null_fraction(node: Node, column: str, statistics: dict[str, TableStatistics]) -> float:
+    """
+    Fraction of NULLs in a column of a filtered scan, 0.1 when it's not known.
+    """
+    while not isinstance(node, ScanNode) and len(node.children()) == 1:
+        node = node.children()[0]
+
+    if isinstance(node, ScanNode) and node.table in statistics:
+        return statistics[node.table].null_fraction(column)
+
+    return 0.1
@@ -0,0 +1,270 @@
+import time
+import tracemalloc
+from collections.abc import Collection
+from typing import Any, Callable, Iterator, Optional
+
+from database_engine import SpillStatistics
+from models import Table, Records, Record
+from query_plan_builder import QueryPlan, Node
+from query_plan_executor import ACTIVE_PROFILER, iterate_query_plan
+from table_statistics import StatisticsCatalog
+
+
+class NodeMetrics:
+    """
+    Measurements of one executed plan node. Time includes the time spent in the children,
+    as a node pulls records from its children while producing its own.
+
+    An input which is read several times, e.g. the inner input of a nested loop join, makes one loop
+    per pass. Rows are reported per loop, like in the EXPLAIN ANALYZE output of other databases,
+    and the total over all loops is kept as well.
+    """
+
+    def __init__(self, node: Node):
+        self.node = node
+        self.children: list[NodeMetrics] = []
+        self.executions = 0
+        self.loops = 0
+        self.rows_total = 0
+        self.time = 0.0
+        self.predicate_evaluations = 0
+        self.peak_memory: Optional[int] = None
+        self.spills: list[SpillStatistics] = []
+
+    @property
+    def rows_out(self) -> int:
+        return round(self.rows_total / self.loops) if self.loops else 0
+
+    @property
+    def rows_in(self) -> int:
+        return sum(child.rows_out for child in self.children)
+
+    @property
+    def self_time(self) -> float:
+        return max(0.0, self.time - sum(child.time for child in self.children))
+
+    @property
+    def bytes_spilled(self) -> int:
+        return sum(spill.bytes_spilled for spill in self.spills)
+
+    @property
+    def spill_partitions(self) -> int:
+        return sum(spill.partitions for spill in self.spills)
+
+    def get_peak_memory(self) -> Optional[int]:
+        peaks = [peak for peak in [self.peak_memory, *(child.get_peak_memory() for child in self.children)] if peak is not None]
+        return max(peaks, default=None)
+
+    def format(self) -> str:
+        metrics = [
+            f'rows={self.rows_out}',
+            f'rows in={self.rows_in}' if self.children else None,
+            f'time={self.time * 1000:.3f} ms',
+            f'self={self.self_time * 1000:.3f} ms',
+            f'evaluations={self.predicate_evaluations}' if self.predicate_evaluations else None,
+            f'loops={self.loops}' if self.loops > 1 else None,
+            f'spilled={self.bytes_spilled / 1024:.1f} KiB' if self.bytes_spilled else None,
+            f'partitions={self.spill_partitions}' if self.spill_partitions else None,
+            None if self.get_peak_memory() is None else f'peak memory={self.get_peak_memory() / 1024:.1f} KiB',
+        ]
+        return f'{self.node.describe()} [{", ".join([metric for metric in metrics if metric is not None])}]'
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'node': self.node.describe(),
+            'executions': self.executions,
+            'loops': self.loops,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'rows_total': self.rows_total,
+            'time_ms': self.time * 1000,
+            'self_time_ms': self.self_time * 1000,
+            'predicate_evaluations': self.predicate_evaluations,
+            'peak_memory_bytes': self.get_peak_memory(),
+            'bytes_spilled': self.bytes_spilled,
+            'spill_partitions': self.spill_partitions,
+            'children': [child.to_dict() for child in self.children],
+        }
+
+
+class QueryProfile:
+    """
+    Result of a query and the metrics of its plan nodes. Nodes which were not executed, e.g. because
+    an index was read instead of scanning a table, are shown without metrics.
+    """
+
+    def __init__(self, root: NodeMetrics, result: list[Record], time: float):
+        self.root = root
+        self.result = result
+        self.time = time
+
+    def __repr__(self):
+        return self.render()
+
+    def render(self) -> str:
+        lines = [f'Execution time: {self.time * 1000:.3f} ms, rows: {len(self.result)}']
+        render_metrics(self.root, 0, lines)
+        return '\n'.join(lines)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {'time_ms': self.time * 1000, 'rows': len(self.result), 'plan': self.root.to_dict()}
+
+
+def render_metrics(metrics: NodeMetrics, depth: int, lines: list[str]):
+    lines.append('  ' * depth + metrics.format())
+    executed = {id(child.node): child for child in metrics.children}
+    for child in metrics.node.children():
+        if id(child) in executed:
+            render_metrics(executed[id(child)], depth + 1, lines)
+        else:
+            render_not_executed(child, depth + 1, lines)
+
+
+def render_not_executed(node: Node, depth: int, lines: list[str]):
+    lines.append('  ' * depth + f'{node.describe()} [not executed]')
+    for child in node.children():
+        render_not_executed(child, depth + 1, lines)
+
+
+class ObservedCollection:
+    """
+    Table produced by a node, e.g. a scanned table, which keeps its size and membership test,
+    so operators choose the same algorithms as without profiling.
+    """
+
+    def __init__(self, records: Collection[Record], observe: Callable[[Records], Iterator[Record]]):
+        self.records = records
+        self.observe = observe
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.observe(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, record: Record) -> bool:
+        return record in self.records
+
+
+class Profiler:
+    """
+    Wraps the records produced by every executed node to count them and measure the time spent producing them.
+    """
+
+    def __init__(self, trace_memory: bool = False):
+        self.trace_memory = trace_memory
+        self.roots: list[NodeMetrics] = []
+        self.__metrics: dict[int, NodeMetrics] = {}
+        self.__parents: dict[int, Node] = {}
+        # nodes whose operators are being created, predicates compiled meanwhile belong to the last one
+        self.__building: list[NodeMetrics] = []
+        self.__memory_baseline = 0
+
+    def start(self):
+        if self.trace_memory:
+            tracemalloc.start()
+            self.__memory_baseline = tracemalloc.get_traced_memory()[0]
+
+    def stop(self):
+        if self.trace_memory:
+            tracemalloc.stop()
+
+    def iterate(self, node: Node, tables: dict[str, Table], iterate: Callable[[Node, dict[str, Table]], Records]) -> Records:
+        metrics = self.get_metrics(node)
+        metrics.executions += 1
+        self.__building.append(metrics)
+        start = time.perf_counter()
+        try:
+            records = iterate(node, tables)
+        finally:
+            metrics.time += time.perf_counter() - start
+            self.__building.pop()
+
+        if isinstance(records, Collection):
+            return ObservedCollection(records, lambda records: self.observe(metrics, records))
+        return self.observe(metrics, records)
+
+    def get_metrics(self, node: Node) -> NodeMetrics:
+        metrics = self.__metrics.get(id(node))
+        if metrics is not None:
+            return metrics
+
+        metrics = self.__metrics[id(node)] = NodeMetrics(node)
+        parent = self.__parents.get(id(node))
+        if parent is None:
+            self.roots.append(metrics)
+        else:
+            self.get_metrics(parent).children.append(metrics)
+
+        nodes = [node]
+        while nodes:
+            current = nodes.pop()
+            for child in current.children():
+                self.__parents[id(child)] = current
+                nodes.append(child)
+        return metrics
+
+    def observe(self, metrics: NodeMetrics, records: Records) -> Iterator[Record]:
+        metrics.loops += 1
+        iterator = iter(records)
+        clock = time.perf_counter
+        while True:
+            if self.trace_memory:
+                tracemalloc.reset_peak()
+            start = clock()
+            try:
+                record = next(iterator)
+            except StopIteration:
+                metrics.time += clock() - start
+                self.record_memory(metrics)
+                return
+            metrics.time += clock() - start
+            self.record_memory(metrics)
+            metrics.rows_total += 1
+            yield record
+
+    def record_memory(self, metrics: NodeMetrics):
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1] - self.__memory_baseline
+            metrics.peak_memory = max(peak, metrics.peak_memory or 0)
+
+    def track_spills(self, statistics: SpillStatistics) -> SpillStatistics:
+        if self.__building:
+            self.__building[-1].spills.append(statistics)
+        return statistics
+
+    def count_evaluations(self, predicate: Callable[..., bool]) -> Callable[..., bool]:
+        if not self.__building:
+            return predicate
+
+        metrics = self.__building[-1]
+
+        def counted(*records: Record) -> bool:
+            metrics.predicate_evaluations += 1
+            return predicate(*records)
+
+        return counted
+
+
+def explain_analyze(
+    plan: QueryPlan,
+    tables: dict[str, Table],
+    statistics: Optional[StatisticsCatalog] = None,
+    trace_memory: bool = False
+) -> QueryProfile:
+    """
+    Executes the plan with every node instrumented. Peak memory is traced only on request,
+    as tracing allocations slows the execution down.
+    """
+    profiler = Profiler(trace_memory)
+    token = ACTIVE_PROFILER.set(profiler)
+    profiler.start()
+    start = time.perf_counter()
+    try:
+        result = list(iterate_query_plan(plan, tables, statistics=statistics))
+    finally:
+        elapsed = time.perf_counter() - start
+        profiler.stop()
+        ACTIVE_PROFILER.reset(token)
+
+    return QueryProfile(profiler.roots[0], result, elapsed)
@@ -0,0 +1,130 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from models import Table, Record
+from query_plan_builder import QueryPlan, Node, ScanNode
+from query_plan_executor import execute_query_plan
+
+CACHE_SIZE = 64 * 1024 * 1024
+
+TableVersions = tuple[tuple[str, Hashable], ...]
+
+
+class CacheEntry:
+    __slots__ = ('versions', 'result', 'size')
+
+    def __init__(self, versions: TableVersions, result: frozenset[Record], size: int):
+        self.versions = versions
+        self.result = result
+        self.size = size
+
+
+class ResultCache:
+    """
+    Results of query plans keyed by the plan and the versions of the tables it reads. Tables which
+    track their version (e.g. IndexedTable or database snapshots) expose it as a `version` attribute,
+    plans reading other tables are always executed.
+
+    An entry whose tables changed is invalidated when the plan is executed again, entries are evicted
+    in least recently used order when the estimated size of the results exceeds the cache size.
+    Cached results are shared between callers, so they are returned as frozensets.
+    """
+
+    def __init__(self, max_size: int = CACHE_SIZE):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.__entries: OrderedDict[QueryPlan, CacheEntry] = OrderedDict()
+        self.__lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+    def execute(self, plan: QueryPlan, tables: dict[str, Table], **options) -> frozenset[Record]:
+        """
+        Returns the cached result of the plan or executes it, options are passed to execute_query_plan.
+        """
+        versions = get_table_versions(plan.node, tables)
+        if versions is None:
+            return frozenset(execute_query_plan(plan, tables, **options))
+
+        with self.__lock:
+            entry = self.__entries.get(plan)
+            if entry is not None and entry.versions == versions:
+                self.hits += 1
+                self.__entries.move_to_end(plan)
+                return entry.result
+
+            if entry is not None:
+                self.invalidations += 1
+                self.__remove(plan)
+            self.misses += 1
+
+        result = frozenset(execute_query_plan(plan, tables, **options))
+        self.__add(plan, CacheEntry(versions, result, estimate_size(result)))
+        return result
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+            self.size = 0
+
+    def statistics(self) -> dict[str, int]:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+            'entries': len(self.__entries),
+            'size': self.size,
+        }
+
+    def __add(self, plan: QueryPlan, entry: CacheEntry):
+        if entry.size > self.max_size:
+            return
+
+        with self.__lock:
+            if plan in self.__entries:
+                self.__remove(plan)
+            self.__entries[plan] = entry
+            self.size += entry.size
+            while self.size > self.max_size:
+                self.evictions += 1
+                self.__remove(next(iter(self.__entries)))
+
+    def __remove(self, plan: QueryPlan):
+        self.size -= self.__entries.pop(plan).size
+
+
+def get_table_versions(node: Node, tables: dict[str, Table]) -> Optional[TableVersions]:
+    """
+    Versions of the tables scanned by the plan, None when a table doesn't track its version.
+    """
+    versions = {}
+    nodes = [node]
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, ScanNode):
+            version = getattr(tables.get(node.table), 'version', None)
+            if version is None:
+                return None
+            versions[node.table] = version
+        nodes.extend(node.children())
+
+    return tuple(sorted(versions.items()))
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Approximate memory used by a result, values shared with other objects are counted as well.
+    """
+    if isinstance(value, Record):
+        return sys.getsizeof(value) + sys.getsizeof(value.values()) + sum(estimate_size(item) for item in value.values())
+    if isinstance(value, (set, frozenset, list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
@@ -0,0 +1,311 @@
+import re
+from functools import lru_cache
+from typing import Any, Optional
+
+from aggregation import Aggregate, AggregationError
+from models import Table, Record
+from query_plan_builder import QueryPlan, QueryPlanBuilder, JoinType, Condition, BinaryCondition, \
+    ComparisonCondition, LogicalCondition, Column, SortKey, FLIPPED_OPERATORS
+from query_plan_executor import iterate_query_plan
+from query_plan_optimizer import optimize
+from table_statistics import StatisticsCatalog
+from sql_parser import parse_sql, Select, FunctionCall, is_literal, parse_literal, FUNCTION_CALL_PATTERN
+
+JOIN_TYPES = {
+    'join': JoinType.INNER_JOIN,
+    'inner join': JoinType.INNER_JOIN,
+    'left outer join': JoinType.LEFT_OUTER_JOIN,
+}
+
+TOKEN_PATTERN = re.compile(r"'(?:[^']|'')*'|\s+")
+
+
+class CompilationError(Exception):
+    pass
+
+
+class Scope:
+    """
+    Tables visible in a query and the paths of their records inside joined records,
+    e.g. after `employees join tasks` the employees columns are under `left` and tasks under `right`.
+    """
+
+    def __init__(self, table: str):
+        self.paths = {table: ''}
+
+    def join(self, table: str) -> 'Scope':
+        if table in self.paths:
+            raise CompilationError(f'Table "{table}" is referenced more than once')
+
+        scope = Scope(table)
+        scope.paths = {
+            name: f'left.{path}' if path else 'left'
+            for name, path in self.paths.items()
+        }
+        scope.paths[table] = 'right'
+        return scope
+
+    def find_table(self, name: str) -> str | None:
+        table, _, _ = name.rpartition('.')
+        if table:
+            return table if table in self.paths else None
+
+        if len(self.paths) == 1:
+            return next(iter(self.paths))
+
+        return None
+
+    def resolve(self, name: str) -> str:
+        table, _, column = name.rpartition('.')
+        if table:
+            if table not in self.paths:
+                raise CompilationError(f'Unknown table "{table}" in column "{name}"')
+        elif len(self.paths) == 1:
+            table = next(iter(self.paths))
+        else:
+            raise CompilationError(f'Column "{name}" is ambiguous, qualify it with a table name')
+
+        path = self.paths[table]
+        return f'{path}.{column}' if path else column
+
+
+class GroupScope(Scope):
+    """
+    Columns visible after grouping: the group columns and the aggregates, referenced by their names
+    or by the function call, e.g. `count(*)`. Aggregates used only in HAVING or ORDER BY are added
+    under generated names.
+    """
+
+    def __init__(self, scope: Scope, group_by: list[str]):
+        super().__init__('')
+        self.paths = scope.paths
+        self.scope = scope
+        self.group_by = [scope.resolve(column) for column in group_by]
+        self.aggregates: dict[str, Aggregate] = {}
+
+    def add_aggregate(self, call: FunctionCall) -> str:
+        aggregate = self.compile_aggregate(call)
+        name = call.alias or call.name
+        if name in self.aggregates:
+            raise CompilationError(f'Duplicate aggregate name "{name}", use AS to name the aggregate')
+
+        self.aggregates[name] = aggregate
+        return name
+
+    def compile_aggregate(self, call: FunctionCall) -> Aggregate:
+        column = None if call.argument is None else self.scope.resolve(call.argument)
+        try:
+            return Aggregate(call.name, column, call.distinct)
+        except AggregationError as error:
+            raise CompilationError(str(error)) from error
+
+    def resolve(self, name: str) -> str:
+        if name in self.aggregates:
+            return name
+
+        match = FUNCTION_CALL_PATTERN.fullmatch(name)
+        if match is not None:
+            function, distinct, argument = match.groups()
+            aggregate = self.compile_aggregate(
+                FunctionCall(function.lower(), None if argument == '*' else argument, distinct is not None)
+            )
+            for aggregate_name, other in self.aggregates.items():
+                if aggregate == other:
+                    return aggregate_name
+
+            aggregate_name = f'${len(self.aggregates)}'
+            self.aggregates[aggregate_name] = aggregate
+            return aggregate_name
+
+        column = self.scope.resolve(name)
+        if column not in self.group_by:
+            raise CompilationError(f'Column "{name}" must appear in GROUP BY or be used in an aggregate function')
+        return column
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Collapses white space outside of string literals so equivalent query texts share a cache entry.
+    """
+    sql = TOKEN_PATTERN.sub(lambda match: match.group(0) if match.group(0).startswith("'") else ' ', sql)
+    return sql.strip().rstrip(';').rstrip()
+
+
+def compile_sql(sql: str) -> QueryPlan:
+    return compile_normalized_sql(normalize_sql(sql))
+
+
+@lru_cache(maxsize=256)
+def compile_normalized_sql(sql: str) -> QueryPlan:
+    select, = parse_sql(sql)
+    return optimize(compile_select(select))
+
+
+def execute_sql(sql: str, tables: dict[str, Table], statistics: Optional[StatisticsCatalog] = None) -> list[Record]:
+    return list(iterate_query_plan(compile_sql(sql), tables, statistics=statistics))
+
+
+def compile_select(select: Select) -> QueryPlan:
+    builder = QueryPlanBuilder()
+
+    first_table, *other_tables = select.select_from
+    builder.scan(first_table)
+    scope = Scope(first_table)
+
+    for table in other_tables:
+        scope = scope.join(table)
+        builder.scan(table).join(JoinType.CARTESIAN_JOIN, [])
+
+    for join_type, table, conditions in select.join:
+        left_scope = scope
+        scope = scope.join(table)
+        join_conditions, residual = compile_join_conditions(conditions, left_scope, table)
+
+        builder.scan(table)
+        if JOIN_TYPES[join_type] == JoinType.LEFT_OUTER_JOIN:
+            if residual:
+                raise CompilationError(f'Unsupported left outer join condition {conditions}')
+            builder.join(JoinType.LEFT_OUTER_JOIN, join_conditions)
+        else:
+            builder.join(JoinType.INNER_JOIN if join_conditions else JoinType.CARTESIAN_JOIN, join_conditions)
+            for condition in residual:
+                builder.filter(compile_condition(condition, scope))
+
+    if select.where is not None:
+        builder.filter(compile_condition(select.where, scope))
+
+    if is_aggregation(select):
+        compile_aggregation(select, builder, GroupScope(scope, select.group_by))
+    else:
+        if select.order_by:
+            builder.sort([compile_sort_key(key, scope) for key in select.order_by])
+
+        if select.select_list != ['*']:
+            compile_projection(select.select_list, builder, scope)
+
+    if select.limit is not None or select.offset is not None:
+        builder.limit(select.limit, select.offset or 0)
+
+    return builder.build()
+
+
+def compile_projection(select_list: list[str], builder: QueryPlanBuilder, scope: Scope):
+    """
+    Projects the selected columns, `table.*` selects the whole record of a joined table under the table name.
+    """
+    columns = {}
+    for name in select_list:
+        if name == '*':
+            raise CompilationError('"*" can\'t be combined with other columns')
+
+        table, _, column = name.rpartition('.')
+        if column != '*':
+            columns[name] = scope.resolve(name)
+        elif table not in scope.paths:
+            raise CompilationError(f'Unknown table "{table}" in "{name}"')
+        elif scope.paths[table]:
+            columns[table] = scope.paths[table]
+        elif len(select_list) > 1:
+            raise CompilationError(f'"{name}" of a single table can\'t be combined with other columns')
+
+    if columns:
+        builder.projection(columns)
+
+
+def is_aggregation(select: Select) -> bool:
+    return (
+        len(select.group_by) > 0
+        or select.having is not None
+        or any(isinstance(item, FunctionCall) for item in select.select_list)
+    )
+
+
+def compile_aggregation(select: Select, builder: QueryPlanBuilder, scope: GroupScope):
+    """
+    Plans grouping after the where condition: aggregate, filter by the having condition, sort and project.
+    """
+    if any(isinstance(item, str) and item.endswith('*') for item in select.select_list):
+        raise CompilationError('Select list of an aggregation can\'t contain "*"')
+
+    columns = {}
+    for item in select.select_list:
+        if isinstance(item, FunctionCall):
+            name = scope.add_aggregate(item)
+            columns[name] = name
+        else:
+            columns[item] = scope.resolve(item)
+
+    having = None if select.having is None else compile_condition(select.having, scope)
+    keys = [compile_sort_key(key, scope) for key in select.order_by]
+
+    builder.aggregate(scope.group_by, scope.aggregates)
+    if having is not None:
+        builder.filter(having)
+    if keys:
+        builder.sort(keys)
+
+    builder.projection(columns)
+
+
+def compile_sort_key(key: tuple[str, ...], scope: Scope) -> SortKey:
+    column, direction, *nulls = key
+    nulls_first = nulls[0].lower() == 'first' if nulls else None
+    return SortKey(scope.resolve(column), direction.lower() == 'asc', nulls_first)
+
+
+def compile_join_conditions(conditions: tuple, left_scope: Scope, table: str) -> tuple[list[Condition], list[tuple]]:
+    """
+    Splits a join condition into comparisons between columns of both join inputs, which become
+    BinaryConditions of the join, and the rest, which has to be evaluated on the joined records.
+    """
+    join_conditions = []
+    residual = []
+
+    for condition in get_conjuncts(conditions):
+        join_condition = compile_join_condition(condition, left_scope, Scope(table))
+        if join_condition is None:
+            residual.append(condition)
+        else:
+            join_conditions.append(join_condition)
+
+    return join_conditions, residual
+
+
+def compile_join_condition(condition: tuple, left_scope: Scope, right_scope: Scope) -> BinaryCondition | None:
+    match condition:
+        case ('and' | 'or', _, _):
+            return None
+        case (left, operator, right) if operator in FLIPPED_OPERATORS and not is_literal(left) and not is_literal(right):
+            if left_scope.find_table(left) is not None and right_scope.find_table(right) is not None:
+                return BinaryCondition(left_scope.resolve(left), right_scope.resolve(right), operator)
+
+            if right_scope.find_table(left) is not None and left_scope.find_table(right) is not None:
+                return BinaryCondition(left_scope.resolve(right), right_scope.resolve(left), FLIPPED_OPERATORS[operator])
+
+    return None
+
+
+def get_conjuncts(condition: tuple) -> list[tuple]:
+    if condition[0] == 'and':
+        return get_conjuncts(condition[1]) + get_conjuncts(condition[2])
+    return [condition]
+
+
+def compile_condition(condition: tuple, scope: Scope) -> Condition:
+    match condition:
+        case ('and' | 'or' as operator, left, right):
+            return LogicalCondition(operator, compile_condition(left, scope), compile_condition(right, scope))
+        case (left, operator, right):
+            operator = operator.lower()
+            if operator not in FLIPPED_OPERATORS and operator != 'is':
+                raise CompilationError(f'Unsupported operator "{operator}"')
+            return ComparisonCondition(compile_operand(left, scope), compile_operand(right, scope), operator)
+
+    raise CompilationError(f'Unsupported condition {condition}')
+
+
+def compile_operand(operand: str, scope: Scope) -> Column | Any:
+    if is_literal(operand):
+        return parse_literal(operand)
+
+    return Column(scope.resolve(operand))
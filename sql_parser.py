@@ -1,4 +1,5 @@
 import re
+from typing import Any, Optional
 
 
 class Keyword:
@@ -29,18 +30,55 @@ class Literal:
         return f'Literal(value="{self.value}")'
 
 
+class FunctionCall:
+    """
+    Aggregate function in a select list, e.g. `count(distinct employee_id) as employees`.
+    Argument None stands for `*`.
+    """
+
+    def __init__(self, name: str, argument: Optional[str], distinct: bool = False, alias: Optional[str] = None):
+        self.name = name
+        self.argument = argument
+        self.distinct = distinct
+        self.alias = alias
+
+    def __eq__(self, other):
+        if not isinstance(other, FunctionCall):
+            return False
+
+        return (
+            self.name == other.name
+            and self.argument == other.argument
+            and self.distinct == other.distinct
+            and self.alias == other.alias
+        )
+
+    def __repr__(self):
+        return f'FunctionCall(name="{self.name}", argument={self.argument!r}, distinct={self.distinct}, alias={self.alias!r})'
+
+
 class Select:
     def __init__(
         self,
-        select_list: list[str],
+        select_list: list[str | FunctionCall],
         select_from: list[str],
         join: list[tuple[str, str, tuple]],
-        where: tuple
+        where: tuple,
+        order_by: Optional[list[tuple[str, ...]]] = None,
+        group_by: Optional[list[str]] = None,
+        having: Optional[tuple] = None,
+        limit: Optional[int] = None,
+        offset: Optional[int] = None
     ):
         self.select_list = select_list
         self.select_from = select_from
         self.join = join
         self.where = where
+        self.order_by = [] if order_by is None else order_by
+        self.group_by = [] if group_by is None else group_by
+        self.having = having
+        self.limit = limit
+        self.offset = offset
 
     def __eq__(self, other):
         if not isinstance(other, Select):
@@ -51,217 +89,363 @@ class Select:
             and self.select_from == other.select_from
             and self.join == other.join
             and self.where == other.where
+            and self.order_by == other.order_by
+            and self.group_by == other.group_by
+            and self.having == other.having
+            and self.limit == other.limit
+            and self.offset == other.offset
         )
 
     def __repr__(self):
-        return f'Select(select_list={self.select_list}, select_from={self.select_from}, join={self.join}, where={self.where})'
+        return (
+            f'Select(select_list={self.select_list}, select_from={self.select_from}, join={self.join}, '
+            f'where={self.where}, group_by={self.group_by}, having={self.having}, order_by={self.order_by}, '
+            f'limit={self.limit}, offset={self.offset})'
+        )
 
 
 class InvalidTokenError(Exception):
     pass
 
 
-Tokens = list[Keyword | Literal | Select]
-
-
-def parse_sql(s: str) -> Tokens:
-    position = skip_white_spaces(s, 0)
-    select, position = read_query(s, position)
-    return [select]
-
-
-def skip_white_spaces(s: str, position: int) -> int:
-    while position < len(s) and s[position] in (' ', '\t', '\n', '\r'):
-        position += 1
-    return position
-
-
-def read_query(s: str, position: int) -> tuple[Select, int]:
-    _, position = read_keyword('select', s, position)
-    select_list, position = read_list(s, position)
-    _, position = read_keyword('from', s, position)
-    select_from, position = read_list(s, position)
-    join, position = read_joins(s, position)
-    where, position = read_where(s, position)
-    return Select(select_list=select_list, select_from=select_from, join=join, where=where), position
-
-
-def read_list(s: str, position: int) -> tuple[list, int]:
-    items = []
-    while position < len(s):
-        value, position = read_until_separator(s, position)
-        items.append(value)
-        position = skip_white_spaces(s, position)
-        if position >= len(s) or s[position] != ',':
-            break
-        position += 1
-        position = skip_white_spaces(s, position)
-
-    position = skip_white_spaces(s, position)
-    return items, position
-
-
-def read_until(values: list[str], s: str, position: int) -> tuple[str, int]:
-    start = position
-    while position < len(s):
-        found_value = any(s[position:].lower().startswith(value) for value in values)
-        if found_value:
-            break
-
-        position += 1
-
-    return s[start:position], position
+NUMBER_PATTERN = re.compile(r'[+-]?(\d+(\.\d*)?|\.\d+)([eE][+-]?\d+)?')
+FUNCTION_CALL_PATTERN = re.compile(r'(\w+)\s*\(\s*(distinct\s+)?([^()\s]+)\s*\)', re.IGNORECASE)
+KEYWORD_VALUES = {'null': None, 'true': True, 'false': False}
 
 
-def read_until_white_space(s: str, position: int) -> tuple[str, int]:
-    value, position = read_until([' ', '\t', '\n', '\r'], s, position)
-    position = skip_white_spaces(s, position)
-    return value, position
+TOKEN_PATTERN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<number>[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<all_columns>[A-Za-z_$][\w$]*\.\*)
+  | (?P<name>[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*)
+  | (?P<operator><=|>=|<>|!=|=|<|>)
+  | (?P<punctuation>[(),*;])
+''', re.VERBOSE)
 
 
-def read_until_white_space_or_bracket(s: str, position: int) -> tuple[str, int]:
-    value, position = read_until([' ', '\t', '\n', '\r', ')', '('], s, position)
-    position = skip_white_spaces(s, position)
-    return value, position
+class Token:
+    """
+    Token of a SQL text with its kind (string, number, name, all_columns, e.g. `employees.*`, operator
+    or punctuation) and position.
+    """
+    __slots__ = ('kind', 'value', 'start', 'end')
 
+    def __init__(self, kind: str, value: str, start: int, end: int):
+        self.kind = kind
+        self.value = value
+        self.start = start
+        self.end = end
 
-def read_until_separator(s: str, position: int) -> tuple[str, int]:
-    return read_until([',', ' ', '\t', '\n', '\r'], s, position)
-
-
-def read_keyword(keyword: str, s: str, position: int) -> tuple[Keyword, int]:
-    t = s[position:].lower()
-    if t.startswith(keyword):
-        position = skip_white_spaces(s, position + len(keyword))
-        return Keyword(keyword), position
-
-    raise InvalidTokenError(f'Invalid token at position {position}: expected keyword "{keyword}"')
-
-
-def read_keywords(keywords: list[str], s: str, position: int) -> tuple[Keyword, int]:
-    t = s[position:].lower()
-
-    for keyword in keywords:
-        if t.startswith(keyword):
-            position = skip_white_spaces(s, position + len(keyword))
-            return Keyword(keyword), position
+    def __eq__(self, other):
+        if not isinstance(other, Token):
+            return False
 
-    raise InvalidTokenError(f'Invalid token at position {position}: expected keywords "{keywords}"')
+        return self.kind == other.kind and self.value == other.value and self.start == other.start
 
+    def __repr__(self):
+        return f'Token(kind="{self.kind}", value="{self.value}", start={self.start})'
 
-def read_literal(s: str, position: int) -> tuple[Literal, int]:
-    start = position
-    while position < len(s) and s[position] not in (' ', '\t', '\n', '\r'):
-        position += 1
 
-    return Literal(s[start:position]), position
+Tokens = list[Keyword | Literal | Select]
 
 
-def read_joins(s: str, position: int) -> tuple[list, int]:
-    joins = []
+def tokenize(s: str, position: int = 0) -> list[Token]:
+    """
+    Splits the text into tokens in a single pass, white space is skipped.
+    """
+    tokens = []
+    match_token = TOKEN_PATTERN.match
     while position < len(s):
-        position = skip_white_spaces(s, position)
-        if re.match(r'^left\s+outer\s+join\s+', s[position:], re.IGNORECASE) is not None:
-            join, position = read_left_outer_join(s, position)
-        elif re.match(r'^inner\s+join\s+', s[position:], re.IGNORECASE) is not None:
-            join, position = read_inner_join(s, position)
-        elif re.match(r'^join\s+', s[position:], re.IGNORECASE) is not None:
-            join, position = read_join(s, position)
-        else:
-            break
-
-        joins.extend(join)
-
-    position = skip_white_spaces(s, position)
-    return joins, position
-
-
-def read_left_outer_join(s: str, position: int) -> tuple[list, int]:
-    _, position = read_keyword('left', s, position)
-    _, position = read_keyword('outer', s, position)
-    _, position = read_keyword('join', s, position)
-    table, position = read_until_white_space(s, position)
-    _, position = read_keyword('on', s, position)
-    conditions, position = read_conditions(s, position)
-    return [('left outer join', table, conditions)], position
-
-
-def read_inner_join(s: str, position: int) -> tuple[list, int]:
-    _, position = read_keyword('inner', s, position)
-    _, position = read_keyword('join', s, position)
-    value, position = read_until_white_space(s, position)
-    _, position = read_keyword('on', s, position)
-    conditions, position = read_conditions(s, position)
-    return [('inner join', value, conditions)], position
-
+        match = match_token(s, position)
+        if match is None:
+            raise InvalidTokenError(f'Invalid token at position {position}: "{s[position:position + 10]}"')
+
+        kind = match.lastgroup
+        if kind != 'space':
+            tokens.append(Token(kind, match.group(), position, match.end()))
+        position = match.end()
+
+    return tokens
+
+
+class Parser:
+    """
+    Recursive-descent parser over the tokens of a query.
+    """
+
+    def __init__(self, s: str, tokens: list[Token]):
+        self.s = s
+        self.tokens = tokens
+        self.index = 0
+
+    @property
+    def position(self) -> int:
+        """
+        Position of the next token in the text, or the end of the text.
+        """
+        return self.tokens[self.index].start if self.index < len(self.tokens) else len(self.s)
+
+    def peek(self, offset: int = 0) -> Optional[Token]:
+        index = self.index + offset
+        return self.tokens[index] if index < len(self.tokens) else None
+
+    def next(self) -> Token:
+        token = self.peek()
+        if token is None:
+            raise InvalidTokenError(f'Unexpected end of query at position {len(self.s)}')
+
+        self.index += 1
+        return token
+
+    def is_keyword(self, *keywords: str, offset: int = 0) -> bool:
+        token = self.peek(offset)
+        return token is not None and token.kind == 'name' and token.value.lower() == keywords[0] and (
+            len(keywords) == 1 or self.is_keyword(*keywords[1:], offset=offset + 1)
+        )
 
-def read_join(s: str, position: int) -> tuple[list, int]:
-    _, position = read_keyword('join', s, position)
-    value, position = read_until_white_space(s, position)
-    _, position = read_keyword('on', s, position)
-    conditions, position = read_conditions(s, position)
-    return [('join', value, conditions)], position
+    def is_punctuation(self, value: str) -> bool:
+        token = self.peek()
+        return token is not None and token.kind == 'punctuation' and token.value == value
+
+    def read_keyword(self, *keywords: str) -> str:
+        for keyword in keywords:
+            if not self.is_keyword(keyword):
+                raise InvalidTokenError(f'Invalid token at position {self.position}: expected keyword "{keyword}"')
+            self.index += 1
+        return keywords[-1]
+
+    def read_one_of(self, keywords: list[str]) -> str:
+        for keyword in keywords:
+            if self.is_keyword(keyword):
+                self.index += 1
+                return keyword
+
+        raise InvalidTokenError(f'Invalid token at position {self.position}: expected keywords "{keywords}"')
+
+    def read_punctuation(self, value: str):
+        if not self.is_punctuation(value):
+            raise InvalidTokenError(f'Invalid token at position {self.position}: expected "{value}"')
+        self.index += 1
+
+    def read_name(self) -> str:
+        token = self.next()
+        if token.kind != 'name':
+            raise InvalidTokenError(f'Invalid token at position {token.start}: expected a name, got "{token.value}"')
+        return token.value
+
+    def read_query(self) -> Select:
+        self.read_keyword('select')
+        select_list = self.read_select_list()
+        self.read_keyword('from')
+        select_from = self.read_names()
+        join = self.read_joins()
+        where = self.read_conditions() if self.accept('where') else None
+        group_by = self.read_names() if self.accept('group', 'by') else []
+        having = self.read_conditions() if self.accept('having') else None
+        order_by = self.read_order_by() if self.accept('order', 'by') else []
+        limit = self.read_count() if self.accept('limit') else None
+        offset = self.read_count() if self.accept('offset') else None
+
+        if self.is_punctuation(';'):
+            self.index += 1
+        if self.peek() is not None:
+            raise InvalidTokenError(f'Invalid token at position {self.position}: "{self.peek().value}"')
+
+        return Select(
+            select_list=select_list,
+            select_from=select_from,
+            join=join,
+            where=where,
+            order_by=order_by,
+            group_by=group_by,
+            having=having,
+            limit=limit,
+            offset=offset
+        )
 
+    def accept(self, *keywords: str) -> bool:
+        if not self.is_keyword(*keywords):
+            return False
 
-def read_where(s: str, position: int) -> tuple[tuple | None, int]:
-    if not s[position:].lower().startswith('where'):
-        return None, position
+        self.index += len(keywords)
+        return True
+
+    def read_select_list(self) -> list[str | FunctionCall]:
+        items = [self.read_select_item()]
+        while self.is_punctuation(','):
+            self.index += 1
+            items.append(self.read_select_item())
+        return items
+
+    def read_select_item(self) -> str | FunctionCall:
+        if self.is_punctuation('*'):
+            self.index += 1
+            return '*'
+
+        token = self.peek()
+        if token is not None and token.kind == 'all_columns':
+            self.index += 1
+            return token.value
+
+        name = self.read_name()
+        if not self.is_punctuation('('):
+            return name
+
+        self.index += 1
+        distinct = self.accept('distinct')
+        if self.is_punctuation('*') and not distinct:
+            self.index += 1
+            argument = None
+        else:
+            argument = self.read_name()
+        self.read_punctuation(')')
+
+        alias = self.read_name() if self.accept('as') else None
+        return FunctionCall(name.lower(), argument, distinct, alias)
+
+    def read_names(self) -> list[str]:
+        names = [self.read_name()]
+        while self.is_punctuation(','):
+            self.index += 1
+            names.append(self.read_name())
+        return names
+
+    def read_joins(self) -> list[tuple[str, str, tuple]]:
+        joins = []
+        while True:
+            if self.accept('left', 'outer', 'join'):
+                join_type = 'left outer join'
+            elif self.accept('inner', 'join'):
+                join_type = 'inner join'
+            elif self.accept('join'):
+                join_type = 'join'
+            else:
+                return joins
+
+            table = self.read_name()
+            self.read_keyword('on')
+            joins.append((join_type, table, self.read_conditions()))
+
+    def read_conditions(self) -> tuple:
+        """
+        Conditions joined with `or`, which binds weaker than `and`. Both are right associative.
+        """
+        disjuncts = [self.read_conjunction()]
+        while self.accept('or'):
+            disjuncts.append(self.read_conjunction())
+        return fold_right('or', disjuncts)
+
+    def read_conjunction(self) -> tuple:
+        conjuncts = [self.read_condition()]
+        while self.accept('and'):
+            conjuncts.append(self.read_condition())
+        return fold_right('and', conjuncts)
+
+    def read_condition(self) -> tuple:
+        if self.is_punctuation('('):
+            self.index += 1
+            condition = self.read_conditions()
+            self.read_punctuation(')')
+            return condition
+
+        left = self.read_operand()
+        if self.accept('between'):
+            low = self.read_operand()
+            self.read_keyword('and')
+            high = self.read_operand()
+            return 'and', (left, '>=', low), (left, '<=', high)
+
+        token = self.next()
+        if token.kind != 'operator' and not (token.kind == 'name' and token.value.lower() == 'is'):
+            raise InvalidTokenError(f'Invalid token at position {token.start}: expected an operator, got "{token.value}"')
+        right = self.read_operand()
+        return left, token.value, right
+
+    def read_operand(self) -> str:
+        """
+        Source text of an operand: a column, a literal or an aggregate function call.
+        """
+        token = self.next()
+        if token.kind in ('string', 'number'):
+            return token.value
+        if token.kind != 'name':
+            raise InvalidTokenError(f'Invalid token at position {token.start}: expected an operand, got "{token.value}"')
+        if not self.is_punctuation('('):
+            return token.value
+
+        while self.next().value != ')':
+            pass
+        return self.s[token.start:self.tokens[self.index - 1].end]
+
+    def read_count(self) -> int:
+        """
+        Non-negative integer of a LIMIT or OFFSET clause.
+        """
+        token = self.next()
+        if token.kind != 'number' or not token.value.isdigit():
+            raise InvalidTokenError(
+                f'Invalid token at position {token.start}: expected a non-negative integer, got "{token.value}"'
+            )
+        return int(token.value)
+
+    def read_order_by(self) -> list[tuple[str, ...]]:
+        """
+        Sort keys as (column, direction) or (column, direction, nulls) when NULLS FIRST/LAST is given.
+        """
+        keys = [self.read_sort_key()]
+        while self.is_punctuation(','):
+            self.index += 1
+            keys.append(self.read_sort_key())
+        return keys
+
+    def read_sort_key(self) -> tuple[str, ...]:
+        column = self.read_name()
+        direction = self.read_one_of(['asc', 'desc']) if self.is_keyword('asc') or self.is_keyword('desc') else 'asc'
+        if self.accept('nulls'):
+            return column, direction, self.read_one_of(['first', 'last'])
+        return column, direction
+
+
+def fold_right(operator: str, conditions: list[tuple]) -> tuple:
+    result = conditions[-1]
+    for condition in reversed(conditions[:-1]):
+        result = (operator, condition, result)
+    return result
 
-    _, position = read_keyword('where', s, position)
-    conditions, position = read_conditions(s, position)
 
-    return conditions, position
+def parse_sql(s: str) -> Tokens:
+    return [Parser(s, tokenize(s)).read_query()]
 
 
 def read_conditions(s: str, position: int) -> tuple[tuple, int]:
-    operands = []
-    operators = []
-    while position < len(s):
-        if s[position] == '(':
-            operators.append('(')
-            position = skip_white_spaces(s, position + 1)
-
-        left, position = read_until_white_space(s, position)
-        operator, position = read_until_white_space(s, position)
-        right, position = read_until_white_space_or_bracket(s, position)
-
-        condition = (left, operator, right)
-        operands.append(condition)
-
-        if position < len(s) and s[position] == ')':
-            position = skip_white_spaces(s, position + 1)
-            while len(operators) > 0 and operators[-1] != '(':
-                boolean_operator = operators.pop()
-                right_condition = operands.pop()
-                left_condition = operands.pop()
-                operands.append((boolean_operator, left_condition, right_condition))
-            operators.pop()
-
-        if re.match(r'^(and|or)', s[position:], re.IGNORECASE) is None:
-            break
-
-        keyword, position = read_keywords(['and', 'or'], s, position)
-        boolean_operator = keyword.value
+    """
+    Reads conditions starting at the position and returns them with the position after them.
+    """
+    parser = Parser(s, tokenize(s, position))
+    conditions = parser.read_conditions()
+    return conditions, parser.position
 
-        while len(operators) > 0 and operators[-1] == 'and' and boolean_operator == 'or':
-            last_boolean_operator = operators.pop()
 
-            if last_boolean_operator == '(':
-                break
+def is_literal(value: str) -> bool:
+    return (
+        value.lower() in KEYWORD_VALUES
+        or len(value) >= 2 and value[0] == value[-1] == "'"
+        or NUMBER_PATTERN.fullmatch(value) is not None
+    )
 
-            right_condition = operands.pop()
-            left_condition = operands.pop()
-            operands.append((last_boolean_operator, left_condition, right_condition))
 
-        operators.append(boolean_operator)
+def parse_literal(value: str) -> Any:
+    """
+    Converts a literal from a condition, e.g. `10000`, `1.5`, `'Sales'` or `null`, into a Python value.
+    """
+    if value.lower() in KEYWORD_VALUES:
+        return KEYWORD_VALUES[value.lower()]
 
-    while len(operators) > 0:
-        boolean_operator = operators.pop()
-        right_condition = operands.pop()
-        left_condition = operands.pop()
-        operands.append((boolean_operator, left_condition, right_condition))
+    if len(value) >= 2 and value[0] == value[-1] == "'":
+        return value[1:-1].replace("''", "'")
 
-    conditions = operands.pop()
+    if NUMBER_PATTERN.fullmatch(value) is None:
+        raise InvalidTokenError(f'Invalid literal "{value}"')
 
-    position = skip_white_spaces(s, position)
-    return conditions, position
+    return float(value) if '.' in value or 'e' in value.lower() else int(value)
@@ -0,0 +1,397 @@
+import json
+import os
+import struct
+from collections import OrderedDict
+from typing import Any, Iterable, Iterator, Optional
+
+from models import Record, Schema, TABLE_IDS
+
+PAGE_SIZE = 4096
+CATALOG_PAGE = 0
+NO_PAGE = 0
+
+DATA_PAGE = 1
+CATALOG_PAGE_TYPE = 2
+
+# page type, number of slots, start of the row data and the next page of the table
+PAGE_HEADER = struct.Struct('<BHHI')
+# offset and length of a row inside the page
+SLOT = struct.Struct('<HH')
+CATALOG_HEADER = struct.Struct('<BI')
+
+NULL, FALSE, TRUE, INTEGER, FLOAT, STRING = range(6)
+INTEGER_VALUE = struct.Struct('<q')
+FLOAT_VALUE = struct.Struct('<d')
+STRING_LENGTH = struct.Struct('<I')
+
+
+class StorageError(Exception):
+    pass
+
+
+class Page:
+    """
+    Slotted page: a header, a slot directory growing from the start and rows growing from the end of the page.
+    """
+    __slots__ = ('page_id', 'data', 'dirty')
+
+    def __init__(self, page_id: int, data: bytearray, dirty: bool = False):
+        self.page_id = page_id
+        self.data = data
+        self.dirty = dirty
+
+    @staticmethod
+    def create(page_id: int) -> 'Page':
+        page = Page(page_id, bytearray(PAGE_SIZE), dirty=True)
+        PAGE_HEADER.pack_into(page.data, 0, DATA_PAGE, 0, PAGE_SIZE, NO_PAGE)
+        return page
+
+    @property
+    def slot_count(self) -> int:
+        return PAGE_HEADER.unpack_from(self.data, 0)[1]
+
+    @property
+    def next_page(self) -> int:
+        return PAGE_HEADER.unpack_from(self.data, 0)[3]
+
+    @next_page.setter
+    def next_page(self, page_id: int):
+        page_type, slot_count, data_start, _ = PAGE_HEADER.unpack_from(self.data, 0)
+        PAGE_HEADER.pack_into(self.data, 0, page_type, slot_count, data_start, page_id)
+        self.dirty = True
+
+    def free_space(self) -> int:
+        _, slot_count, data_start, _ = PAGE_HEADER.unpack_from(self.data, 0)
+        return data_start - PAGE_HEADER.size - (slot_count + 1) * SLOT.size
+
+    def insert(self, row: bytes) -> bool:
+        """
+        Adds a row to the page, returns False when there's not enough free space.
+        """
+        if len(row) > self.free_space():
+            return False
+
+        page_type, slot_count, data_start, next_page = PAGE_HEADER.unpack_from(self.data, 0)
+        data_start -= len(row)
+        self.data[data_start:data_start + len(row)] = row
+        SLOT.pack_into(self.data, PAGE_HEADER.size + slot_count * SLOT.size, data_start, len(row))
+        PAGE_HEADER.pack_into(self.data, 0, page_type, slot_count + 1, data_start, next_page)
+        self.dirty = True
+        return True
+
+    def rows(self) -> Iterator[memoryview]:
+        view = memoryview(self.data)
+        for slot in range(self.slot_count):
+            offset, length = SLOT.unpack_from(self.data, PAGE_HEADER.size + slot * SLOT.size)
+            yield view[offset:offset + length]
+
+
+class BufferPool:
+    """
+    Caches a fixed number of pages of the file in memory and evicts the least recently used one,
+    dirty pages are written back when they are evicted or flushed.
+    """
+
+    def __init__(self, file, capacity: int):
+        if capacity < 1:
+            raise StorageError('Buffer pool needs room for at least one page')
+
+        self.file = file
+        self.capacity = capacity
+        self.__pages: OrderedDict[int, Page] = OrderedDict()
+        self.reads = 0
+        self.writes = 0
+
+    def get(self, page_id: int) -> Page:
+        page = self.__pages.get(page_id)
+        if page is not None:
+            self.__pages.move_to_end(page_id)
+            return page
+
+        self.file.seek(page_id * PAGE_SIZE)
+        data = bytearray(self.file.read(PAGE_SIZE))
+        if len(data) != PAGE_SIZE:
+            raise StorageError(f'Page {page_id} is missing or truncated')
+        self.reads += 1
+        return self.__add(Page(page_id, data))
+
+    def add(self, page: Page) -> Page:
+        return self.__add(page)
+
+    def __add(self, page: Page) -> Page:
+        while len(self.__pages) >= self.capacity:
+            _, evicted = self.__pages.popitem(last=False)
+            self.__write(evicted)
+
+        self.__pages[page.page_id] = page
+        return page
+
+    def __write(self, page: Page):
+        if page.dirty:
+            self.file.seek(page.page_id * PAGE_SIZE)
+            self.file.write(page.data)
+            page.dirty = False
+            self.writes += 1
+
+    def flush(self):
+        for page in self.__pages.values():
+            self.__write(page)
+        self.file.flush()
+
+
+class TableInfo:
+    """
+    Catalog entry of a table: its columns, first and last page of the page chain and the number of rows.
+    """
+
+    def __init__(self, columns: Iterable[str], first_page: int = NO_PAGE, last_page: int = NO_PAGE, rows: int = 0):
+        self.columns = tuple(columns)
+        self.first_page = first_page
+        self.last_page = last_page
+        self.rows = rows
+        # rows are only appended, so the identifier and the number of rows identify the table contents
+        self.id = next(TABLE_IDS)
+
+    def to_json(self) -> dict[str, Any]:
+        return {'columns': list(self.columns), 'first_page': self.first_page, 'last_page': self.last_page, 'rows': self.rows}
+
+    @staticmethod
+    def from_json(value: dict[str, Any]) -> 'TableInfo':
+        return TableInfo(value['columns'], value['first_page'], value['last_page'], value['rows'])
+
+
+class StorageEngine:
+    """
+    Stores tables in a file of fixed-size pages. Page 0 is the catalog with the schemas of the tables,
+    rows of a table are kept in a chain of slotted pages which are read through a buffer pool,
+    so tables don't have to fit into memory.
+    """
+
+    def __init__(self, path: str, buffer_pool_pages: int = 256):
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, 'r+b' if exists else 'w+b')
+        self.buffer_pool = BufferPool(self.file, buffer_pool_pages)
+        self.catalog: dict[str, TableInfo] = {}
+        self.page_count = 1
+
+        if exists:
+            self.__read_catalog()
+        else:
+            self.__write_catalog()
+
+    def __enter__(self) -> 'StorageEngine':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+
+    def flush(self):
+        self.__write_catalog()
+        self.buffer_pool.flush()
+        os.fsync(self.file.fileno())
+
+    def create_table(self, name: str, columns: Iterable[str]) -> 'StoredTable':
+        if name in self.catalog:
+            raise StorageError(f'Table "{name}" already exists')
+
+        self.catalog[name] = TableInfo(Schema.of(columns).columns)
+        return StoredTable(self, name)
+
+    def drop_table(self, name: str):
+        self.__get_info(name)
+        # pages of the dropped table are not reused
+        del self.catalog[name]
+
+    def table(self, name: str) -> 'StoredTable':
+        self.__get_info(name)
+        return StoredTable(self, name)
+
+    def tables(self) -> dict[str, 'StoredTable']:
+        return {name: StoredTable(self, name) for name in self.catalog}
+
+    def insert(self, name: str, records: Iterable[Record]):
+        info = self.__get_info(name)
+
+        for record in records:
+            row = encode_row(info.columns, record)
+            if len(row) > PAGE_SIZE - PAGE_HEADER.size - SLOT.size:
+                raise StorageError(f'Row of {len(row)} bytes doesn\'t fit into a page')
+
+            # the last page is taken from the buffer pool for every row, as reading the records
+            # (e.g. a scan of another table) may have evicted it
+            page = None if info.last_page == NO_PAGE else self.buffer_pool.get(info.last_page)
+            if page is None or not page.insert(row):
+                # the page is linked before the new one is allocated, which may evict it
+                page_id = self.page_count
+                if page is None:
+                    info.first_page = page_id
+                else:
+                    page.next_page = page_id
+                info.last_page = page_id
+                self.__allocate_page().insert(row)
+
+            info.rows += 1
+
+    def scan(self, name: str) -> Iterator[Record]:
+        """
+        Reads records of the table page by page, only the pages kept by the buffer pool stay in memory.
+        """
+        info = self.__get_info(name)
+        schema = Schema.of(info.columns)
+        page_id = info.first_page
+        while page_id != NO_PAGE:
+            page = self.buffer_pool.get(page_id)
+            for row in page.rows():
+                yield Record.from_values(schema, decode_row(row, len(info.columns)))
+            page_id = page.next_page
+
+    def row_count(self, name: str) -> int:
+        return self.__get_info(name).rows
+
+    def version(self, name: str) -> tuple[int, int]:
+        info = self.__get_info(name)
+        return info.id, info.rows
+
+    def __get_info(self, name: str) -> TableInfo:
+        info = self.catalog.get(name)
+        if info is None:
+            raise StorageError(f'Table "{name}" doesn\'t exist')
+        return info
+
+    def __allocate_page(self) -> Page:
+        page = Page.create(self.page_count)
+        self.page_count += 1
+        return self.buffer_pool.add(page)
+
+    def __read_catalog(self):
+        self.file.seek(CATALOG_PAGE)
+        data = self.file.read(PAGE_SIZE)
+        page_type, length = CATALOG_HEADER.unpack_from(data, 0)
+        if page_type != CATALOG_PAGE_TYPE:
+            raise StorageError('File is not a database file, the catalog page is missing')
+
+        catalog = json.loads(data[CATALOG_HEADER.size:CATALOG_HEADER.size + length].decode('utf-8'))
+        self.page_count = catalog['page_count']
+        self.catalog = {name: TableInfo.from_json(info) for name, info in catalog['tables'].items()}
+
+    def __write_catalog(self):
+        catalog = json.dumps({
+            'page_count': self.page_count,
+            'tables': {name: info.to_json() for name, info in self.catalog.items()}
+        }).encode('utf-8')
+        if CATALOG_HEADER.size + len(catalog) > PAGE_SIZE:
+            raise StorageError('Catalog doesn\'t fit into the catalog page')
+
+        page = bytearray(PAGE_SIZE)
+        CATALOG_HEADER.pack_into(page, 0, CATALOG_PAGE_TYPE, len(catalog))
+        page[CATALOG_HEADER.size:CATALOG_HEADER.size + len(catalog)] = catalog
+        self.file.seek(CATALOG_PAGE)
+        self.file.write(page)
+
+
+class StoredTable:
+    """
+    Table source backed by the storage engine, every iteration scans the pages of the table again.
+    """
+
+    def __init__(self, engine: StorageEngine, name: str):
+        self.engine = engine
+        self.name = name
+
+    def __iter__(self) -> Iterator[Record]:
+        return self.engine.scan(self.name)
+
+    def __len__(self) -> int:
+        return self.engine.row_count(self.name)
+
+    @property
+    def version(self) -> tuple[int, int]:
+        return self.engine.version(self.name)
+
+    def __contains__(self, record: Record) -> bool:
+        return any(record == stored for stored in self)
+
+    def insert(self, records: Iterable[Record]):
+        self.engine.insert(self.name, records)
+
+    def __repr__(self):
+        return f'StoredTable(name="{self.name}", rows={len(self)})'
+
+
+def encode_row(columns: tuple[str, ...], record: Record) -> bytes:
+    if record.keys() != columns:
+        raise StorageError(f'Record columns {list(record.keys())} don\'t match the table columns {list(columns)}')
+
+    return b''.join([encode_value(value) for value in record.values()])
+
+
+def encode_value(value: Any) -> bytes:
+    if value is None:
+        return bytes((NULL,))
+    if value is True:
+        return bytes((TRUE,))
+    if value is False:
+        return bytes((FALSE,))
+    if isinstance(value, int):
+        try:
+            return bytes((INTEGER,)) + INTEGER_VALUE.pack(value)
+        except struct.error as error:
+            raise StorageError(f'Integer {value} doesn\'t fit into 64 bits') from error
+    if isinstance(value, float):
+        return bytes((FLOAT,)) + FLOAT_VALUE.pack(value)
+    if isinstance(value, str):
+        data = value.encode('utf-8')
+        return bytes((STRING,)) + STRING_LENGTH.pack(len(data)) + data
+
+    raise StorageError(f'Values of type {type(value).__name__} can\'t be stored')
+
+
+def decode_row(row: memoryview, count: int) -> tuple:
+    values = []
+    position = 0
+    for _ in range(count):
+        tag = row[position]
+        position += 1
+        if tag == NULL:
+            values.append(None)
+        elif tag == TRUE:
+            values.append(True)
+        elif tag == FALSE:
+            values.append(False)
+        elif tag == INTEGER:
+            values.append(INTEGER_VALUE.unpack_from(row, position)[0])
+            position += INTEGER_VALUE.size
+        elif tag == FLOAT:
+            values.append(FLOAT_VALUE.unpack_from(row, position)[0])
+            position += FLOAT_VALUE.size
+        elif tag == STRING:
+            length, = STRING_LENGTH.unpack_from(row, position)
+            position += STRING_LENGTH.size
+            values.append(bytes(row[position:position + length]).decode('utf-8'))
+            position += length
+        else:
+            raise StorageError(f'Invalid value tag {tag}')
+    return tuple(values)
+
+
+def load_table(engine: StorageEngine, name: str, records: Iterable[Record], columns: Optional[Iterable[str]] = None) -> StoredTable:
+    """
+    Creates a table with the records, columns are taken from the first record unless given.
+    """
+    records = iter(records)
+    first = next(records, None)
+    if columns is None:
+        if first is None:
+            raise StorageError(f'Columns of table "{name}" can\'t be inferred from no records')
+        columns = first.keys()
+
+    table = engine.create_table(name, columns)
+    if first is not None:
+        table.insert([first])
+    table.insert(records)
+    return table
@@ -0,0 +1,150 @@
+from collections import Counter
+from typing import Any, Optional, Iterable
+
+from models import Table, Record
+
+
+class ColumnStatistics:
+    """
+    Value counts of a column, so statistics can be updated incrementally when records
+    are added or removed. Minimum and maximum are computed lazily and cached.
+    """
+
+    def __init__(self):
+        self.counts = Counter()
+        self.null_count = 0
+        self.__bounds: Optional[tuple[Any, Any]] = None
+
+    @property
+    def distinct_count(self) -> int:
+        return len(self.counts)
+
+    @property
+    def min(self) -> Any:
+        return self.__get_bounds()[0]
+
+    @property
+    def max(self) -> Any:
+        return self.__get_bounds()[1]
+
+    def add(self, value: Any):
+        if value is None:
+            self.null_count += 1
+            return
+
+        self.counts[value] += 1
+        if self.__bounds == (None, None):
+            self.__bounds = None
+        elif self.__bounds is not None:
+            try:
+                self.__bounds = (min(self.__bounds[0], value), max(self.__bounds[1], value))
+            except TypeError:
+                self.__bounds = (None, None)
+
+    def remove(self, value: Any):
+        if value is None:
+            self.null_count -= 1
+            return
+
+        self.counts[value] -= 1
+        if self.counts[value] <= 0:
+            del self.counts[value]
+            if self.__bounds is not None and value in self.__bounds:
+                self.__bounds = None
+
+    def __get_bounds(self) -> tuple[Any, Any]:
+        if self.__bounds is None:
+            try:
+                self.__bounds = (min(self.counts), max(self.counts)) if self.counts else (None, None)
+            except TypeError:
+                self.__bounds = (None, None)
+        return self.__bounds
+
+    def __repr__(self):
+        return f'ColumnStatistics(distinct={self.distinct_count}, nulls={self.null_count}, min={self.min}, max={self.max})'
+
+
+class TableStatistics:
+    def __init__(self, records: Iterable[Record] = ()):
+        self.row_count = 0
+        self.columns: dict[str, ColumnStatistics] = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record: Record):
+        for column in record.columns():
+            if column not in self.columns:
+                # records seen before didn't have the column, so it was NULL for all of them
+                self.columns[column] = ColumnStatistics()
+                self.columns[column].null_count = self.row_count
+        for column, statistics in self.columns.items():
+            statistics.add(record[column])
+        self.row_count += 1
+
+    def remove(self, record: Record):
+        for column, statistics in self.columns.items():
+            statistics.remove(record[column])
+        self.row_count -= 1
+
+    def distinct_count(self, column: str) -> Optional[int]:
+        statistics = self.columns.get(column)
+        return None if statistics is None else statistics.distinct_count
+
+    def null_fraction(self, column: str) -> float:
+        statistics = self.columns.get(column)
+        if statistics is None or self.row_count == 0:
+            return 0.0
+        return statistics.null_count / self.row_count
+
+    def __repr__(self):
+        return f'TableStatistics(rows={self.row_count}, columns={self.columns})'
+
+
+class StatisticsCatalog:
+    """
+    Statistics cached per table name. Tables which track their version (e.g. IndexedTable or database
+    snapshots) are collected again when the version changes, other tables when a different table is passed
+    under the same name. Changes of a table without a version have to be passed to `update` or `invalidate`,
+    cached statistics are refreshed incrementally with the inserted and deleted records.
+    """
+
+    def __init__(self):
+        self.__statistics: dict[str, TableStatistics] = {}
+        # the version of the table, or the table itself when it doesn't have a version,
+        # which also keeps its id from being reused
+        self.__sources: dict[str, tuple[Any, Optional[Table]]] = {}
+
+    def get(self, name: str, table: Table) -> TableStatistics:
+        source = get_source(table)
+        if name not in self.__statistics or not is_same_source(self.__sources[name], source):
+            self.__statistics[name] = TableStatistics(table)
+            self.__sources[name] = source
+        return self.__statistics[name]
+
+    def collect(self, tables: dict[str, Table]) -> dict[str, TableStatistics]:
+        return {name: self.get(name, table) for name, table in tables.items()}
+
+    def update(self, name: str, table: Table, inserted: Iterable[Record] = (), deleted: Iterable[Record] = ()):
+        if name not in self.__statistics:
+            self.get(name, table)
+            return
+
+        statistics = self.__statistics[name]
+        for record in deleted:
+            statistics.remove(record)
+        for record in inserted:
+            statistics.add(record)
+        self.__sources[name] = get_source(table)
+
+    def invalidate(self, name: str):
+        self.__statistics.pop(name, None)
+        self.__sources.pop(name, None)
+
+
+def get_source(table: Table) -> tuple[Any, Optional[Table]]:
+    version = getattr(table, 'version', None)
+    return version, table if version is None else None
+
+
+def is_same_source(cached: tuple[Any, Optional[Table]], source: tuple[Any, Optional[Table]]) -> bool:
+    return cached[0] == source[0] and cached[1] is source[1]
@@ -0,0 +1,37 @@
+import pytest
+
+from aggregation import Aggregate, AggregationError
+
+
+def test_accumulators_merge_partial_results():
+    values = [3, None, 1, 4, 1, 5]
+    for aggregate, expected in [
+        (Aggregate('count'), 6),
+        (Aggregate('count', 'x'), 5),
+        (Aggregate('count', 'x', distinct=True), 4),
+        (Aggregate('sum', 'x'), 14),
+        (Aggregate('min', 'x'), 1),
+        (Aggregate('max', 'x'), 5),
+        (Aggregate('avg', 'x'), 14 / 5),
+    ]:
+        first, second = aggregate.create_accumulator(), aggregate.create_accumulator()
+        for value in values[:3]:
+            first.add(True if aggregate.column is None else value)
+        for value in values[3:]:
+            second.add(True if aggregate.column is None else value)
+
+        first.merge(second)
+        assert first.result() == expected, aggregate
+
+
+def test_aggregate_validation():
+    assert repr(Aggregate('COUNT', 'id', distinct=True)) == 'COUNT(DISTINCT id)'
+
+    with pytest.raises(AggregationError):
+        Aggregate('median', 'id')
+    with pytest.raises(AggregationError):
+        Aggregate('sum')
+    with pytest.raises(AggregationError):
+        Aggregate('sum', 'id', distinct=True)
+    with pytest.raises(AggregationError):
+        Aggregate('count', distinct=True)
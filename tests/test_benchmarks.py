@@ -0,0 +1,27 @@
+from collections import Counter
+
+from benchmarks.data import generate_employees, generate_tasks
+from benchmarks.harness import get_percentile, run, compare
+from benchmarks.suite import create_cases
+
+
+def test_generated_data():
+    employees = generate_employees(100, positions=3, salary_null_fraction=0.5)
+    assert {record.id for record in employees} == set(range(100))
+    assert len({record.position for record in employees}) == 3
+    assert 20 < sum(record.salary is None for record in employees) < 80
+
+    owners = Counter(record.employee_id for record in generate_tasks(1000, 100, employee_skew=1.5))
+    assert owners.most_common(1)[0] == (0, max(owners.values()))
+    assert owners[0] > 10 * max(owners[99], 1)
+
+
+def test_harness(tmp_path):
+    assert get_percentile([4, 1, 3, 2], 50) == 2.5
+    assert get_percentile([1.0], 99) == 1.0
+
+    cases = create_cases(scale=100, skew=1.0)
+    results = run({name: cases[name] for name in ('select', 'hash_inner_join', 'query_group_by')}, 2, {'scale': 100})
+    assert results['results']['hash_inner_join']['rows'] == 1000
+    assert results['results']['select']['latency_ms']['p50'] > 0
+    assert len(compare(results, results)) == 4
@@ -0,0 +1,59 @@
+import pytest
+
+from column_file import write_column_file, MappedColumnTable, ColumnFileError
+from models import Table, Record
+from sql_compiler import execute_sql
+
+
+@pytest.fixture
+def employee_file(tmp_path, employees: Table) -> MappedColumnTable:
+    path = str(tmp_path / 'employees.col')
+    records = sorted(employees | {Record(id=5, name=None, position='HR', salary=None)}, key=lambda record: record.id)
+    write_column_file(path, records, block_size=2)
+    with MappedColumnTable(path) as table:
+        yield table
+
+
+def test_round_trip(tmp_path):
+    records = [
+        Record(id=0, name='Ünïcode', active=True, score=1.5),
+        Record(id=1, name='', active=False, score=None),
+        Record(id=2, name=None, active=None, score=3),
+    ]
+    path = str(tmp_path / 'values.col')
+    write_column_file(path, records, block_size=2)
+
+    with MappedColumnTable(path) as table:
+        assert len(table) == 3
+        assert list(table) == [records[0], records[1], Record(id=2, name=None, active=None, score=3.0)]
+        assert list(table.scan(['id', 'active'])) == [
+            Record(id=0, active=True), Record(id=1, active=False), Record(id=2, active=None)
+        ]
+
+    with pytest.raises(ColumnFileError):
+        write_column_file(path, [Record(id=0, value=Record(x=1))])
+    with pytest.raises(ColumnFileError):
+        MappedColumnTable(__file__)
+
+
+def test_filter_skips_blocks(employee_file: MappedColumnTable, employees: Table):
+    tables = {'employees': employee_file}
+    assert execute_sql('select id from employees where id >= 4', tables) == [Record(id=4), Record(id=5)]
+    assert employee_file.skipped_blocks == 2
+
+    sql = 'select name from employees where salary > 50000 and position = \'Sales\''
+    assert set(execute_sql(sql, tables)) == set(execute_sql(sql, {'employees': employees}))
+    assert employee_file.skipped_blocks == 3
+
+    assert execute_sql('select id from employees where name is null', tables) == [Record(id=5)]
+    assert employee_file.skipped_blocks == 5
+
+
+def test_join_with_column_file(employee_file: MappedColumnTable, employees: Table, tasks: Table):
+    sql = (
+        'select employees.name, tasks.id from employees '
+        'join tasks on employees.id = tasks.employee_id where employees.salary < 60000'
+    )
+    result = execute_sql(sql, {'employees': employee_file, 'tasks': tasks})
+    assert set(result) == set(execute_sql(sql, {'employees': employees, 'tasks': tasks}))
+    assert len(result) == 5
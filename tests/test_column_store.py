@@ -0,0 +1,66 @@
+import pytest
+
+from models import Table, Record
+from query_plan_builder import BinaryCondition
+from sql_parser import read_conditions
+from tests.utils import create_employee
+
+np = pytest.importorskip('numpy')
+
+from column_store import ColumnTable  # noqa: E402
+
+
+@pytest.fixture
+def column_employees(employees: Table) -> ColumnTable:
+    return ColumnTable.from_records(employees | {Record(id=5, name='Toby Flenderson', position='HR', salary=None)})
+
+
+def test_round_trip(employees: Table):
+    table = ColumnTable.from_records(employees)
+    assert table.columns['id'].dtype == np.int64
+    assert table.to_table() == employees
+    assert set(table) == employees
+
+
+def test_select_with_binary_conditions(column_employees: ColumnTable):
+    result = column_employees.select([BinaryCondition('salary', '50000', '>'), BinaryCondition('position', "'Sales'", '=')])
+    assert result.to_table() == {
+        create_employee(3, "James Halpert", "Sales", 55000),
+        create_employee(4, "Stanley Hudson", "Sales", 55000)
+    }
+
+
+def test_select_with_parsed_conditions(column_employees: ColumnTable):
+    condition, _ = read_conditions("salary < 50000 or salary is null or id = 0", 0)
+    result = column_employees.select(condition)
+    assert {record.id for record in result.to_table()} == {0, 2, 5}
+
+
+def test_nulls_never_compare(column_employees: ColumnTable):
+    assert len(column_employees.select([BinaryCondition('salary', '0', '>=')])) == 5
+    assert len(column_employees.select([BinaryCondition('salary', 'null', '=')])) == 0
+
+
+def test_projection(column_employees: ColumnTable):
+    result = column_employees.projection({'id', 'name'}).select(('id', '<', '2'))
+    assert result.to_table() == {
+        Record(id=0, name='Michael Scott'),
+        Record(id=1, name='Dwight K. Schrute')
+    }
+    assert column_employees.projection({'id'}).columns['id'] is column_employees.columns['id']
+
+
+def test_nested_columns():
+    table = ColumnTable.from_records({
+        Record(left=Record(id=1), right=Record(employee_id=1)),
+        Record(left=Record(id=2)),
+    })
+    assert table.select(('right.employee_id', 'is', 'null')).to_table() == {Record(left=Record(id=2))}
+    assert table.select(('left.id', '=', '1')).to_table() == {Record(left=Record(id=1), right=Record(employee_id=1))}
+    assert table.projection({'left.id'}).to_table() == {Record(left=Record(id=1)), Record(left=Record(id=2))}
+
+
+def test_null_column_comparison():
+    table = ColumnTable.from_records([Record(id=1, salary=None), Record(id=2, salary=None)])
+    assert table.select([BinaryCondition('salary', '0', '>')]).to_table() == set()
+    assert table.select(('salary', 'is', 'null')).to_table() == {Record(id=1, salary=None), Record(id=2, salary=None)}
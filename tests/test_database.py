@@ -0,0 +1,174 @@
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from database import Database, DatabaseError, LOG_FILE
+from models import Table, Record
+from sql_compiler import execute_sql, compile_sql
+from write_ahead_log import WriteAheadLog, WriteAheadLogError
+
+
+def test_changes_are_recovered(tmp_path, employees: Table):
+    with Database(str(tmp_path)) as database:
+        database.create_table('employees', employees)
+        assert database.insert('employees', [Record(id=5, name='Ryan Howard', position='Temp', salary=25000)]) == 1
+        assert database.update('employees', lambda record: record.position == 'Sales', {'salary': 60000}) == 2
+        assert database.delete('employees', lambda record: record.id == 0) == 1
+
+        with database.snapshot() as tables:
+            expected = set(tables['employees'])
+        with pytest.raises(DatabaseError):
+            database.insert('missing', [])
+
+    with Database(str(tmp_path)) as database, database.snapshot() as tables:
+        assert set(tables['employees']) == expected
+        assert execute_sql('select id from employees where salary = 60000 order by id', tables) == [
+            Record(id=3), Record(id=4)
+        ]
+
+
+def test_checkpoint(tmp_path, tasks: Table):
+    with Database(str(tmp_path)) as database:
+        database.create_table('tasks', tasks)
+        database.update('tasks', lambda record: record.employee_id == 3, lambda record: Record(
+            id=record.id, employee_id=record.employee_id, completed=True
+        ))
+        database.checkpoint()
+        assert os.path.getsize(tmp_path / LOG_FILE) == 0
+
+        database.delete('tasks', lambda record: record.completed)
+
+    with Database(str(tmp_path)) as database:
+        with database.snapshot() as tables:
+            assert {record.id for record in tables['tasks']} == {0, 1}
+        database.insert('tasks', [Record(id=10, employee_id=0, completed=False)])
+
+    with Database(str(tmp_path)) as database, database.snapshot() as tables:
+        assert {record.id for record in tables['tasks']} == {0, 1, 10}
+
+
+def test_torn_log_entry_is_ignored(tmp_path):
+    with Database(str(tmp_path)) as database:
+        database.create_table('values', [Record(id=0)])
+        database.insert('values', [Record(id=1)])
+
+    with open(tmp_path / LOG_FILE, 'ab') as file:
+        file.write(b'\x40\x00\x00\x00\x00\x00')
+
+    with Database(str(tmp_path)) as database:
+        with database.snapshot() as tables:
+            assert tables['values'] == {Record(id=0), Record(id=1)}
+        database.insert('values', [Record(id=2)])
+
+    with Database(str(tmp_path)) as database, database.snapshot() as tables:
+        assert tables['values'] == {Record(id=0), Record(id=1), Record(id=2)}
+
+
+def test_group_commit(tmp_path):
+    with Database(str(tmp_path)) as database:
+        database.create_table('values')
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: database.insert('values', [Record(id=i)]), range(400)))
+
+        assert database.log.lsn == 401
+
+    with Database(str(tmp_path)) as database, database.snapshot() as tables:
+        assert len(tables['values']) == 400
+
+
+def fail_fsync(descriptor: int):
+    raise OSError('disk full')
+
+
+def test_failed_log_write(tmp_path, monkeypatch):
+    log = WriteAheadLog(str(tmp_path / LOG_FILE))
+    first, second = log.append('first'), log.append('second')
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'fsync', fail_fsync)
+        with pytest.raises(OSError):
+            log.wait(first)
+
+    # the second entry was in the failed batch, it must not be reported as durable by a later flush
+    with pytest.raises(WriteAheadLogError):
+        log.wait(second)
+    with pytest.raises(WriteAheadLogError):
+        log.append('third')
+    with pytest.raises(WriteAheadLogError):
+        log.close()
+
+
+def test_failed_commit_is_not_visible(tmp_path, monkeypatch):
+    database = Database(str(tmp_path), gc_interval=None)
+    database.create_table('values', [Record(id=0)])
+    with monkeypatch.context() as patch:
+        patch.setattr(os, 'fsync', fail_fsync)
+        with pytest.raises(OSError):
+            database.insert('values', [Record(id=1)])
+
+    with pytest.raises(WriteAheadLogError):
+        database.insert('values', [Record(id=2)])
+    with database.snapshot() as tables:
+        assert tables['values'] == {Record(id=0)}
+    with pytest.raises(WriteAheadLogError):
+        database.close()
+
+
+def test_snapshot_isolation(tmp_path):
+    with Database(str(tmp_path), gc_interval=None) as database:
+        database.create_table('values', [Record(id=0), Record(id=1)])
+        snapshot = database.snapshot()
+
+        database.delete('values', lambda record: record.id == 0)
+        database.insert('values', [Record(id=2)])
+        assert snapshot.tables['values'] == {Record(id=0), Record(id=1)}
+
+        assert database.collect_garbage() == 0
+        snapshot.close()
+        assert database.collect_garbage() == 1
+
+        with database.snapshot() as tables:
+            assert tables['values'] == {Record(id=1), Record(id=2)}
+
+
+def test_concurrent_transfers(tmp_path):
+    """
+    Writers move amounts between accounts while readers sum the balances, every snapshot has to see
+    the same total and number of accounts.
+    """
+    accounts = 50
+    with Database(str(tmp_path), gc_interval=0.001) as database:
+        database.create_table('accounts', [Record(id=i, balance=100) for i in range(accounts)])
+        plan = compile_sql('select count(*) as accounts, sum(balance) as total from accounts')
+        stopped = threading.Event()
+
+        def transfer(seed: int):
+            generator = random.Random(seed)
+            for _ in range(50):
+                source, target = generator.sample(range(accounts), 2)
+                amount = generator.randrange(10)
+                database.update('accounts', lambda record: record.id in (source, target), lambda record: Record(
+                    id=record.id, balance=record.balance + (amount if record.id == target else -amount)
+                ))
+
+        def read() -> int:
+            reads = 0
+            while not stopped.is_set() or reads == 0:
+                assert database.execute_query_plan(plan) == {Record(accounts=accounts, total=100 * accounts)}
+                reads += 1
+            return reads
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            readers = [executor.submit(read) for _ in range(4)]
+            writers = [executor.submit(transfer, seed) for seed in range(4)]
+            for writer in writers:
+                writer.result()
+            time.sleep(0.01)
+            stopped.set()
+            assert all(reader.result() > 0 for reader in readers)
+
+        database.collect_garbage()
+        assert database.collected_versions >= 4 * 50 * 2
@@ -1,4 +1,14 @@
-from database_engine import select, create_employee, projection, rename, inner_join, left_outer_join
+from itertools import islice
+
+import pytest
+
+import database_engine
+from database_engine import select, create_employee, projection, rename, inner_join, left_outer_join, hash_inner_join, \
+    hash_left_outer_join, iter_left_outer_join, iter_cross_join, iter_hash_inner_join, iter_sort, iter_top_n, \
+    semi_join, anti_join, hash_semi_join, hash_anti_join, iter_hash_aggregate, batch_select, iter_batches, \
+    flatten_batches, iter_batch_hash_inner_join, iter_batch_hash_left_outer_join, iter_merge_join, iter_range_join, \
+    iter_grace_hash_join, SpillStatistics, order_by
+from aggregation import Aggregate
 from models import Table, Record
 
 
@@ -130,3 +140,243 @@ def test_left_outer_join(employees: Table, tasks: Table):
             right=Record(id=2, employee_id=1, completed=True)
         )
     }
+
+
+def test_hash_inner_join(employees: Table, tasks: Table):
+    expected = inner_join(employees, tasks, lambda e, t: e.id == t.employee_id)
+    assert hash_inner_join(employees, tasks, ['id'], ['employee_id']) == expected
+    assert hash_inner_join(tasks, employees, ['employee_id'], ['id']) == inner_join(
+        tasks, employees, lambda t, e: t.employee_id == e.id
+    )
+
+
+def test_hash_left_outer_join(employees: Table, tasks: Table):
+    expected = left_outer_join(employees, tasks, lambda e, t: e.id == t.employee_id)
+    assert hash_left_outer_join(employees, tasks, ['id'], ['employee_id']) == expected
+
+    # build side is the right input when it is smaller
+    few_tasks = select(tasks, lambda t: t.id < 2)
+    assert hash_left_outer_join(employees, few_tasks, ['id'], ['employee_id']) == left_outer_join(
+        employees, few_tasks, lambda e, t: e.id == t.employee_id
+    )
+
+
+def test_hash_join_skips_null_keys(employees: Table):
+    tasks = {Record(id=0, employee_id=None), Record(id=1, employee_id=0)}
+    assert hash_inner_join(employees, tasks, ['id'], ['employee_id']) == {
+        Record(left=create_employee(0, "Michael Scott", "Regional Manager", 100000), right=Record(id=1, employee_id=0))
+    }
+    assert Record(left=Record(id=0, employee_id=None)) in hash_left_outer_join(tasks, employees, ['employee_id'], ['id'])
+
+
+def test_iter_left_outer_join(employees: Table, tasks: Table):
+    result = iter_left_outer_join(employees, tasks, lambda e, t: e.id == t.employee_id)
+    assert set(result) == left_outer_join(employees, tasks, lambda e, t: e.id == t.employee_id)
+
+
+def test_iter_cross_join_is_lazy(tasks: Table):
+    pulled = []
+
+    def left():
+        for i in range(1000):
+            pulled.append(i)
+            yield Record(id=i)
+
+    result = list(islice(iter_cross_join(left(), tasks), 15))
+    assert len(result) == 15
+    assert pulled == [0, 1]
+
+
+def test_iter_hash_inner_join_streams_probe_side(tasks: Table):
+    pulled = []
+
+    def left():
+        for i in range(1000):
+            pulled.append(i)
+            yield Record(id=i % 5)
+
+    first = next(iter_hash_inner_join(left(), tasks, ['id'], ['employee_id']))
+    assert first.left.id == first.right.employee_id == 0
+    assert pulled == [0]
+
+
+def test_iter_sort_spills_runs(employees: Table):
+    key = lambda record: (record.salary, record.id)
+    expected = sorted(employees, key=key, reverse=True)
+
+    assert list(iter_sort(employees, key, reverse=True, memory_limit=2)) == expected
+    assert list(iter_sort(employees, key, reverse=True)) == expected
+    assert list(iter_sort(iter([]), key, memory_limit=2)) == []
+
+
+def test_iter_sort_memory_limit(employees: Table, monkeypatch):
+    key = lambda record: record.id
+    spilled = []
+    spill_run = database_engine.spill_run
+    monkeypatch.setattr(database_engine, 'spill_run', lambda run: spilled.append(len(run)) or spill_run(run))
+
+    # an input of exactly the limit is sorted in memory
+    assert [record.id for record in iter_sort(employees, key, memory_limit=5)] == [0, 1, 2, 3, 4]
+    assert spilled == []
+
+    assert [record.id for record in iter_sort(employees, key, memory_limit=1)] == [0, 1, 2, 3, 4]
+    assert spilled == [1] * 5
+
+    with pytest.raises(ValueError):
+        iter_sort(employees, key, memory_limit=0)
+
+
+def test_iter_top_n(employees: Table):
+    result = iter_top_n(employees, 3, lambda record: (record.salary, record.id))
+    assert [record.id for record in result] == [2, 3, 4]
+
+    result = iter_top_n(employees, 1, lambda record: record.salary, reverse=True)
+    assert [record.id for record in result] == [0]
+
+
+def test_semi_and_anti_joins(employees: Table, tasks: Table):
+    employees = employees | {Record(id=None, name='Ryan Howard', position='Temp', salary=25000)}
+    matches = lambda employee, task: employee.id == task.employee_id
+
+    with_tasks = semi_join(employees, tasks, matches)
+    without_tasks = anti_join(employees, tasks, matches)
+
+    assert {record.id for record in with_tasks} == {0, 1, 2, 3}
+    assert {record.name for record in without_tasks} == {'Stanley Hudson', 'Ryan Howard'}
+    assert with_tasks | without_tasks == employees
+    assert hash_semi_join(employees, tasks, ['id'], ['employee_id']) == with_tasks
+    assert hash_anti_join(employees, tasks, ['id'], ['employee_id']) == without_tasks
+
+
+def test_iter_hash_aggregate_spills_groups(tasks: Table):
+    aggregates = {'tasks': Aggregate('count'), 'last_task': Aggregate('max', 'id')}
+    expected = {
+        Record(employee_id=0, tasks=2, last_task=1),
+        Record(employee_id=1, tasks=3, last_task=4),
+        Record(employee_id=2, tasks=1, last_task=5),
+        Record(employee_id=3, tasks=4, last_task=9),
+    }
+
+    assert set(iter_hash_aggregate(tasks, ['employee_id'], aggregates)) == expected
+    assert set(iter_hash_aggregate(sorted(tasks, key=lambda r: r.id), ['employee_id'], aggregates, memory_limit=1)) == expected
+    assert list(iter_hash_aggregate([], [], aggregates)) == [Record(tasks=0, last_task=None)]
+    assert list(iter_hash_aggregate([], ['employee_id'], aggregates)) == []
+
+
+def test_iter_grace_hash_join_spills_partitions(employees: Table, tasks: Table):
+    employees = employees | {Record(id=None, name='Ryan Howard', position='Temp', salary=25000)}
+    tasks = tasks | {Record(id=10, employee_id=None, completed=False)}
+
+    for left_outer, join in ((False, hash_inner_join), (True, hash_left_outer_join)):
+        statistics = SpillStatistics()
+        result = iter_grace_hash_join(
+            iter(employees), iter(tasks), ['id'], ['employee_id'], left_outer, memory_limit=2, statistics=statistics
+        )
+        assert set(result) == join(employees, tasks, ['id'], ['employee_id'])
+        assert statistics.bytes_spilled > 0 and statistics.partitions >= 32
+        # tasks of employees 1 and 3 don't fit and can't be split by another hash
+        assert statistics.chunked_partitions == 2
+
+    statistics = SpillStatistics()
+    assert set(iter_grace_hash_join(employees, tasks, ['id'], ['employee_id'], statistics=statistics)) == hash_inner_join(
+        employees, tasks, ['id'], ['employee_id']
+    )
+    assert statistics.partitions == statistics.bytes_spilled == 0
+
+
+def test_iter_grace_hash_join_repartitions(tasks: Table):
+    left = [Record(id=i, group=i % 200) for i in range(1000)]
+    right = [Record(group=i % 250, value=i) for i in range(2000)]
+    statistics = SpillStatistics()
+
+    result = iter_grace_hash_join(left, right, ['group'], ['group'], True, memory_limit=50, statistics=statistics)
+    assert set(result) == hash_left_outer_join(set(left), set(right), ['group'], ['group'])
+    assert statistics.depth == 2 and statistics.chunked_partitions == 0
+
+
+def test_batch_select(employees: Table):
+    assert batch_select(employees, lambda batch: [r for r in batch if r.salary > 56000], batch_size=2) == select(
+        employees, lambda r: r.salary > 56000
+    )
+
+
+def test_iter_batches(tasks: Table):
+    batches = list(iter_batches(tasks, 4))
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert set(flatten_batches(batches)) == tasks
+
+
+def test_batch_hash_joins(employees: Table, tasks: Table):
+    tasks = tasks | {Record(id=10, employee_id=None, completed=False)}
+    inner = iter_batch_hash_inner_join(iter_batches(employees, 2), tasks, ['id'], ['employee_id'])
+    assert set(flatten_batches(inner)) == hash_inner_join(employees, tasks, ['id'], ['employee_id'])
+
+    left = iter_batch_hash_left_outer_join(iter_batches(tasks, 3), employees, ['employee_id'], ['id'])
+    assert set(flatten_batches(left)) == hash_left_outer_join(tasks, employees, ['employee_id'], ['id'])
+
+    # empty batches of the input don't produce empty output batches
+    batches = [[], *iter_batches(tasks, 3), []]
+    assert all(iter_batch_hash_left_outer_join(iter(batches), employees, ['employee_id'], ['id']))
+    assert all(iter_batch_hash_inner_join(iter(batches), employees, ['employee_id'], ['id']))
+
+
+def test_merge_join(employees: Table, tasks: Table):
+    tasks = tasks | {Record(id=10, employee_id=None, completed=False), Record(id=11, employee_id=7, completed=True)}
+    left = sorted(employees, key=lambda record: record.id)
+    right = sorted(tasks, key=lambda record: (record.employee_id is None, record.employee_id or 0))
+
+    assert set(iter_merge_join(left, right, ['id'], ['employee_id'])) == hash_inner_join(
+        employees, tasks, ['id'], ['employee_id']
+    )
+    assert set(iter_merge_join(left, right, ['id'], ['employee_id'], left_outer=True)) == hash_left_outer_join(
+        employees, tasks, ['id'], ['employee_id']
+    )
+    # output follows the order of the left input
+    assert [record['left.id'] for record in iter_merge_join(left, right, ['id'], ['employee_id'])] == \
+        [0, 0, 1, 1, 1, 2, 3, 3, 3, 3]
+
+
+def test_range_join(employees: Table):
+    ranges = [
+        Record(id=0, low=40000, high=55000),
+        Record(id=1, low=None, high=70000),
+        Record(id=2, low=50000, high=100000),
+        Record(id=3, low=55000, high=60000),
+        Record(id=4, low=60000, high=40000),
+        Record(id=5, low=120000, high=130000),
+    ]
+    salaries = sorted(employees, key=lambda record: record.salary)
+
+    def between(low: bool, high: bool):
+        def condition(left: Record, right: Record) -> bool:
+            return (
+                left.low is not None and (right.salary >= left.low if low else right.salary > left.low)
+                and left.high is not None and (right.salary <= left.high if high else right.salary < left.high)
+            )
+        return condition
+
+    for low, high in [(True, True), (False, True), (True, False), (False, False)]:
+        result = set(iter_range_join(ranges, salaries, 'salary', ('low', low), ('high', high)))
+        assert result == inner_join(set(ranges), employees, between(low, high)), (low, high)
+
+    above = set(iter_range_join(ranges, salaries, 'salary', ('low', False), None))
+    assert above == inner_join(set(ranges), employees, lambda l, r: l.low is not None and r.salary > l.low)
+    below = set(iter_range_join(ranges, salaries, 'salary', None, ('high', True)))
+    assert below == inner_join(set(ranges), employees, lambda l, r: r.salary <= l.high)
+
+    def is_sales(left: Record, right: Record) -> bool:
+        return right.position == 'Sales'
+
+    outer = set(iter_range_join(ranges, salaries, 'salary', ('low', True), ('high', True), is_sales, left_outer=True))
+    assert outer == left_outer_join(
+        set(ranges), employees, lambda l, r: between(True, True)(l, r) and is_sales(l, r)
+    )
+
+
+def test_order_by_with_limit(employees: Table):
+    def compare(left: Record, right: Record) -> int:
+        return right.salary - left.salary or left.id - right.id
+
+    assert [record.id for record in order_by(employees, compare)] == [0, 1, 3, 4, 2]
+    assert [record.id for record in order_by(employees, compare, limit=3)] == [0, 1, 3]
+    assert order_by(employees, compare, limit=0) == []
@@ -0,0 +1,124 @@
+import pytest
+
+from indexes import IndexedTable, HashIndex, SortedIndex
+from models import Table, Record
+from sql_compiler import execute_sql
+
+
+class UnscannableTable(IndexedTable):
+    """
+    Indexed table which fails when it is read in full, so tests can check that an index was used.
+    """
+
+    def __init__(self, records: Table):
+        super().__init__(records)
+        self.scannable = True
+
+    def __iter__(self):
+        if not self.scannable:
+            raise AssertionError('Table was scanned')
+        return super().__iter__()
+
+
+@pytest.fixture
+def indexed_tasks(tasks: Table) -> UnscannableTable:
+    table = UnscannableTable(tasks)
+    table.create_hash_index('employee_id')
+    table.create_sorted_index('id')
+    table.scannable = False
+    return table
+
+
+def test_hash_index(tasks: Table):
+    index = HashIndex('employee_id', tasks | {Record(id=10, employee_id=None, completed=False)})
+    assert {record.id for record in index.lookup(3)} == {6, 7, 8, 9}
+    assert index.lookup(None) == ()
+    assert index.lookup(5) == ()
+
+
+def test_sorted_index(employees: Table):
+    index = SortedIndex('salary', employees | {Record(id=5, name='Toby Flenderson', position='HR', salary=None)})
+    assert [record.id for record in index.range(55000, 65000)] in ([3, 4, 1], [4, 3, 1])
+    assert [record.id for record in index.range(low=55000, include_low=False)] == [1, 0]
+    assert [record.id for record in index.range(high=55000, include_high=False)] == [2]
+    assert [record.id for record in index.scan()][-1] == 5
+    assert [record.id for record in index.scan(ascending=False)][:2] == [5, 0]
+    assert len(index) == 6
+
+
+def test_indexes_are_maintained(employees: Table):
+    table = IndexedTable(employees)
+    hash_index = table.create_hash_index('position')
+    sorted_index = table.create_sorted_index('salary')
+
+    removed = next(record for record in employees if record.id == 3)
+    added = Record(id=5, name='Ryan Howard', position='Sales', salary=25000)
+    table.add(added)
+    table.add(added)
+    table.remove(removed)
+    table -= {next(record for record in employees if record.id == 0)}
+
+    assert {record.id for record in hash_index.lookup('Sales')} == {4, 5}
+    assert [record.id for record in sorted_index.scan()] == [5, 2, 4, 1]
+    assert table.get_hash_index('salary') is sorted_index
+
+    table.clear()
+    assert len(table) == 0
+    assert hash_index.lookup('Sales') == ()
+    assert len(sorted_index) == 0
+
+
+def test_indexes_are_maintained_by_set_operators(employees: Table):
+    table = IndexedTable(employees)
+    hash_index = table.create_hash_index('position')
+    sorted_index = table.create_sorted_index('salary')
+    sales = {record for record in employees if record.position == 'Sales'}
+    added = Record(id=5, name='Ryan Howard', position='Sales', salary=25000)
+
+    table &= sales | {added}
+    assert {record.id for record in table} == {3, 4}
+    assert {record.id for record in sorted_index.scan()} == {3, 4}
+
+    table ^= {next(record for record in sales if record.id == 3), added}
+    assert {record.id for record in hash_index.lookup('Sales')} == {4, 5}
+    assert [record.id for record in sorted_index.scan()] == [5, 4]
+
+    table.symmetric_difference_update([added, added])
+    table.intersection_update(employees, sales)
+    assert {record.id for record in hash_index.lookup('Sales')} == {4}
+    assert execute_sql('select id from employees where salary > 0', {'employees': table}) == [Record(id=4)]
+
+
+def test_index_scan(indexed_tasks: UnscannableTable):
+    tables = {'tasks': indexed_tasks}
+    assert {record.id for record in execute_sql('select id from tasks where employee_id = 3', tables)} == {6, 7, 8, 9}
+    assert execute_sql('select id from tasks where employee_id = 3 and id < 8 order by id', tables) == [
+        Record(id=6), Record(id=7)
+    ]
+    assert execute_sql('select id, completed from tasks where 7 <= id', tables) == [
+        Record(id=7, completed=False), Record(id=8, completed=True), Record(id=9, completed=False)
+    ]
+
+
+def test_sort_reads_sorted_index(indexed_tasks: UnscannableTable):
+    result = execute_sql('select id from tasks order by id desc', {'tasks': indexed_tasks})
+    assert result == [Record(id=task_id) for task_id in range(9, -1, -1)]
+
+
+def test_index_nested_loop_join(employees: Table, tasks: Table, indexed_tasks: UnscannableTable):
+    sql = (
+        'select employees.id, tasks.id from employees '
+        'left outer join tasks on employees.id = tasks.employee_id'
+    )
+    result = execute_sql(sql, {'employees': employees, 'tasks': indexed_tasks})
+    assert set(result) == set(execute_sql(sql, {'employees': employees, 'tasks': tasks}))
+    assert len(result) == 11
+
+    result = execute_sql(
+        'select employees.id, tasks.id from employees join tasks on tasks.id > employees.salary',
+        {'employees': {Record(id=0, salary=7), Record(id=1, salary=None)}, 'tasks': indexed_tasks}
+    )
+    assert set(result) == {
+        Record(employees=Record(id=0), tasks=Record(id=8)),
+        Record(employees=Record(id=0), tasks=Record(id=9))
+    }
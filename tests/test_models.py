@@ -0,0 +1,56 @@
+import pickle
+
+from models import Record, Schema
+
+
+def test_records_share_schema():
+    first = Record(id=1, name='Michael Scott')
+    second = Record(name='Dwight K. Schrute', id=2)
+    assert first.schema is second.schema
+    assert first.schema.columns == ('id', 'name')
+
+
+def test_record_equality_ignores_column_order_and_aliases():
+    record = Record(id=1, name='Michael Scott')
+    assert record == Record(name='Michael Scott', id=1)
+    assert record == Record(id=1, name='Michael Scott', aliases={'id': 'employee_id'})
+    assert hash(record) == hash(Record(name='Michael Scott', id=1))
+    assert record == {'id': 1, 'name': 'Michael Scott'}
+    assert record != Record(id=1)
+
+
+def test_record_access():
+    record = Record(left=Record(id=1, name='Michael Scott'), aliases={'left.name': 'name'})
+    assert record.left == Record(id=1, name='Michael Scott')
+    assert record['left.id'] == 1
+    assert record['name'] == 'Michael Scott'
+    assert record.name == 'Michael Scott'
+    assert record['right.id'] is None
+    assert record.columns() == {'left.id', 'left.name'}
+
+
+def test_record_projection():
+    record = Record(left=Record(id=1, name='Michael Scott'), right=Record(id=7), aliases={'right.id': 'task_id'})
+    assert record.projection({'left.id', 'task_id'}) == Record(left=Record(id=1), task_id=7)
+    assert record.projection({'left'}) == Record(left=Record(id=1, name='Michael Scott'))
+
+
+def test_record_pickle():
+    record = Record(left=Record(id=1), right=Record(id=2), aliases={'left.id': 'id'})
+    restored = pickle.loads(pickle.dumps(record))
+    assert restored == record
+    assert restored.schema is record.schema
+    assert restored.id == 1
+
+
+def test_schema_resolve():
+    schema = Schema.of(['left', 'right'], aliases={'left.id': 'employee_id'})
+    assert schema.resolve('employee_id') == (0, 'id')
+    assert schema.resolve('right.name') == (1, 'name')
+    assert schema.resolve('missing') == (None, None)
+
+
+def test_alias_shadows_column():
+    record = Record(left=1, right=2, aliases={'left': 'right', 'right': 'left'})
+    assert record['left'] == 2
+    assert record.right == 1
@@ -0,0 +1,53 @@
+from models import Table, Record
+from predicate_compiler import compile_predicate, compile_join_predicate, compile_parsed_condition, compile_batch_filter
+from query_plan_builder import ComparisonCondition, LogicalCondition, ConstantCondition, BinaryCondition, Column
+from sql_parser import read_conditions
+
+
+def test_compiled_predicate_matches_interpreted_condition(employees: Table):
+    records = employees | {Record(id=5, name='Toby Flenderson', position=None, salary=None)}
+    conditions = [
+        ComparisonCondition(Column('salary'), 55000, '>='),
+        ComparisonCondition(60000, Column('salary'), '>'),
+        ComparisonCondition(Column('salary'), None, '='),
+        ComparisonCondition(Column('position'), None, 'is'),
+        ComparisonCondition(Column('id'), Column('salary'), '<>'),
+        LogicalCondition(
+            'or',
+            LogicalCondition('and', ComparisonCondition(Column('position'), 'Sales', '='), ConstantCondition(True)),
+            ComparisonCondition(Column('name'), 'Toby Flenderson', '=')
+        ),
+    ]
+
+    for condition in conditions:
+        interpreted = condition.get_executable_condition()
+        compiled = compile_predicate(condition)
+        assert {record for record in records if compiled(record)} == {
+            record for record in records if interpreted(record)
+        }, condition
+
+
+def test_compile_join_predicate(employees: Table, tasks: Table):
+    conditions = [BinaryCondition('id', 'employee_id', '='), BinaryCondition('id', 'id', '<')]
+    compiled = compile_join_predicate(conditions)
+
+    pairs = {(employee.id, task.id) for employee in employees for task in tasks if compiled(employee, task)}
+    assert pairs == {(0, 1), (1, 2), (1, 3), (1, 4), (2, 5), (3, 6), (3, 7), (3, 8), (3, 9)}
+    assert not compiled(Record(id=None), Record(id=None, employee_id=None))
+    assert compile_join_predicate([]) is None
+
+
+def test_compile_parsed_condition(employees: Table):
+    condition, _ = read_conditions("salary < 50000 or position = 'Sales' and id >= 4", 0)
+    predicate = compile_parsed_condition(condition)
+    assert {record.id for record in employees if predicate(record)} == {2, 4}
+
+
+def test_compile_batch_filter(employees: Table):
+    condition = LogicalCondition(
+        'or', ComparisonCondition(Column('salary'), 60000, '>'), ComparisonCondition(Column('position'), 'Sales', '=')
+    )
+    batch_filter = compile_batch_filter(condition)
+    batch = sorted(employees, key=lambda record: record.id)
+    assert [record.id for record in batch_filter(batch)] == [0, 1, 3, 4]
+    assert batch_filter([]) == []
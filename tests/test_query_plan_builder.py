@@ -1,4 +1,5 @@
-from query_plan_builder import QueryPlanBuilder, JoinType, BinaryCondition, JoinNode, ScanNode, Node, QueryPlan
+from query_plan_builder import QueryPlanBuilder, JoinType, BinaryCondition, JoinNode, ScanNode, Node, QueryPlan, \
+    FilterNode, ComparisonCondition, Column, SortNode, SortKey, ProjectionNode, LogicalCondition
 
 
 def test_query_plan_builder():
@@ -18,3 +19,48 @@ def test_query_plan_builder():
             [BinaryCondition('id', 'employee_id', '='), BinaryCondition('id', 'task_id', '=')]
         )
     )
+
+
+def test_query_plan_builder_filter_sort_projection():
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .filter(ComparisonCondition(Column('salary'), 10000, '>'))
+            .sort([SortKey('salary', ascending=False)])
+            .projection({'employee_id': 'id'})
+            .build()
+    )
+    assert plan == QueryPlan(
+        ProjectionNode(
+            SortNode(
+                FilterNode(ScanNode('employees'), ComparisonCondition(Column('salary'), 10000, '>')),
+                [SortKey('salary', ascending=False)]
+            ),
+            {'employee_id': 'id'}
+        )
+    )
+    assert repr(plan) == (
+        'QueryPlan(node=Projection(node=Sort(node=Filter(node=Scan(table="employees"), condition="salary > 10000"), '
+        'keys="salary DESC"), columns="id AS employee_id"))'
+    )
+
+
+def test_query_plan_builder_rewrites_anti_join():
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.LEFT_OUTER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .filter(LogicalCondition(
+                'and',
+                ComparisonCondition(Column('left.salary'), 50000, '>'),
+                ComparisonCondition(Column('right.employee_id'), None, 'is')
+            ))
+            .build()
+    )
+    assert plan == QueryPlan(
+        FilterNode(
+            JoinNode(JoinType.ANTI_JOIN, ScanNode('employees'), ScanNode('tasks'), [BinaryCondition('id', 'employee_id', '=')]),
+            ComparisonCondition(Column('left.salary'), 50000, '>')
+        )
+    )
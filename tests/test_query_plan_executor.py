@@ -1,8 +1,12 @@
 import pytest
 
+from database_engine import iter_merge_join
+from indexes import IndexedTable
 from models import Table, Record
-from query_plan_builder import QueryPlanBuilder, JoinType, BinaryCondition
-from query_plan_executor import execute_query_plan
+from query_plan_builder import QueryPlanBuilder, JoinType, BinaryCondition, SortKey, ComparisonCondition, Column, \
+    LogicalCondition
+from query_plan_executor import execute_query_plan, iterate_query_plan, get_sort_key, ParallelOptions, get_range_join, \
+    get_max_rows
 from tests.utils import create_employee, create_task
 
 
@@ -83,4 +87,323 @@ def test_query_plan_executor(tables: dict[str, Table]):
             left=Record({'salary': 55000, 'id': 3, 'position': 'Sales', 'name': 'James Halpert'}),
             right=Record({'employee_id': 3, 'id': 7, 'completed': False})
         )
-    }
\ No newline at end of file
+    }
+
+
+def test_query_plan_executor_left_outer_join(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.LEFT_OUTER_JOIN,
+                  [BinaryCondition('id', 'employee_id', '=')])
+            .build()
+    )
+
+    result = execute_query_plan(plan, tables)
+    assert len(result) == 11
+    assert Record(left=create_employee(4, "Stanley Hudson", "Sales", 55000)) in result
+
+
+def test_query_plan_executor_non_equi_join(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.INNER_JOIN,
+                  [BinaryCondition('id', 'employee_id', '>')])
+            .build()
+    )
+
+    result = execute_query_plan(plan, tables)
+    assert all(record['left.id'] > record['right.employee_id'] for record in result)
+    assert len(result) == 10 + 6 + 5 + 2
+
+
+def test_iterate_query_plan(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.LEFT_OUTER_JOIN,
+                  [BinaryCondition('id', 'employee_id', '=')])
+            .build()
+    )
+
+    assert set(iterate_query_plan(plan, tables)) == execute_query_plan(plan, tables)
+    assert len(list(iterate_query_plan(plan, tables, limit=3))) == 3
+
+
+def test_get_sort_key():
+    records = [Record(a=a, b=b) for a, b in [(1, 'x'), (None, 'y'), (2, None), (1, 'z'), (None, None)]]
+
+    key, reverse = get_sort_key([SortKey('a', ascending=False), SortKey('b')])
+    assert sorted(records, key=key, reverse=reverse) == [
+        Record(a=None, b='y'), Record(a=None, b=None), Record(a=2, b=None), Record(a=1, b='x'), Record(a=1, b='z')
+    ]
+
+    key, reverse = get_sort_key([SortKey('a', nulls_first=True), SortKey('b', ascending=False, nulls_first=False)])
+    assert sorted(records, key=key, reverse=reverse) == [
+        Record(a=None, b='y'), Record(a=None, b=None), Record(a=1, b='z'), Record(a=1, b='x'), Record(a=2, b=None)
+    ]
+
+
+def test_iterate_query_plan_top_n(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .sort([SortKey('salary', ascending=False)])
+            .projection({'name': 'name'})
+            .build()
+    )
+
+    assert list(iterate_query_plan(plan, tables, limit=2)) == [
+        Record(name='Michael Scott'), Record(name='Dwight K. Schrute')
+    ]
+
+
+def test_execute_semi_and_anti_joins(tables: dict[str, Table]):
+    def plan(join_type: JoinType, operator: str):
+        return (
+            QueryPlanBuilder()
+                .scan('employees')
+                .scan('tasks')
+                .join(join_type, [BinaryCondition('id', 'employee_id', operator)])
+                .build()
+        )
+
+    assert {record['left.id'] for record in execute_query_plan(plan(JoinType.SEMI_JOIN, '='), tables)} == {0, 1, 2, 3}
+    assert {record['left.id'] for record in execute_query_plan(plan(JoinType.ANTI_JOIN, '='), tables)} == {4}
+    assert {record['left.id'] for record in execute_query_plan(plan(JoinType.ANTI_JOIN, '<='), tables)} == {4}
+    assert {record['left.id'] for record in execute_query_plan(plan(JoinType.SEMI_JOIN, '>'), tables)} == {1, 2, 3, 4}
+    assert all(record['right.id'] is None for record in execute_query_plan(plan(JoinType.SEMI_JOIN, '='), tables))
+
+
+def test_execute_query_plan_in_parallel(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.LEFT_OUTER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .filter(ComparisonCondition(Column('right.completed'), False, '='))
+            .scan('employees')
+            .join(JoinType.SEMI_JOIN, [BinaryCondition('right.employee_id', 'id', '=')])
+            .filter(ComparisonCondition(Column('left.left.salary'), 60000, '>'))
+            .build()
+    )
+    serial = execute_query_plan(plan, tables)
+
+    assert execute_query_plan(plan, tables, parallel=ParallelOptions(workers=2, partitions=3, min_rows=0)) == serial
+    assert execute_query_plan(plan, tables, parallel=ParallelOptions(workers=2)) == serial
+    assert len(serial) == 2
+
+    with pytest.raises(ValueError):
+        execute_query_plan(plan, tables, parallel=ParallelOptions(workers=2), batch_size=16)
+
+
+def test_execute_query_plan_in_batches(tables: dict[str, Table]):
+    plans = [
+        QueryPlanBuilder()
+            .scan('employees')
+            .filter(LogicalCondition(
+                'or', ComparisonCondition(Column('salary'), 60000, '>'), ComparisonCondition(Column('id'), 3, '=')
+            ))
+            .projection({'name': 'name', 'pay': 'salary'})
+            .build(),
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .filter(ComparisonCondition(Column('right.completed'), True, '='))
+            .build(),
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .filter(ComparisonCondition(Column('completed'), False, '='))
+            .join(JoinType.LEFT_OUTER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .sort([SortKey('left.id'), SortKey('right.id')])
+            .build(),
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('id', 'employee_id', '<')])
+            .scan('tasks')
+            .join(JoinType.ANTI_JOIN, [BinaryCondition('right.id', 'id', '=')])
+            .build(),
+    ]
+
+    for plan in plans:
+        expected = execute_query_plan(plan, tables)
+        assert execute_query_plan(plan, tables, batch_size=2) == expected
+        assert execute_query_plan(plan, tables, batch_size=4096) == expected
+
+    # sorted output keeps its order
+    assert list(iterate_query_plan(plans[2], tables, batch_size=3)) == list(iterate_query_plan(plans[2], tables))
+
+
+def test_get_range_join():
+    conditions = [
+        BinaryCondition('low', 'salary', '<='),
+        BinaryCondition('id', 'id', '='),
+        BinaryCondition('high', 'salary', '>'),
+        BinaryCondition('other', 'salary', '<'),
+    ]
+    assert get_range_join(conditions) == ('salary', ('low', True), ('high', False), [conditions[1], conditions[3]])
+    assert get_range_join([BinaryCondition('id', 'employee_id', '=')]) is None
+
+
+def test_execute_range_join(tables: dict[str, Table]):
+    def plan(join_type: JoinType, conditions: list[BinaryCondition]):
+        return (
+            QueryPlanBuilder()
+                .scan('employees')
+                .scan('employees')
+                .join(join_type, conditions)
+                .projection({'id': 'left.id', 'other': 'right.id'})
+                .build()
+        )
+
+    cheaper = execute_query_plan(plan(JoinType.INNER_JOIN, [BinaryCondition('salary', 'salary', '>')]), tables)
+    assert {(record.id, record.other) for record in cheaper} == {
+        (0, 1), (0, 2), (0, 3), (0, 4), (1, 2), (1, 3), (1, 4), (3, 2), (4, 2)
+    }
+
+    conditions = [
+        BinaryCondition('salary', 'salary', '<='),
+        BinaryCondition('id', 'id', '<'),
+        BinaryCondition('salary', 'salary', '>='),
+    ]
+    same_salary = execute_query_plan(plan(JoinType.LEFT_OUTER_JOIN, conditions), tables)
+    assert {(record.id, record.other) for record in same_salary} == {
+        (0, None), (1, None), (2, None), (3, 4), (4, None)
+    }
+
+
+def test_execute_merge_join_of_sorted_inputs(tables: dict[str, Table], monkeypatch):
+    merged = []
+    monkeypatch.setattr(
+        'query_plan_executor.iter_merge_join', lambda *arguments: merged.append(arguments) or iter_merge_join(*arguments)
+    )
+
+    def plan(join_type: JoinType, right_key: str):
+        return (
+            QueryPlanBuilder()
+                .scan('employees')
+                .sort([SortKey('id')])
+                .scan('tasks')
+                .sort([SortKey(right_key)])
+                .join(join_type, [BinaryCondition('id', 'employee_id', '=')])
+                .build()
+        )
+
+    expected = execute_query_plan(plan(JoinType.LEFT_OUTER_JOIN, 'id'), tables)
+    assert len(merged) == 0
+    assert execute_query_plan(plan(JoinType.LEFT_OUTER_JOIN, 'employee_id'), tables) == expected
+    assert execute_query_plan(plan(JoinType.INNER_JOIN, 'employee_id'), tables) == {
+        record for record in expected if record['right.id'] is not None
+    }
+    assert len(merged) == 2
+
+    # the left input is read from a sorted index
+    indexed = {'employees': IndexedTable(tables['employees']), 'tasks': tables['tasks']}
+    indexed['employees'].create_sorted_index('id')
+    join = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .sort([SortKey('employee_id')])
+            .join(JoinType.LEFT_OUTER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .build()
+    )
+    assert execute_query_plan(join, indexed) == expected
+    assert len(merged) == 3
+
+
+def test_execute_join_spilling_to_disk(tables: dict[str, Table], monkeypatch):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.LEFT_OUTER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .scan('employees')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('right.employee_id', 'id', '=')])
+            .build()
+    )
+    expected = execute_query_plan(plan, tables)
+
+    monkeypatch.setattr('database_engine.JOIN_MEMORY_LIMIT', 2)
+    assert execute_query_plan(plan, tables) == expected
+    assert execute_query_plan(plan, tables, batch_size=2) == expected
+
+
+class PulledTable(set):
+    """
+    Table counting the records pulled from it.
+    """
+
+    def __init__(self, records):
+        super().__init__(records)
+        self.pulled = 0
+
+    def __iter__(self):
+        for record in super().__iter__():
+            self.pulled += 1
+            yield record
+
+
+def test_limit_stops_scans_and_joins(tables: dict[str, Table]):
+    tasks = PulledTable(tables['tasks'])
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .filter(ComparisonCondition(Column('right.completed'), True, '='))
+            .limit(2, 1)
+            .build()
+    )
+    full = execute_query_plan(QueryPlanBuilder().scan('employees').scan('tasks').join(
+        JoinType.INNER_JOIN, [BinaryCondition('id', 'employee_id', '=')]
+    ).filter(ComparisonCondition(Column('right.completed'), True, '=')).build(), tables)
+
+    result = list(iterate_query_plan(plan, {'employees': tables['employees'], 'tasks': tasks}))
+    assert len(result) == 2 and set(result) <= full
+    # the smaller employees are the build side, tasks are probed until 3 completed ones are joined
+    assert tasks.pulled < len(tasks)
+
+    tasks.pulled = 0
+    assert len(list(iterate_query_plan(plan, {'employees': tables['employees'], 'tasks': tasks}, batch_size=2))) == 2
+    assert tasks.pulled < len(tasks)
+
+
+def test_limit_stops_join_with_filtered_build_side(tables: dict[str, Table]):
+    tasks = PulledTable(tables['tasks'])
+    employees = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .filter(ComparisonCondition(Column('salary'), 0, '>'))
+    )
+    plan = employees.scan('tasks').join(JoinType.INNER_JOIN, [BinaryCondition('id', 'employee_id', '=')]).limit(1).build()
+
+    assert get_max_rows(plan.node, tables) == 1
+    assert get_max_rows(plan.node.node.left, tables) == len(tables['employees'])
+    assert get_max_rows(plan.node.node, tables) is None
+    assert len(list(iterate_query_plan(plan, {'employees': tables['employees'], 'tasks': tasks}))) == 1
+    # the filtered employees are bounded by the size of their table, so they're the build side
+    assert tasks.pulled < len(tasks)
+
+
+def test_limit_over_sort_keeps_top_n(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('tasks')
+            .sort([SortKey('id', ascending=False)])
+            .limit(3, 2)
+            .build()
+    )
+
+    assert [record.id for record in iterate_query_plan(plan, tables)] == [7, 6, 5]
+    assert [record.id for record in iterate_query_plan(plan, tables, limit=1)] == [7]
+    assert execute_query_plan(plan, tables, parallel=ParallelOptions(workers=2, min_rows=0)) == {
+        record for record in tables['tasks'] if record.id in (5, 6, 7)
+    }
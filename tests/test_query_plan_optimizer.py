@@ -0,0 +1,232 @@
+import pytest
+
+from models import Table, Record
+from query_plan_builder import QueryPlan, QueryPlanBuilder, JoinType, JoinNode, FilterNode, ProjectionNode, ScanNode, \
+    BinaryCondition, ComparisonCondition, LogicalCondition, ConstantCondition, Column, SortKey
+from query_plan_executor import execute_query_plan
+from query_plan_optimizer import optimize, explain, fold_condition, reorder_joins
+from sql_compiler import compile_select
+from sql_parser import parse_sql
+from table_statistics import StatisticsCatalog
+
+
+@pytest.fixture
+def tables(employees: Table, tasks: Table) -> dict[str, Table]:
+    return {'employees': employees, 'tasks': tasks}
+
+
+def test_fold_condition():
+    salary = ComparisonCondition(Column('salary'), 50000, '>')
+    assert fold_condition(ComparisonCondition(1, 2, '<')) == ConstantCondition(True)
+    assert fold_condition(LogicalCondition('and', ComparisonCondition(1, 1, '='), salary)) == salary
+    assert fold_condition(LogicalCondition('and', ComparisonCondition(1, 2, '='), salary)) == ConstantCondition(False)
+    assert fold_condition(LogicalCondition('or', salary, ComparisonCondition('a', 'a', '='))) == ConstantCondition(True)
+
+
+def test_filter_always_true_is_removed():
+    plan = QueryPlanBuilder().scan('employees').filter(ComparisonCondition(1, 1, '=')).build()
+    assert optimize(plan) == QueryPlan(ScanNode('employees'))
+
+
+def test_predicate_pushdown(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.CARTESIAN_JOIN, [])
+            .filter(LogicalCondition(
+                'and',
+                ComparisonCondition(Column('left.id'), Column('right.employee_id'), '='),
+                LogicalCondition(
+                    'and',
+                    ComparisonCondition(Column('left.salary'), 50000, '>'),
+                    ComparisonCondition(Column('right.completed'), True, '=')
+                )
+            ))
+            .build()
+    )
+
+    optimized = optimize(plan)
+    assert optimized == QueryPlan(
+        JoinNode(
+            JoinType.INNER_JOIN,
+            FilterNode(ScanNode('employees'), ComparisonCondition(Column('salary'), 50000, '>')),
+            FilterNode(ScanNode('tasks'), ComparisonCondition(Column('completed'), True, '=')),
+            [BinaryCondition('id', 'employee_id', '=')]
+        )
+    )
+    assert execute_query_plan(optimized, tables) == execute_query_plan(plan, tables)
+
+
+def test_right_predicate_stays_above_left_outer_join(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.LEFT_OUTER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .filter(LogicalCondition(
+                'and',
+                ComparisonCondition(Column('right.completed'), None, 'is'),
+                ComparisonCondition(Column('left.salary'), 50000, '>'),
+            ))
+            .build()
+    )
+
+    optimized = optimize(plan)
+    assert optimized == QueryPlan(
+        FilterNode(
+            JoinNode(
+                JoinType.LEFT_OUTER_JOIN,
+                FilterNode(ScanNode('employees'), ComparisonCondition(Column('salary'), 50000, '>')),
+                ScanNode('tasks'),
+                [BinaryCondition('id', 'employee_id', '=')]
+            ),
+            ComparisonCondition(Column('right.completed'), None, 'is')
+        )
+    )
+    assert execute_query_plan(optimized, tables) == execute_query_plan(plan, tables)
+
+
+def test_projection_pruning(tables: dict[str, Table]):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('id', 'employee_id', '=')])
+            .filter(ComparisonCondition(Column('right.completed'), False, '='))
+            .projection({'name': 'left.name'})
+            .build()
+    )
+
+    optimized = optimize(plan)
+    assert optimized == QueryPlan(
+        ProjectionNode(
+            JoinNode(
+                JoinType.INNER_JOIN,
+                ProjectionNode(ScanNode('employees'), {'id': 'id', 'name': 'name'}),
+                FilterNode(
+                    ProjectionNode(ScanNode('tasks'), {'completed': 'completed', 'employee_id': 'employee_id'}),
+                    ComparisonCondition(Column('completed'), False, '=')
+                ),
+                [BinaryCondition('id', 'employee_id', '=')]
+            ),
+            {'name': 'left.name'}
+        )
+    )
+    assert execute_query_plan(optimized, tables) == execute_query_plan(plan, tables)
+
+
+@pytest.mark.parametrize('sql', [
+    'select id, name from employees',
+    'select id from employees where salary > 50000 order by salary limit 2',
+    'select employees.name, tasks.id from employees join tasks on employees.id = tasks.employee_id '
+    'where tasks.completed = true',
+    'select position, count(*) from employees group by position',
+])
+def test_optimize_is_idempotent(sql: str):
+    optimized = optimize(compile_select(parse_sql(sql)[0]))
+    assert optimize(optimized) == optimized
+
+
+def test_projection_of_scan_is_not_wrapped():
+    plan = QueryPlanBuilder().scan('employees').projection({'name': 'name'}).build()
+    assert optimize(plan) == plan
+
+
+def test_explain():
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .filter(LogicalCondition('and', ComparisonCondition(2, 1, '>'), ComparisonCondition(Column('id'), 1, '=')))
+            .projection({'id': 'id'})
+            .build()
+    )
+
+    assert explain(plan) == '\n'.join([
+        'Original plan:',
+        'Projection(columns="id")',
+        '  Filter(condition="(2 > 1 AND id = 1)")',
+        '    Scan(table="employees")',
+        '',
+        'Optimized plan:',
+        'Projection(columns="id")',
+        '  Filter(condition="id = 1")',
+        '    Projection(columns="id")',
+        '      Scan(table="employees")',
+    ])
+
+
+def test_limit_pushdown():
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .sort([SortKey('salary')])
+            .projection({'name': 'name'})
+            .limit(10, 20)
+            .limit(5)
+            .build()
+    )
+
+    assert explain(plan).split('Optimized plan:\n')[1] == '\n'.join([
+        'Limit(limit=5)',
+        '  Limit(limit=5, offset=20)',
+        '    Projection(columns="name")',
+        '      Sort(keys="salary ASC", limit=25)',
+        '        Projection(columns="name, salary")',
+        '          Scan(table="employees")',
+    ])
+
+
+@pytest.fixture
+def reporting_tables() -> dict[str, Table]:
+    return {
+        'departments': {Record(id=i, region_id=i % 2) for i in range(4)},
+        'regions': {Record(id=i) for i in range(2)},
+        'employees': {Record(id=i, department_id=i % 4) for i in range(200)},
+        'tasks': {Record(id=i, employee_id=i % 200) for i in range(400)},
+    }
+
+
+def test_reorder_joins(reporting_tables: dict[str, Table]):
+    # tasks x employees is joined first, the equality between them is only known above the cartesian join
+    plan = (
+        QueryPlanBuilder()
+            .scan('tasks')
+            .scan('departments')
+            .join(JoinType.CARTESIAN_JOIN, [])
+            .scan('employees')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('left.employee_id', 'id', '='), BinaryCondition('right.id', 'department_id', '=')])
+            .scan('regions')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('left.right.region_id', 'id', '=')])
+            .build()
+    )
+
+    statistics = StatisticsCatalog().collect(reporting_tables)
+    reordered = reorder_joins(plan, statistics)
+
+    assert isinstance(reordered.node, ProjectionNode)
+    assert all(
+        join.join_type == JoinType.INNER_JOIN
+        for join in [reordered.node.node, reordered.node.node.left, reordered.node.node.right]
+        if isinstance(join, JoinNode)
+    )
+    assert execute_query_plan(reordered, reporting_tables) == execute_query_plan(plan, reporting_tables)
+    assert execute_query_plan(plan, reporting_tables, statistics=StatisticsCatalog()) == execute_query_plan(plan, reporting_tables)
+
+
+def test_reorder_joins_greedily(reporting_tables: dict[str, Table], monkeypatch):
+    monkeypatch.setattr('query_plan_optimizer.DYNAMIC_PROGRAMMING_LIMIT', 2)
+    plan = (
+        QueryPlanBuilder()
+            .scan('tasks')
+            .scan('employees')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('employee_id', 'id', '=')])
+            .scan('departments')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('right.department_id', 'id', '=')])
+            .scan('regions')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('right.region_id', 'id', '=')])
+            .build()
+    )
+
+    statistics = StatisticsCatalog().collect(reporting_tables)
+    assert execute_query_plan(optimize(plan, statistics), reporting_tables) == execute_query_plan(plan, reporting_tables)
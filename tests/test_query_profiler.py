@@ -0,0 +1,73 @@
+from indexes import IndexedTable
+from models import Table
+from query_plan_builder import QueryPlanBuilder, JoinType, BinaryCondition
+from query_plan_executor import ACTIVE_PROFILER
+from query_profiler import explain_analyze
+from sql_compiler import compile_sql, execute_sql
+
+
+def test_explain_analyze(employees: Table, tasks: Table):
+    sql = (
+        'select employees.name, tasks.id from employees join tasks on employees.id = tasks.employee_id '
+        'where tasks.completed = true order by tasks.id'
+    )
+    tables = {'employees': employees, 'tasks': tasks}
+    profile = explain_analyze(compile_sql(sql), tables, trace_memory=True)
+
+    assert profile.result == execute_sql(sql, tables)
+    assert ACTIVE_PROFILER.get() is None
+
+    metrics = profile.to_dict()['plan']
+    assert metrics['rows_out'] == 5
+    sort = metrics['children'][0]
+    join = sort['children'][0]
+    assert join['node'] == 'Join(type=JoinType.INNER_JOIN, on="id = employee_id")'
+    assert (join['rows_in'], join['rows_out']) == (10, 5)
+    task_filter = join['children'][1]
+    assert (task_filter['rows_in'], task_filter['rows_out'], task_filter['predicate_evaluations']) == (10, 5, 10)
+    assert sort['time_ms'] >= join['time_ms'] >= join['self_time_ms']
+    assert sort['peak_memory_bytes'] > 0
+
+    lines = profile.render().splitlines()
+    assert lines[0].startswith('Execution time: ')
+    assert lines[3].startswith('    Join(type=JoinType.INNER_JOIN, on="id = employee_id") [rows=5, rows in=10, time=')
+
+
+def test_nodes_read_through_index(tasks: Table):
+    table = IndexedTable(tasks)
+    table.create_hash_index('employee_id')
+    profile = explain_analyze(compile_sql('select id from tasks where employee_id = 3'), {'tasks': table})
+
+    assert len(profile.result) == 4
+    assert profile.render().splitlines()[3:] == [
+        '    Projection(columns="employee_id, id") [not executed]',
+        '      Scan(table="tasks") [not executed]',
+    ]
+
+
+def test_explain_analyze_reports_spills(employees: Table, tasks: Table, monkeypatch):
+    monkeypatch.setattr('database_engine.JOIN_MEMORY_LIMIT', 2)
+    sql = 'select employees.name, tasks.id from employees join tasks on employees.id = tasks.employee_id'
+    profile = explain_analyze(compile_sql(sql), {'employees': employees, 'tasks': tasks})
+
+    join = profile.to_dict()['plan']['children'][0]
+    assert join['bytes_spilled'] > 0 and join['spill_partitions'] >= 32
+    assert 'spilled=' in profile.render().splitlines()[2]
+
+
+def test_rescanned_input_is_reported_per_loop(employees: Table, tasks: Table):
+    plan = (
+        QueryPlanBuilder()
+            .scan('employees')
+            .scan('tasks')
+            .join(JoinType.INNER_JOIN, [BinaryCondition('id', 'employee_id', '!=')])
+            .build()
+    )
+    profile = explain_analyze(plan, {'employees': employees, 'tasks': tasks})
+
+    join = profile.to_dict()['plan']
+    scan = join['children'][1]
+    assert (scan['rows_out'], scan['loops'], scan['rows_total']) == (10, 5, 50)
+    assert (join['rows_in'], join['loops']) == (15, 1)
+    assert profile.render().splitlines()[3].startswith('  Scan(table="tasks") [rows=10, time=')
+    assert profile.render().splitlines()[3].endswith(', loops=5]')
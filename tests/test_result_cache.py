@@ -0,0 +1,81 @@
+from database import Database
+from indexes import IndexedTable
+from models import Table, Record
+from result_cache import ResultCache, estimate_size
+from sql_compiler import compile_sql, execute_sql
+
+
+def test_cache_hits_and_invalidation(employees: Table, tasks: Table):
+    tables = {'employees': IndexedTable(employees), 'tasks': IndexedTable(tasks)}
+    cache = ResultCache()
+    sql = 'select employees.name from employees join tasks on employees.id = tasks.employee_id where tasks.completed = true'
+    plan = compile_sql(sql)
+
+    expected = set(execute_sql(sql, tables))
+    assert cache.execute(plan, tables) == expected
+    assert cache.execute(compile_sql(sql.replace(' = ', '=')), tables) == expected
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    tables['tasks'].add(Record(id=10, employee_id=0, completed=True))
+    result = cache.execute(plan, tables)
+    assert result == set(execute_sql(sql, tables)) and result != expected
+    assert cache.statistics() == {
+        'hits': 1, 'misses': 2, 'evictions': 0, 'invalidations': 1, 'entries': 1, 'size': cache.size
+    }
+
+    # plain sets don't track their version, so their results are not cached
+    assert cache.execute(compile_sql('select id from tasks'), {'tasks': tasks}) == {Record(id=i) for i in range(10)}
+    assert len(cache) == 1
+
+
+def test_set_operators_change_version():
+    table = IndexedTable({Record(id=1), Record(id=2)})
+    tables = {'tasks': table}
+    cache = ResultCache()
+    plan = compile_sql('select id from tasks')
+    assert cache.execute(plan, tables) == {Record(id=1), Record(id=2)}
+
+    table &= {Record(id=1)}
+    assert cache.execute(plan, tables) == {Record(id=1)}
+    table.symmetric_difference_update({Record(id=9)})
+    assert cache.execute(plan, tables) == {Record(id=1), Record(id=9)}
+    table ^= {Record(id=1)}
+    table.intersection_update({Record(id=9), Record(id=3)})
+    assert cache.execute(plan, tables) == {Record(id=9)}
+    assert cache.invalidations == 3
+
+
+def test_eviction_by_size(employees: Table):
+    tables = {'employees': IndexedTable(employees)}
+    plans = [compile_sql(f'select name from employees where id = {i}') for i in range(5)]
+    cache = ResultCache(max_size=2 * estimate_size(frozenset({Record(name='Dwight K. Schrute')})))
+
+    for plan in plans[:3]:
+        cache.execute(plan, tables)
+    assert (len(cache), cache.evictions) == (2, 1)
+
+    cache.execute(plans[1], tables)
+    cache.execute(plans[3], tables)
+    cache.execute(plans[1], tables)
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 4, 2)
+    assert cache.size <= cache.max_size
+
+
+def test_database_snapshots(tmp_path, tasks: Table):
+    cache = ResultCache()
+    plan = compile_sql('select count(*) as tasks from tasks')
+    with Database(str(tmp_path), gc_interval=None) as database:
+        database.create_table('tasks', tasks)
+        database.create_table('other')
+        with database.snapshot() as tables:
+            assert cache.execute(plan, tables) == {Record(tasks=10)}
+
+        database.insert('other', [Record(id=0)])
+        with database.snapshot() as tables:
+            assert cache.execute(plan, tables) == {Record(tasks=10)}
+        assert cache.hits == 1
+
+        database.delete('tasks', lambda record: record.completed)
+        with database.snapshot() as tables:
+            assert cache.execute(plan, tables) == {Record(tasks=5)}
+        assert cache.invalidations == 1
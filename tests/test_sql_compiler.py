@@ -0,0 +1,196 @@
+import pytest
+
+from models import Table, Record
+from query_plan_builder import QueryPlan, ProjectionNode, SortNode, FilterNode, JoinNode, JoinType, ScanNode, \
+    BinaryCondition, ComparisonCondition, Column, SortKey, LimitNode
+from sql_compiler import compile_sql, execute_sql, normalize_sql, compile_normalized_sql, CompilationError, \
+    compile_select
+from sql_parser import parse_sql
+
+
+@pytest.fixture
+def tables(employees: Table, tasks: Table) -> dict[str, Table]:
+    return {'employees': employees, 'tasks': tasks}
+
+
+def test_compile_select():
+    select, = parse_sql(
+        'select employees.id, tasks.id from employees '
+        'left outer join tasks on tasks.employee_id = employees.id '
+        'where tasks.employee_id is null '
+        'order by employees.id desc'
+    )
+    plan = compile_select(select)
+    assert plan == QueryPlan(
+        ProjectionNode(
+            SortNode(
+                JoinNode(
+                    JoinType.ANTI_JOIN,
+                    ScanNode('employees'),
+                    ScanNode('tasks'),
+                    [BinaryCondition('id', 'employee_id', '=')]
+                ),
+                [SortKey('left.id', ascending=False)]
+            ),
+            {'employees.id': 'left.id', 'tasks.id': 'right.id'}
+        )
+    )
+
+
+def test_compile_limit():
+    plan = compile_sql('select id from employees order by salary desc limit 2 offset 1')
+    assert plan == QueryPlan(
+        LimitNode(
+            ProjectionNode(
+                SortNode(
+                    ProjectionNode(ScanNode('employees'), {'id': 'id', 'salary': 'salary'}),
+                    [SortKey('salary', ascending=False)],
+                    3
+                ),
+                {'id': 'id'}
+            ),
+            2,
+            1
+        )
+    )
+
+
+def test_execute_sql_single_table(tables: dict[str, Table]):
+    result = execute_sql("select id, name from employees where salary > 50000 and position = 'Sales' order by id", tables)
+    assert result == [
+        Record(id=3, name='James Halpert'),
+        Record(id=4, name='Stanley Hudson'),
+    ]
+
+
+def test_execute_sql_order_by_nulls(tables: dict[str, Table]):
+    tables['employees'] = tables['employees'] | {Record(id=5, name='Ryan Howard', position='Temp', salary=None)}
+
+    result = execute_sql('select id from employees order by salary nulls first, id desc', tables)
+    assert [record.id for record in result] == [5, 2, 4, 3, 1, 0]
+
+    result = execute_sql('select id from employees order by salary desc nulls last', tables)
+    assert [record.id for record in result][-1] == 5
+
+
+def test_execute_sql_employees_without_tasks(tables: dict[str, Table]):
+    result = execute_sql(
+        'select employees.id, employees.name from employees '
+        'left outer join tasks on employees.id = tasks.employee_id '
+        'where tasks.employee_id is null',
+        tables
+    )
+    assert result == [Record(employees=Record(id=4, name='Stanley Hudson'))]
+    assert result[0]['employees.name'] == 'Stanley Hudson'
+
+
+def test_execute_sql_joins(tables: dict[str, Table]):
+    expected = [{'employees.id': 1, 'tasks.id': task_id} for task_id in (4, 3, 2)]
+
+    join = execute_sql(
+        'select employees.id, tasks.id from employees '
+        'inner join tasks on employees.id = tasks.employee_id and tasks.completed = true '
+        'where employees.id = 1 order by tasks.id desc',
+        tables
+    )
+    cartesian = execute_sql(
+        'select employees.id, tasks.id from employees, tasks '
+        'where employees.id = tasks.employee_id and employees.id = 1 order by tasks.id desc',
+        tables
+    )
+
+    assert [{column: record[column] for column in ('employees.id', 'tasks.id')} for record in join] == expected
+    assert cartesian == join
+
+
+def test_execute_sql_table_columns(employees: Table, tables: dict[str, Table]):
+    result = execute_sql(
+        'select employees.*, tasks.id from employees join tasks on employees.id = tasks.employee_id '
+        'where tasks.id = 5',
+        tables
+    )
+    pam = next(employee for employee in employees if employee.id == 2)
+    assert result == [Record(employees=pam, tasks=Record(id=5))]
+
+    assert set(execute_sql('select employees.* from employees', tables)) == employees
+
+
+def test_execute_sql_range_join(tables: dict[str, Table]):
+    ranges = {Record(id=0, low=2, high=4), Record(id=1, low=8, high=20), Record(id=2, low=None, high=1)}
+    result = execute_sql(
+        'select ranges.id, tasks.id from ranges join tasks on tasks.id between ranges.low and ranges.high',
+        {**tables, 'ranges': ranges}
+    )
+    assert sorted((record['ranges.id'], record['tasks.id']) for record in result) == [
+        (0, 2), (0, 3), (0, 4), (1, 8), (1, 9)
+    ]
+
+
+def test_compile_sql_is_cached():
+    compile_normalized_sql.cache_clear()
+    first = compile_sql('select id from employees where id = 1')
+    second = compile_sql("select  id\n  from employees\twhere id = 1;")
+    assert first is second
+    assert compile_normalized_sql.cache_info().hits == 1
+    assert normalize_sql("select  'a  b'   from t") == "select 'a  b' from t"
+
+
+def test_compile_sql_errors():
+    with pytest.raises(CompilationError):
+        compile_sql('select id from employees join tasks on employees.id = tasks.employee_id')
+
+    with pytest.raises(CompilationError):
+        compile_sql('select employee.id from employees')
+
+    with pytest.raises(CompilationError):
+        compile_sql('select employees.*, id from employees')
+
+    with pytest.raises(CompilationError):
+        compile_sql('select tasks.* from employees')
+
+
+def test_execute_sql_group_by(tables: dict[str, Table]):
+    result = execute_sql(
+        'select employees.name, count(tasks.id) as tasks, count(distinct tasks.completed) from employees '
+        'left outer join tasks on employees.id = tasks.employee_id '
+        'group by employees.name having count(tasks.id) < 4 order by tasks desc, employees.name',
+        tables
+    )
+    assert [(record['employees.name'], record.tasks, record.count) for record in result] == [
+        ('Dwight K. Schrute', 3, 1),
+        ('Michael Scott', 2, 1),
+        ('Pamela Beesly', 1, 1),
+        ('Stanley Hudson', 0, 0),
+    ]
+
+    assert execute_sql('select count(*), avg(salary), max(salary) from employees where salary < 60000', tables) == [
+        Record(count=3, avg=50000, max=55000)
+    ]
+
+
+def test_compile_group_by_errors():
+    with pytest.raises(CompilationError):
+        compile_sql('select name, count(*) from employees group by position')
+    with pytest.raises(CompilationError):
+        compile_sql('select count(*), count(id) from employees')
+    with pytest.raises(CompilationError):
+        compile_sql('select sum(distinct salary) from employees')
+    with pytest.raises(CompilationError):
+        compile_sql('select position from employees group by position having count(distinct *) > 1')
+
+
+def test_execute_sql_limit_offset(tables: dict[str, Table]):
+    def ids(sql: str) -> list[int]:
+        return [record.id for record in execute_sql(sql, tables)]
+
+    assert ids('select id from employees order by salary desc, id limit 2') == [0, 1]
+    assert ids('select id from employees order by salary desc, id limit 2 offset 2') == [3, 4]
+    assert ids('select id from employees order by salary desc, id offset 4') == [2]
+    assert ids('select id from employees order by id limit 0') == []
+    assert len(ids('select id from tasks where completed = true limit 3')) == 3
+
+    pages = execute_sql(
+        'select employee_id, count(*) as tasks from tasks group by employee_id order by tasks desc limit 2',
+        tables
+    )
+    assert [(record.employee_id, record.tasks) for record in pages] == [(3, 4), (1, 3)]
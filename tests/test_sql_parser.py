@@ -1,4 +1,7 @@
-from sql_parser import parse_sql, Select, read_conditions
+import pytest
+
+from sql_parser import parse_sql, Select, FunctionCall, read_conditions, is_literal, parse_literal, tokenize, Token, \
+    InvalidTokenError
 
 
 def test_sql_parser():
@@ -11,6 +14,52 @@ def test_sql_parser():
     )]
 
 
+def test_sql_parser_table_columns():
+    select, = parse_sql('select employees.*, tasks.id from employees join tasks on employees.id = tasks.employee_id')
+    assert select.select_list == ['employees.*', 'tasks.id']
+    assert tokenize('employees.* from')[0] == Token('all_columns', 'employees.*', 0, 11)
+
+
+def test_sql_parser_order_by():
+    tokens = parse_sql('select id from employees where salary > 10000 order by salary desc, id')
+    assert tokens == [Select(
+        select_list=['id'],
+        select_from=['employees'],
+        join=[],
+        where=('salary', '>', '10000'),
+        order_by=[('salary', 'desc'), ('id', 'asc')]
+    )]
+
+
+def test_sql_parser_order_by_nulls():
+    select, = parse_sql('select id from employees order by salary desc nulls last, id nulls first')
+    assert select.order_by == [('salary', 'desc', 'last'), ('id', 'asc', 'first')]
+
+
+def test_sql_parser_limit_offset():
+    select, = parse_sql('select id from employees order by id limit 10 offset 20')
+    assert (select.limit, select.offset) == (10, 20)
+
+    select, = parse_sql('select id from employees offset 5;')
+    assert (select.limit, select.offset) == (None, 5)
+
+
+def test_sql_parser_group_by():
+    select, = parse_sql(
+        'select employee_id, count(*) as tasks, count(distinct completed) from tasks '
+        'group by employee_id having count(*) > 2 order by tasks desc'
+    )
+    assert select == Select(
+        select_list=['employee_id', FunctionCall('count', None, alias='tasks'), FunctionCall('count', 'completed', True)],
+        select_from=['tasks'],
+        join=[],
+        where=None,
+        group_by=['employee_id'],
+        having=('count(*)', '>', '2'),
+        order_by=[('tasks', 'desc')]
+    )
+
+
 def test_read_conditions():
     expression = 'a = 1 and b = 2 or c = 3 and d = 4'
     result = read_conditions(expression, 0)
@@ -21,3 +70,58 @@ def test_read_conditions_with_brackets():
     expression = 'a = 1 and (b = 2 or c = 3) and d = 4'
     result = read_conditions(expression, 0)
     assert result == (('and', ('a', '=', '1'), ('and', ('or', ('b', '=', '2'), ('c', '=', '3')), ('d', '=', '4'))), 36)
+
+
+def test_read_conditions_between():
+    expression = 'a between b and 2 and c = 3'
+    result = read_conditions(expression, 0)
+    assert result == (('and', ('and', ('a', '>=', 'b'), ('a', '<=', '2')), ('c', '=', '3')), 27)
+
+
+def test_read_conditions_from_position():
+    expression = "select * from t where name = 'O''Brien' and count(distinct id) >= -1.5 order by id"
+    result = read_conditions(expression, 22)
+    assert result == (('and', ('name', '=', "'O''Brien'"), ('count(distinct id)', '>=', '-1.5')), 71)
+
+
+def test_tokenize():
+    assert tokenize("where a.b<>'x y'") == [
+        Token('name', 'where', 0, 5),
+        Token('name', 'a.b', 6, 9),
+        Token('operator', '<>', 9, 11),
+        Token('string', "'x y'", 11, 16),
+    ]
+
+
+def test_parse_long_query():
+    select, = parse_sql('select id from employees where ' + ' or '.join([f'id = {i}' for i in range(5000)]))
+    condition = select.where
+    for i in range(4999):
+        assert condition[:2] == ('or', ('id', '=', str(i)))
+        condition = condition[2]
+    assert condition == ('id', '=', '4999')
+
+
+@pytest.mark.parametrize('sql', [
+    'select id from employees where id = 1 id',
+    'select id from employees where id = #',
+    'select id employees',
+    'select count(id from employees',
+    'select id from employees limit -1',
+    'select id from employees limit 1.5',
+    'select id from employees limit all',
+    'select id from employees offset 2 limit 1',
+    'select id from employees where employees.* = 1',
+    'select count(distinct *) from employees',
+])
+def test_parse_invalid_sql(sql: str):
+    with pytest.raises(InvalidTokenError):
+        parse_sql(sql)
+
+
+def test_parse_literal():
+    assert [parse_literal(value) for value in ['10000', '-1.5', "'Sales'", "'O''Brien'", 'null', 'TRUE']] == [
+        10000, -1.5, 'Sales', "O'Brien", None, True
+    ]
+    assert not is_literal('salary')
+    assert not is_literal('employees.id')
@@ -0,0 +1,77 @@
+import pytest
+
+from models import Table, Record
+from sql_compiler import execute_sql
+from storage_engine import StorageEngine, StorageError, load_table, PAGE_SIZE
+
+
+def test_tables_are_persisted(tmp_path, employees: Table, tasks: Table):
+    path = str(tmp_path / 'office.db')
+    with StorageEngine(path) as engine:
+        load_table(engine, 'employees', employees)
+        load_table(engine, 'tasks', tasks)
+
+    with StorageEngine(path) as engine:
+        assert set(engine.tables()) == {'employees', 'tasks'}
+        assert set(engine.table('employees')) == employees
+        assert set(engine.table('tasks')) == tasks
+        assert len(engine.table('tasks')) == 10
+
+        engine.table('tasks').insert([Record(id=10, employee_id=None, completed=False)])
+
+    with StorageEngine(path) as engine:
+        assert Record(id=10, employee_id=None, completed=False) in engine.table('tasks')
+
+
+def test_scan_through_small_buffer_pool(tmp_path):
+    records = [Record(id=i, name=f'name {i}' * 5, score=i / 2) for i in range(2000)]
+    with StorageEngine(str(tmp_path / 'large.db'), buffer_pool_pages=2) as engine:
+        load_table(engine, 'large', records)
+        assert (tmp_path / 'large.db').stat().st_size > 10 * PAGE_SIZE
+        assert list(engine.table('large')) == records
+        assert engine.buffer_pool.reads > 10
+
+
+def test_insert_through_single_page_buffer_pool(tmp_path):
+    path = str(tmp_path / 'large.db')
+    records = [Record(id=i, name='n' * 50) for i in range(500)]
+    with StorageEngine(path, buffer_pool_pages=1) as engine:
+        load_table(engine, 'large', records)
+        # rows read from a table while inserting into another one evict its last page
+        engine.create_table('copy', ['id', 'name']).insert(engine.table('large'))
+        assert list(engine.table('large')) == records
+        assert list(engine.table('copy')) == records
+
+    with StorageEngine(path, buffer_pool_pages=1) as engine:
+        assert list(engine.table('large')) == records
+        assert len(engine.table('copy')) == 500
+        assert list(engine.table('copy')) == records
+
+
+def test_query_stored_tables(tmp_path, employees: Table, tasks: Table):
+    sql = (
+        'select employees.name, tasks.id from employees '
+        'join tasks on employees.id = tasks.employee_id where tasks.completed = true'
+    )
+    with StorageEngine(str(tmp_path / 'office.db'), buffer_pool_pages=1) as engine:
+        load_table(engine, 'employees', employees)
+        load_table(engine, 'tasks', tasks)
+        result = execute_sql(sql, engine.tables())
+
+    assert set(result) == set(execute_sql(sql, {'employees': employees, 'tasks': tasks}))
+    assert len(result) == 5
+
+
+def test_invalid_rows(tmp_path):
+    with StorageEngine(str(tmp_path / 'invalid.db')) as engine:
+        table = engine.create_table('values', ['id', 'value'])
+        with pytest.raises(StorageError):
+            table.insert([Record(id=0)])
+        with pytest.raises(StorageError):
+            table.insert([Record(id=0, value=Record(x=1))])
+        with pytest.raises(StorageError):
+            table.insert([Record(id=0, value='x' * PAGE_SIZE)])
+        with pytest.raises(StorageError):
+            engine.create_table('values', ['id'])
+        with pytest.raises(StorageError):
+            engine.table('missing')
@@ -0,0 +1,82 @@
+from indexes import IndexedTable
+from models import Table, Record
+from table_statistics import TableStatistics, StatisticsCatalog
+
+
+def test_table_statistics(employees: Table):
+    statistics = TableStatistics(employees | {Record(id=5, name='Toby Flenderson', position='HR', salary=None)})
+    assert statistics.row_count == 6
+    assert statistics.distinct_count('position') == 5
+    assert statistics.columns['salary'].min == 40000
+    assert statistics.columns['salary'].max == 100000
+    assert statistics.null_fraction('salary') == 1 / 6
+    assert statistics.distinct_count('missing') is None
+
+
+def test_statistics_are_updated_incrementally(employees: Table):
+    table = IndexedTable(employees)
+    catalog = StatisticsCatalog()
+    statistics = catalog.get('employees', table)
+    assert catalog.get('employees', table) is statistics
+
+    removed = next(record for record in employees if record.salary == 100000)
+    added = Record(id=5, name='Ryan Howard', position='Temp', salary=25000)
+    table.remove(removed)
+    table.add(added)
+    catalog.update('employees', table, inserted=[added], deleted=[removed])
+
+    assert catalog.get('employees', table) is statistics
+    assert statistics.row_count == 5
+    assert statistics.columns['salary'].min == 25000
+    assert statistics.columns['salary'].max == 65000
+    assert statistics.distinct_count('position') == 4
+
+
+class ScannedTable(set):
+    """
+    Table counting how many times it was read in full.
+    """
+
+    def __init__(self, records: Table):
+        super().__init__(records)
+        self.scans = 0
+
+    def __iter__(self):
+        self.scans += 1
+        return super().__iter__()
+
+
+def test_plain_tables_are_not_scanned_again(employees: Table):
+    table = ScannedTable(employees)
+    catalog = StatisticsCatalog()
+    statistics = catalog.get('employees', table)
+    assert catalog.get('employees', table) is statistics
+    assert table.scans == 1
+
+    added = Record(id=5, name='Ryan Howard', position='Temp', salary=25000)
+    table.add(added)
+    catalog.update('employees', table, inserted=[added])
+    assert catalog.get('employees', table).row_count == 6
+    assert table.scans == 1
+
+    catalog.invalidate('employees')
+    assert catalog.get('employees', table) is not statistics
+    assert table.scans == 2
+
+
+def test_statistics_are_collected_again_when_table_changes(employees: Table):
+    table = IndexedTable(employees)
+    catalog = StatisticsCatalog()
+    statistics = catalog.get('employees', table)
+
+    # a change keeping the size of the table changes its version
+    table.remove(next(record for record in employees if record.salary == 100000))
+    table.add(Record(id=5, name='Ryan Howard', position='Temp', salary=25000))
+    assert catalog.get('employees', table) is not statistics
+    assert catalog.get('employees', table).columns['salary'].min == 25000
+    assert catalog.get('employees', IndexedTable(employees)).columns['salary'].min == 40000
+
+    # tables without a version are collected again only when a different table is passed
+    statistics = catalog.get('employees', employees)
+    assert catalog.collect({'employees': employees})['employees'] is statistics
+    assert catalog.get('employees', employees | {Record(id=5)}).row_count == 6
@@ -0,0 +1,155 @@
+import os
+import pickle
+import struct
+import threading
+import zlib
+from typing import Any, Optional
+
+# length and CRC32 of the pickled entry
+ENTRY_HEADER = struct.Struct('<II')
+
+
+class WriteAheadLogError(Exception):
+    pass
+
+
+class WriteAheadLog:
+    """
+    Append-only log of changes. An entry is durable once `wait` returns for its log sequence number.
+
+    With group commit, writers waiting at the same time share one write and fsync: the first waiting
+    writer flushes every entry appended so far while the others wait for it, entries appended during
+    the flush are written by the next leader.
+
+    A failed write leaves the file in an unknown state, so the log fails: the writer raises the error
+    and every later append or wait for an entry which isn't durable raises WriteAheadLogError.
+    """
+
+    def __init__(self, path: str, lsn: int = 0, group_commit: bool = True):
+        self.path = path
+        self.group_commit = group_commit
+        self.flushes = 0
+        self.__file = open(path, 'ab')
+        self.__lsn = lsn
+        self.__durable_lsn = lsn
+        self.__pending: list[bytes] = []
+        self.__flushing = False
+        self.__error: Optional[BaseException] = None
+        self.__lock = threading.Lock()
+        self.__flushed = threading.Condition(self.__lock)
+
+    @property
+    def lsn(self) -> int:
+        return self.__lsn
+
+    @staticmethod
+    def recover(path: str) -> list[tuple[int, Any]]:
+        """
+        Reads entries of the log, a torn or corrupted entry at the end left by a crash is cut off.
+        """
+        if not os.path.exists(path):
+            return []
+
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        entries = []
+        position = 0
+        while position + ENTRY_HEADER.size <= len(data):
+            length, checksum = ENTRY_HEADER.unpack_from(data, position)
+            start = position + ENTRY_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) != length or zlib.crc32(payload) != checksum:
+                break
+            entries.append(pickle.loads(payload))
+            position = start + length
+
+        if position != len(data):
+            with open(path, 'r+b') as file:
+                file.truncate(position)
+                os.fsync(file.fileno())
+
+        return entries
+
+    def append(self, payload: Any) -> int:
+        """
+        Adds an entry to the log and returns its log sequence number, the entry is not durable yet.
+        """
+        with self.__lock:
+            self.__check_failed()
+            self.__lsn += 1
+            data = pickle.dumps((self.__lsn, payload), protocol=pickle.HIGHEST_PROTOCOL)
+            self.__pending.append(ENTRY_HEADER.pack(len(data), zlib.crc32(data)) + data)
+            if not self.group_commit:
+                try:
+                    self.__write(self.__pending)
+                except BaseException as error:
+                    self.__error = error
+                    raise
+                self.__pending = []
+                self.__durable_lsn = self.__lsn
+            return self.__lsn
+
+    def wait(self, lsn: int):
+        """
+        Blocks until the entry with the log sequence number is written and synced to disk.
+        """
+        with self.__lock:
+            while self.__durable_lsn < lsn:
+                self.__check_failed()
+                if self.__flushing:
+                    self.__flushed.wait()
+                    continue
+
+                self.__flushing = True
+                pending, self.__pending = self.__pending, []
+                last_lsn = self.__lsn
+                self.__lock.release()
+                try:
+                    self.__write(pending)
+                except BaseException as error:
+                    self.__lock.acquire()
+                    # entries of the batch were never durable, their waiters fail instead of returning
+                    self.__error = error
+                    raise
+                else:
+                    self.__lock.acquire()
+                    self.__durable_lsn = last_lsn
+                finally:
+                    self.__flushing = False
+                    self.__flushed.notify_all()
+
+    def commit(self, payload: Any) -> int:
+        lsn = self.append(payload)
+        self.wait(lsn)
+        return lsn
+
+    def flush(self):
+        self.wait(self.__lsn)
+
+    def reset(self):
+        """
+        Removes all entries after a checkpoint made them unnecessary, log sequence numbers continue.
+        """
+        self.flush()
+        with self.__lock:
+            self.__file.truncate(0)
+            self.__file.flush()
+            os.fsync(self.__file.fileno())
+
+    def close(self):
+        if not self.__file.closed:
+            try:
+                self.flush()
+            finally:
+                self.__file.close()
+
+    def __check_failed(self):
+        if self.__error is not None:
+            raise WriteAheadLogError(f'Write-ahead log failed: {self.__error}') from self.__error
+
+    def __write(self, entries: list[bytes]):
+        self.__file.write(b''.join(entries))
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
+        self.flushes += 1